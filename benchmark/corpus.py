@@ -0,0 +1,144 @@
+# coding: utf-8
+"""
+Gera um corpus sintético e reproduzível (mesma semente = mesmos arquivos).
+- PDFs com camada de texto (FPDF) e PDFs "escaneados" (só imagem, sem texto)
+- Imagens PNG / JPEG / TIFF com o campo "Série: XXXX" desenhado
+- TXT e DOCX
+Cada arquivo tem a série esperada registrada em manifesto.json (para medir acerto).
+"""
+
+import json
+import os
+import random
+import string
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from fpdf import FPDF
+from docx import Document
+
+TAMANHOS_PAGINA = {
+    "A4": (210, 297),      # mm
+    "carta": (216, 279),
+}
+
+PALAVRAS = ("equipamento", "almoxarifado", "patrimonio", "entrega", "recebido", "conferido",
+            "setor", "unidade", "responsavel", "observacao", "modelo", "marca", "garantia")
+
+
+def gerar_serie(rnd):
+    return "".join(rnd.choice(string.ascii_uppercase) for _ in range(2)) + \
+        "".join(rnd.choice(string.digits) for _ in range(6))
+
+
+def linhas_filler(rnd, n):
+    return [" ".join(rnd.choice(PALAVRAS) for _ in range(rnd.randint(5, 10))).capitalize() for _ in range(n)]
+
+
+def carregar_fonte(tamanho):
+    for nome in ("DejaVuSans.ttf", "arial.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"):
+        try:
+            return ImageFont.truetype(nome, tamanho)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=tamanho)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def renderizar_pagina(rnd, serie, tamanho_mm, dpi, com_serie=True, ruido=True):
+    """Página "escaneada": texto desenhado, leve rotação e ruído."""
+    w, h = int(tamanho_mm[0] / 25.4 * dpi), int(tamanho_mm[1] / 25.4 * dpi)
+    img = Image.new("L", (w, h), 255)
+    draw = ImageDraw.Draw(img)
+    fonte = carregar_fonte(max(10, dpi // 7))
+    margem, passo = int(w * 0.08), int(dpi * 0.3)
+    y = int(h * 0.08)
+    draw.text((margem, y), "RAT ATESTE 7876 - CIAUS", fill=0, font=fonte)
+    y += passo * 2
+    if com_serie:
+        draw.text((margem, y), f"Série: {serie}", fill=0, font=fonte)
+        y += passo * 2
+    for linha in linhas_filler(rnd, 12):
+        draw.text((margem, y), linha, fill=0, font=fonte)
+        y += passo
+        if y > h - margem:
+            break
+    if ruido:
+        img = img.rotate(rnd.uniform(-1.5, 1.5), fillcolor=255, expand=False)
+        pontos = img.load()
+        for _ in range(w * h // 400):
+            pontos[rnd.randrange(w), rnd.randrange(h)] = rnd.choice((0, 128))
+        img = img.filter(ImageFilter.GaussianBlur(0.4))
+    return img.convert("RGB")
+
+
+def pdf_texto(caminho, rnd, serie, paginas, tamanho_mm):
+    pdf = FPDF(unit="mm", format=tamanho_mm)
+    pdf.set_auto_page_break(auto=True, margin=12)
+    for n in range(paginas):
+        pdf.add_page()
+        pdf.set_font("Arial", size=11)
+        if n == 0:
+            pdf.multi_cell(0, 6, "RAT ATESTE 7876 - CIAUS")
+            pdf.multi_cell(0, 6, f"Série: {serie}")
+        for linha in linhas_filler(rnd, 20):
+            pdf.multi_cell(0, 6, linha)
+    pdf.output(caminho)
+
+
+def pdf_escaneado(caminho, rnd, serie, paginas, tamanho_mm, dpi):
+    imagens = [renderizar_pagina(rnd, serie, tamanho_mm, dpi, com_serie=(n == 0)) for n in range(paginas)]
+    imagens[0].save(caminho, save_all=True, append_images=imagens[1:], resolution=dpi)
+
+
+def gerar_corpus(pasta, quantidade=5, paginas=2, tamanho="A4", dpi=150, semente=42):
+    """Gera `quantidade` arquivos de cada tipo em `pasta`; devolve o manifesto."""
+    os.makedirs(pasta, exist_ok=True)
+    rnd = random.Random(semente)
+    tamanho_mm = TAMANHOS_PAGINA.get(tamanho, TAMANHOS_PAGINA["A4"])
+    manifesto = {}
+
+    for i in range(quantidade):
+        serie = gerar_serie(rnd)
+        nome = f"texto_{i:04d}.pdf"
+        pdf_texto(os.path.join(pasta, nome), rnd, serie, paginas, tamanho_mm)
+        manifesto[nome] = serie
+
+        serie = gerar_serie(rnd)
+        nome = f"escaneado_{i:04d}.pdf"
+        pdf_escaneado(os.path.join(pasta, nome), rnd, serie, paginas, tamanho_mm, dpi)
+        manifesto[nome] = serie
+
+        for ext, formato in ((".png", "PNG"), (".jpg", "JPEG"), (".tif", "TIFF")):
+            serie = gerar_serie(rnd)
+            nome = f"imagem_{i:04d}{ext}"
+            img = renderizar_pagina(rnd, serie, tamanho_mm, dpi)
+            if formato == "JPEG":
+                img.save(os.path.join(pasta, nome), formato, quality=85)
+            elif formato == "TIFF":
+                img.convert("1").save(os.path.join(pasta, nome), formato, compression="group4")
+            else:
+                img.save(os.path.join(pasta, nome), formato)
+            manifesto[nome] = serie
+
+        serie = gerar_serie(rnd)
+        nome = f"texto_{i:04d}.txt"
+        with open(os.path.join(pasta, nome), "w", encoding="utf-8") as f:
+            f.write("\n".join(["RAT ATESTE 7876", f"Série: {serie}"] + linhas_filler(rnd, 30 * paginas)))
+        manifesto[nome] = serie
+
+        serie = gerar_serie(rnd)
+        nome = f"documento_{i:04d}.docx"
+        doc = Document()
+        doc.add_paragraph("RAT ATESTE 7876")
+        doc.add_paragraph(f"Série: {serie}")
+        for linha in linhas_filler(rnd, 30 * paginas):
+            doc.add_paragraph(linha)
+        doc.save(os.path.join(pasta, nome))
+        manifesto[nome] = serie
+
+    with open(os.path.join(pasta, "manifesto.json"), "w", encoding="utf-8") as f:
+        json.dump({"semente": semente, "quantidade": quantidade, "paginas": paginas,
+                   "tamanho": tamanho, "dpi": dpi, "series": manifesto}, f, ensure_ascii=False, indent=1)
+    return manifesto
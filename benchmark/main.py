@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Benchmark das ferramentas sobre um corpus sintético (benchmark/corpus.py).
+Mede extrair_serie, extrair_chave_*, converter_para_pdf e os fluxos completos
+(serie.renomear_pdfs e processar_lote, o núcleo do _processar_thread da GUI).
+Relata arquivos/s, latência p50/p95, taxa de acerto e pico de RSS, e grava JSON
+que pode ser comparado com uma execução anterior (--comparar).
+- Cada caso roda num processo novo: o pico de memória é o do caso, não o
+  maior visto até ali. Com psutil a memória é amostrada somando o processo
+  e os filhos (workers do pool); sem ele, ru_maxrss dá o do processo e o do
+  maior filho, separados
+- Latência por arquivo: da entrada no processamento até sair pronto (nos
+  fluxos completos, ao_iniciar -> registro concluído), incluindo a espera na fila
+Os casos preprocessamento[<receita>] fazem OCR direto das imagens com cada
+receita de comum/preprocessamento.py (--receitas): acerto x vazão e ms por etapa.
+
+Exemplo:
+    python benchmark/main.py --quantidade 10 --paginas 3 --saida bench.json
+    python benchmark/main.py --quantidade 10 --paginas 3 --saida depois.json --comparar bench.json
+    python benchmark/main.py --casos preprocessamento --dpi 300 --receitas "nenhum;cinza,binarizar"
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tessdata = os.environ.get("TESSDATA_PREFIX")
+import pytesseract
+import comum.extracao
+import serie.main as serie_main
+from comum.cache_ocr import configurar_cache, versao_tesseract
+from comum.campos import CAMPO_CHAVE, BuscaCampos, campos_busca
+from comum.extracao import LINGUA_OCR, reconhecer_imagens
+from comum.motor_ocr import obter_motor
+from comum.processamento import (converter_para_pdf, extrair_campos_docx, extrair_campos_imagem,
+                                 extrair_campos_pdf, extrair_campos_txt, novo_registro, processar_lote)
+from comum.tempos import Tempos
+from benchmark.corpus import gerar_corpus
+
+# serie/main.py fixa caminhos do Windows ao ser importado; aqui eles vêm dos argumentos
+if _tessdata is None:
+    os.environ.pop("TESSDATA_PREFIX", None)
+else:
+    os.environ["TESSDATA_PREFIX"] = _tessdata
+
+PALAVRA_CHAVE = "Série"
+
+RECEITAS = ("nenhum;cinza;cinza,recortar,reduzir;cinza,recortar,reduzir,endireitar;"
+            "cinza,recortar,reduzir,endireitar,binarizar")
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# -------- métricas ----------
+def mb(n):
+    return round(n / (1024 * 1024), 1)
+
+
+def rss_pico_mb():
+    """(pico deste processo, pico do maior filho já encerrado) em MB; o sistema não dá a soma dos filhos."""
+    if resource is not None:
+        fator = 1 if sys.platform == "darwin" else 1024  # macOS em bytes, Linux em KB
+        return (mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * fator),
+                mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * fator))
+    return None, None
+
+
+class MedidorMemoria:
+    """
+    Pico de memória do caso. Com psutil, uma thread soma o RSS deste processo e
+    dos filhos a cada `intervalo` s (workers em paralelo somam); sem psutil,
+    rss_pico_mb() no fim - certo porque cada caso roda num processo novo.
+    """
+
+    def __init__(self, intervalo=0.05):
+        self.intervalo = intervalo
+        self.pico = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._amostrar, name="bench-memoria", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join()
+
+    def _amostrar(self):
+        processo = psutil.Process()
+        while True:
+            total = 0
+            for p in [processo] + processo.children(recursive=True):
+                try:
+                    total += p.memory_info().rss
+                except psutil.Error:
+                    pass  # filho terminou entre a listagem e a leitura
+            self.pico = max(self.pico, total)
+            if self._parar.wait(self.intervalo):
+                return
+
+    def resultado(self):
+        if self._thread is not None:
+            return {"rss_pico_mb": mb(self.pico)}
+        proprio, filho = rss_pico_mb()
+        return {"rss_pico_mb": proprio, "rss_pico_filho_mb": filho}
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, int(round(p / 100.0 * len(ordenados) + 0.5)) - 1))
+    return ordenados[k]
+
+
+def resumo(arquivos, segundos, latencias=None, acertos=None, esperados=None):
+    r = {
+        "arquivos": arquivos,
+        "segundos": round(segundos, 3),
+        "arquivos_por_s": round(arquivos / segundos, 3) if segundos else None,
+    }
+    if latencias:
+        r["p50_ms"] = round(percentil(latencias, 50) * 1000, 1)
+        r["p95_ms"] = round(percentil(latencias, 95) * 1000, 1)
+    if esperados:
+        r["acerto"] = round(acertos / esperados, 3)
+    return r
+
+
+def medir(caminhos, funcao, series=None):
+    """Roda funcao(caminho) -> valor em cada arquivo, medindo a latência de cada um."""
+    latencias, acertos = [], 0
+    inicio = time.perf_counter()
+    for caminho in caminhos:
+        t0 = time.perf_counter()
+        valor = funcao(caminho)
+        latencias.append(time.perf_counter() - t0)
+        if series is not None and valor == series.get(os.path.basename(caminho)):
+            acertos += 1
+    return resumo(len(caminhos), time.perf_counter() - inicio, latencias, acertos,
+                  len(caminhos) if series is not None else None)
+
+
+# -------- casos ----------
+def casos_extracao(corpus, series):
+    arquivos = sorted(os.path.join(corpus, n) for n in series)
+    por_ext = lambda *exts: [a for a in arquivos if a.lower().endswith(exts)]
+    pdfs = por_ext(".pdf")
+    campos = campos_busca(PALAVRA_CHAVE)
+    chave = lambda extrator: lambda c: extrator(c, campos)[0].get(CAMPO_CHAVE)
+    # nomes dos casos mantidos para comparar com resultados antigos
+    return {
+        "extrair_serie": lambda: medir(pdfs, lambda c: serie_main.extrair_serie(c)[0], series),
+        "extrair_chave_pdf": lambda: medir(pdfs, chave(extrair_campos_pdf), series),
+        "extrair_chave_imagem": lambda: medir(por_ext(".png", ".jpg", ".tif"), chave(extrair_campos_imagem), series),
+        "extrair_chave_txt": lambda: medir(por_ext(".txt"), chave(extrair_campos_txt), series),
+        "extrair_chave_docx": lambda: medir(por_ext(".docx"), chave(extrair_campos_docx), series),
+    }
+
+
+def caso_converter(corpus, series, temp):
+    saida = os.path.join(temp, "convertidos")
+    os.makedirs(saida, exist_ok=True)
+    arquivos = sorted(os.path.join(corpus, n) for n in series)
+    contador = iter(range(len(arquivos)))
+    return medir(arquivos, lambda c: converter_para_pdf(c, os.path.join(saida, f"{next(contador)}.pdf")))
+
+
+def caso_renomear_pdfs(corpus, series, temp, workers):
+    pasta = os.path.join(temp, "renomear")
+    os.makedirs(pasta, exist_ok=True)
+    pdfs = [n for n in series if n.lower().endswith(".pdf")]
+    for nome in pdfs:
+        shutil.copy2(os.path.join(corpus, nome), pasta)
+    iniciados, latencias, acertos = {}, [], [0]
+
+    def concluido(caminho, rec):
+        latencias.append(time.perf_counter() - iniciados.pop(caminho))
+        if rec.get("campo_serie") == series.get(rec["antigo"]):
+            acertos[0] += 1
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        serie_main.renomear_pdfs(workers=workers, pasta=pasta,
+                                 ao_iniciar=lambda caminho: iniciados.__setitem__(caminho, time.perf_counter()),
+                                 ao_concluir=concluido)
+    return resumo(len(pdfs), time.perf_counter() - inicio, latencias, acertos[0], len(pdfs))
+
+
+def caso_processar_lote(corpus, series, temp, workers):
+    destino = os.path.join(temp, "lote")
+    os.makedirs(destino, exist_ok=True)
+    registros = [novo_registro(os.path.join(corpus, n)) for n in sorted(series)]
+    latencias, acertos = [], 0
+    inicio = time.perf_counter()
+    for rec in processar_lote(registros, destino, "BENCH", PALAVRA_CHAVE, workers=workers,
+                              ao_iniciar=lambda rec: rec.__setitem__("_inicio", time.perf_counter())):
+        latencias.append(time.perf_counter() - rec.pop("_inicio"))
+        if rec["keyword"] == series.get(rec["antigo"]):
+            acertos += 1
+    return resumo(len(registros), time.perf_counter() - inicio, latencias, acertos, len(registros))
+
+
+def caso_preprocessamento(corpus, series, receita):
+    """OCR das imagens (sem escada e sem cache) com uma receita; acerto, vazão e ms médio por etapa."""
+    imagens = sorted(os.path.join(corpus, n) for n in series if n.lower().endswith((".png", ".jpg", ".tif")))
+    buscar = BuscaCampos(campos_busca(PALAVRA_CHAVE))
+    total = Tempos()
+
+    def ler(caminho):
+        tempos = Tempos()
+        texto = reconhecer_imagens([caminho], lambda img: obter_motor().texto(img, LINGUA_OCR), receita, tempos)[0]
+        for etapa, segundos in tempos.items():
+            total[etapa] = total.get(etapa, 0.0) + segundos
+        return (buscar(texto) or {}).get(CAMPO_CHAVE)
+
+    r = medir(imagens, ler, series)
+    r["receita"] = receita
+    r["etapas_ms"] = {etapa: round(s / max(1, len(imagens)) * 1000, 1) for etapa, s in total.items()}
+    return r
+
+
+def tabela_preprocessamento(casos):
+    """Troca entre acerto e vazão de cada receita, lado a lado."""
+    linhas = [(nome, r) for nome, r in casos.items() if nome.startswith("preprocessamento[") and "erro" not in r]
+    if not linhas:
+        return
+    print(f"\n{'receita':<46}{'acerto':>8}{'arq/s':>10}{'p95 ms':>9}  ms por etapa")
+    for _, r in linhas:
+        etapas = " ".join(f"{e.replace('pre_', '')}={ms}" for e, ms in r["etapas_ms"].items())
+        print(f"{r['receita']:<46}{r.get('acerto', '-'):>8}{r.get('arquivos_por_s') or '-':>10}"
+              f"{r.get('p95_ms', '-'):>9}  {etapas}")
+
+
+# -------- execução isolada ----------
+def configurar(opcoes):
+    pytesseract.pytesseract.tesseract_cmd = opcoes["tesseract"]
+    comum.extracao.CAMINHO_POPPLER = serie_main.CAMINHO_POPPLER = opcoes["poppler"]
+    configurar_cache(ativo=opcoes["com_cache"])
+
+
+def montar_casos(corpus, series, temp, opcoes):
+    casos = casos_extracao(corpus, series)
+    casos["converter_para_pdf"] = lambda: caso_converter(corpus, series, temp)
+    casos["renomear_pdfs"] = lambda: caso_renomear_pdfs(corpus, series, temp, opcoes["workers"])
+    casos["processar_lote"] = lambda: caso_processar_lote(corpus, series, temp, opcoes["workers"])
+    for receita in [r.strip() for r in opcoes["receitas"].split(";") if r.strip()]:
+        casos[f"preprocessamento[{receita}]"] = (
+            lambda receita=receita: caso_preprocessamento(corpus, series, receita))
+    return casos
+
+
+def rodar_caso(nome, opcoes, corpus, series, temp):
+    """Roda no processo novo de rodar_isolado: o caso e a memória dele."""
+    configurar(opcoes)
+    with MedidorMemoria() as memoria:
+        r = montar_casos(corpus, series, temp, opcoes)[nome]()
+    r.update(memoria.resultado())
+    return r
+
+
+def rodar_isolado(nome, opcoes, corpus, series, temp):
+    # spawn: processo limpo (sem a memória deste), com ru_maxrss zerado; os pools do caso são filhos dele
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(rodar_caso, nome, opcoes, corpus, series, temp).result()
+
+
+# -------- comparação ----------
+def comparar(atual, base):
+    print(f"\n{'caso':<24}{'arq/s antes':>12}{'arq/s agora':>12}{'Δ%':>8}{'p95 antes':>11}{'p95 agora':>11}")
+    for nome, r in atual["casos"].items():
+        b = base.get("casos", {}).get(nome)
+        if not b or "erro" in r or "erro" in b:
+            continue
+        antes, agora = b.get("arquivos_por_s"), r.get("arquivos_por_s")
+        delta = f"{(agora / antes - 1) * 100:+.1f}" if antes and agora else "-"
+        print(f"{nome:<24}{antes or '-':>12}{agora or '-':>12}{delta:>8}"
+              f"{b.get('p95_ms', '-'):>11}{r.get('p95_ms', '-'):>11}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark com corpus sintético.")
+    parser.add_argument("--quantidade", type=int, default=5, help="arquivos de cada tipo")
+    parser.add_argument("--paginas", type=int, default=2, help="páginas por documento")
+    parser.add_argument("--tamanho", default="A4", help="tamanho da página (A4, carta)")
+    parser.add_argument("--dpi", type=int, default=150, help="DPI das páginas escaneadas")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--corpus", default="", help="pasta do corpus (padrão: temporária)")
+    parser.add_argument("--workers", type=int, default=1, help="workers dos fluxos completos")
+    parser.add_argument("--casos", default="", help="só estes casos, separados por vírgula")
+    parser.add_argument("--receitas", default=RECEITAS,
+                        help="receitas de pré-processamento comparadas, separadas por ponto e vírgula")
+    parser.add_argument("--com-cache", action="store_true", help="mantém o cache de OCR ligado")
+    parser.add_argument("--tesseract", default=shutil.which("tesseract") or pytesseract.pytesseract.tesseract_cmd)
+    parser.add_argument("--poppler", default="" if os.name != "nt" else comum.extracao.CAMINHO_POPPLER)
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON de resultado")
+    parser.add_argument("--comparar", default="", help="JSON de uma execução anterior")
+    args = parser.parse_args(argv)
+
+    opcoes = vars(args)
+    configurar(opcoes)
+
+    temp = tempfile.mkdtemp(prefix="bench_")
+    corpus = args.corpus or os.path.join(temp, "corpus")
+    try:
+        t0 = time.perf_counter()
+        series = gerar_corpus(corpus, args.quantidade, args.paginas, args.tamanho, args.dpi, args.semente)
+        print(f"Corpus: {len(series)} arquivos em {time.perf_counter() - t0:.1f}s ({corpus})")
+
+        casos = montar_casos(corpus, series, temp, opcoes)
+        filtro = [c.strip() for c in args.casos.split(",") if c.strip()]
+
+        resultado = {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "parametros": {k: v for k, v in vars(args).items() if k not in ("saida", "comparar")},
+            "ambiente": {"python": platform.python_version(), "sistema": platform.platform(),
+                         "cpus": os.cpu_count(), "tesseract": versao_tesseract()},
+            "casos": {},
+        }
+        for nome in casos:
+            if filtro and nome not in filtro and nome.split("[")[0] not in filtro:
+                continue
+            print(f"- {nome}...", end=" ", flush=True)
+            try:
+                r = rodar_isolado(nome, opcoes, corpus, series, temp)
+            except Exception as e:
+                r = {"erro": str(e)}
+            resultado["casos"][nome] = r
+            print(r)
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=1)
+    print(f"Resultado: {args.saida}")
+    tabela_preprocessamento(resultado["casos"])
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            comparar(resultado, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
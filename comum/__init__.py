@@ -0,0 +1,5 @@
+# coding: utf-8
+"""
+Funções compartilhadas entre os scripts (serie, todos_arquivos_para_pdf, imagem_para_pdf).
+Cada script adiciona a raiz do repositório ao sys.path antes de importar daqui.
+"""
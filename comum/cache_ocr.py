@@ -0,0 +1,224 @@
+# coding: utf-8
+"""
+Cache persistente (SQLite) do texto de OCR por página.
+- Chave = hash do conteúdo do arquivo + página + DPI + idioma + versão do Tesseract do motor (+ config)
+- Guarda o texto bruto, então qualquer palavra-chave/regex pode ser reaplicada sem OCR
+- Despejo LRU por tamanho total, contadores de acerto/falha
+- Leitura não escreve no banco: contadores e último acesso ficam na memória e
+  vão juntos, numa transação, a cada GRAVAR_A_CADA consultas, na próxima
+  gravação ou ao fechar; o tamanho total é somado a cada gravação e só é
+  recontado (SUM) quando passa do limite ou a cada RECONTAR_A_CADA gravações
+  (outros processos gravam no mesmo banco)
+- Desligar: CACHE_OCR_DESATIVADO=1 (ou configurar_cache(ativo=False)); limpar: limpar()
+"""
+
+import hashlib
+import multiprocessing.util
+import os
+import sqlite3
+import threading
+import time
+
+
+TAMANHO_MAX_PADRAO = 512 * 1024 * 1024  # 512 MB de texto
+GRAVAR_A_CADA = 64  # consultas entre gravações dos contadores/acessos
+RECONTAR_A_CADA = 256  # gravações entre recontagens do tamanho total
+
+
+def pasta_cache_padrao():
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "renomear_arquivo_PDF")
+
+
+def caminho_cache_padrao():
+    return os.environ.get("CACHE_OCR_ARQUIVO") or os.path.join(pasta_cache_padrao(), "ocr_cache.sqlite3")
+
+
+def cache_ativo():
+    return os.environ.get("CACHE_OCR_DESATIVADO", "") not in ("1", "true", "sim")
+
+
+def configurar_cache(ativo=True, caminho=None):
+    """Via variáveis de ambiente para valer também nos processos do pool."""
+    os.environ["CACHE_OCR_DESATIVADO"] = "" if ativo else "1"
+    if caminho:
+        os.environ["CACHE_OCR_ARQUIVO"] = caminho
+
+
+def hash_arquivo(path, bloco=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            dados = f.read(bloco)
+            if not dados:
+                break
+            h.update(dados)
+    return h.hexdigest()
+
+
+_versao_tesseract = None
+
+def versao_tesseract():
+    global _versao_tesseract
+    if _versao_tesseract is None:
+        try:
+            from comum.motor_ocr import obter_motor  # só aqui: o pytesseract não carrega com o cache
+            _versao_tesseract = obter_motor().versao()
+        except Exception:
+            _versao_tesseract = "desconhecida"
+    return _versao_tesseract
+
+
+class CacheOCR:
+    def __init__(self, caminho=None, tamanho_max=TAMANHO_MAX_PADRAO):
+        self.caminho = caminho or caminho_cache_padrao()
+        self.tamanho_max = tamanho_max
+        self._lock = threading.Lock()
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._con = sqlite3.connect(self.caminho, timeout=30, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript("""
+            CREATE TABLE IF NOT EXISTS ocr (
+                chave TEXT PRIMARY KEY,
+                texto TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ocr_acesso ON ocr(ultimo_acesso);
+            CREATE TABLE IF NOT EXISTS contadores (
+                nome TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO contadores VALUES ('acertos', 0), ('falhas', 0);
+        """)
+        self._con.commit()
+        self._pendentes = {"acertos": 0, "falhas": 0}
+        self._acessos = {}  # chave -> último acesso ainda não gravado
+        self._consultas = 0
+        self._recontar()
+
+    @staticmethod
+    def montar_chave(hash_conteudo, pagina, dpi, lang, config=""):
+        return "|".join([hash_conteudo, str(pagina), str(dpi), lang, versao_tesseract(), config or ""])
+
+    def obter(self, chave):
+        with self._lock:
+            linha = self._con.execute("SELECT texto FROM ocr WHERE chave = ?", (chave,)).fetchone()
+            self._pendentes["acertos" if linha else "falhas"] += 1
+            if linha:
+                self._acessos[chave] = time.time()
+            self._consultas += 1
+            if self._consultas >= GRAVAR_A_CADA:
+                self._gravar_pendentes()
+                self._con.commit()
+        return linha[0] if linha else None
+
+    def gravar(self, chave, texto):
+        tamanho = len(texto.encode("utf-8"))
+        with self._lock:
+            antigo = self._con.execute("SELECT tamanho FROM ocr WHERE chave = ?", (chave,)).fetchone()
+            self._con.execute("INSERT OR REPLACE INTO ocr VALUES (?, ?, ?, ?)",
+                              (chave, texto, tamanho, time.time()))
+            self._total += tamanho - (antigo[0] if antigo else 0)
+            self._gravacoes += 1
+            self._gravar_pendentes()
+            self._despejar()
+            self._con.commit()
+
+    def _gravar_pendentes(self):
+        """Contadores e acessos acumulados; quem chama faz o commit."""
+        for nome, valor in self._pendentes.items():
+            if valor:
+                self._con.execute("UPDATE contadores SET valor = valor + ? WHERE nome = ?", (valor, nome))
+                self._pendentes[nome] = 0
+        if self._acessos:
+            self._con.executemany("UPDATE ocr SET ultimo_acesso = ? WHERE chave = ?",
+                                  [(t, chave) for chave, t in self._acessos.items()])
+            self._acessos.clear()
+        self._consultas = 0
+
+    def _recontar(self):
+        self._total = self._con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM ocr").fetchone()[0]
+        self._gravacoes = 0
+
+    def _despejar(self):
+        if self._total <= self.tamanho_max and self._gravacoes < RECONTAR_A_CADA:
+            return
+        self._recontar()
+        if self._total <= self.tamanho_max:
+            return
+        # remove os menos usados recentemente até caber no limite
+        for chave, tamanho in self._con.execute(
+                "SELECT chave, tamanho FROM ocr ORDER BY ultimo_acesso").fetchall():
+            if self._total <= self.tamanho_max:
+                break
+            self._con.execute("DELETE FROM ocr WHERE chave = ?", (chave,))
+            self._total -= tamanho
+
+    def limpar(self):
+        with self._lock:
+            self._con.execute("DELETE FROM ocr")
+            self._con.execute("UPDATE contadores SET valor = 0")
+            self._con.commit()
+            self._pendentes = {"acertos": 0, "falhas": 0}
+            self._acessos.clear()
+            self._consultas = 0
+            self._recontar()
+            self._con.execute("VACUUM")
+
+    def estatisticas(self):
+        with self._lock:
+            self._gravar_pendentes()
+            self._con.commit()
+            cont = dict(self._con.execute("SELECT nome, valor FROM contadores").fetchall())
+            entradas, total = self._con.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM ocr").fetchone()
+        return {"acertos": cont.get("acertos", 0), "falhas": cont.get("falhas", 0),
+                "entradas": entradas, "bytes": total}
+
+    def fechar(self):
+        with self._lock:
+            if self._con is None:
+                return
+            self._gravar_pendentes()
+            self._con.commit()
+            self._con.close()
+            self._con = None
+
+
+# uma instância por processo (conexões SQLite não atravessam fork)
+_cache = None
+_cache_pid = None
+
+def obter_cache():
+    """Cache do processo atual, ou None se desativado / indisponível."""
+    global _cache, _cache_pid
+    if not cache_ativo():
+        return None
+    if _cache is None or _cache_pid != os.getpid():
+        try:
+            _cache = CacheOCR()
+            _cache_pid = os.getpid()
+            # grava os contadores pendentes na saída, também nos processos do pool
+            # (que saem sem atexit, mas rodam os finalizadores do multiprocessing)
+            multiprocessing.util.Finalize(_cache, _cache.fechar, exitpriority=0)
+        except Exception as e:
+            print(f"Cache OCR indisponível: {e}")
+            configurar_cache(ativo=False)
+            return None
+    return _cache
+
+
+def ocr_com_cache(hash_conteudo, pagina, dpi, lang, gerar_texto, config=""):
+    """Texto da página vindo do cache; em falha chama gerar_texto() e grava."""
+    cache = obter_cache() if hash_conteudo else None
+    if cache is None:
+        return gerar_texto()
+    chave = CacheOCR.montar_chave(hash_conteudo, pagina, dpi, lang, config)
+    texto = cache.obter(chave)
+    if texto is None:
+        texto = gerar_texto()
+        cache.gravar(chave, texto)
+    return texto
@@ -0,0 +1,141 @@
+# coding: utf-8
+"""
+Vários campos numa passada só sobre o texto (camada de texto ou OCR).
+- Cada campo = rótulo + padrão do valor; todos viram um regex combinado
+  com um grupo nomeado por campo, aplicado uma vez por texto
+- A palavra-chave da tela vira o campo "chave"
+- Modelo de nome com os campos, ex.: "{nome_base}_{serie}_{patrimonio}";
+  campo vazio some junto com o separador antes dele
+"""
+
+import re
+import string
+
+CAMPO_CHAVE = "chave"
+
+VALOR_PADRAO = r"[A-Za-z0-9\-\._]+"
+
+# nome -> rótulo(s) no documento e padrão do valor
+CAMPOS_PADRAO = {
+    "serie": {"rotulo": r"Série|Serie|Serial|Nº de Série|Numero de Serie", "valor": r"[A-Za-z0-9\-\.]+"},
+    "patrimonio": {"rotulo": r"Nº Patrimônio|Patrimônio|Patrimonio|Pat\.", "valor": r"[A-Za-z0-9\-\./]+"},
+    "data": {"rotulo": r"Data", "valor": r"\d{1,2}/\d{1,2}/\d{2,4}"},
+}
+
+ROTULOS_CAMPOS = {
+    CAMPO_CHAVE: "Palavra-chave",
+    "serie": "Série",
+    "patrimonio": "Patrimônio",
+    "data": "Data",
+}
+
+MODELO_NOME_PADRAO = "{nome_base}_{chave}"
+
+SEPARADORES = "_- ."
+INVALIDOS_NOME = r'[\\/:*?"<>|]'
+
+
+def rotulo_campo(nome):
+    return ROTULOS_CAMPOS.get(nome, nome)
+
+
+def campo_palavra_chave(palavra_chave):
+    return {"rotulo": re.escape(palavra_chave), "valor": VALOR_PADRAO, "palavra": palavra_chave}
+
+
+def interpretar_campos(texto):
+    """
+    "serie, patrimonio, lote:Lote Nº" -> dict de campos. Nomes conhecidos vêm
+    de CAMPOS_PADRAO; "nome:Rótulo" cria um campo com o rótulo literal.
+    """
+    campos = {}
+    for parte in (texto or "").split(","):
+        parte = parte.strip()
+        if not parte:
+            continue
+        nome, _, rotulo = parte.partition(":")
+        nome = nome.strip().lower()
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*", nome):
+            raise ValueError(f"Nome de campo inválido: {nome!r}")
+        if rotulo.strip():
+            campos[nome] = campo_palavra_chave(rotulo.strip())
+        elif nome in CAMPOS_PADRAO:
+            campos[nome] = CAMPOS_PADRAO[nome]
+        else:
+            raise ValueError(f"Campo desconhecido: {nome!r} (use nome:Rótulo)")
+    return campos
+
+
+def campos_busca(palavra_chave="", extras=""):
+    """Campos de uma execução: a palavra-chave (campo "chave") + os extras."""
+    campos = {}
+    if palavra_chave and palavra_chave.strip():
+        campos[CAMPO_CHAVE] = campo_palavra_chave(palavra_chave.strip())
+    campos.update(interpretar_campos(extras) if isinstance(extras, str) else extras)
+    return campos
+
+
+def padrao_campo(nome, campo):
+    return rf"(?:{campo['rotulo']})[: ]+(?P<{nome}>{campo['valor']})"
+
+
+def compilar_campos(campos):
+    return re.compile("|".join(padrao_campo(nome, campo) for nome, campo in campos.items()), re.IGNORECASE)
+
+
+class BuscaCampos:
+    """
+    buscar(texto) para extrair_valor_pdf: uma varredura do regex combinado;
+    só campos que não apareceram (rótulos que se sobrepõem) são buscados de novo
+    sozinhos. Devolve o dict quando todos os obrigatórios foram achados e guarda
+    em `parcial` o melhor resultado incompleto.
+    """
+
+    def __init__(self, campos, obrigatorios=None):
+        self.campos = campos
+        obrigatorios = [n for n in (obrigatorios or ()) if n in campos]
+        self.obrigatorios = obrigatorios or list(campos)
+        self.padrao = compilar_campos(campos) if campos else None
+        self.parcial = {}
+
+    def __call__(self, texto):
+        valores = {}
+        if self.padrao is None:
+            return None
+        for m in self.padrao.finditer(texto):
+            for nome, valor in m.groupdict().items():
+                if valor is not None:
+                    valores.setdefault(nome, valor)
+        for nome, campo in self.campos.items():
+            if nome not in valores:
+                m = re.search(padrao_campo(nome, campo), texto, re.IGNORECASE)
+                if m:
+                    valores[nome] = m.group(nome)
+        if len(valores) > len(self.parcial):
+            self.parcial = valores
+        if valores and all(n in valores for n in self.obrigatorios):
+            return valores
+        return None
+
+
+# -------- modelo de nome ----------
+def campos_do_modelo(modelo_nome):
+    return [campo for _, campo, _, _ in string.Formatter().parse(modelo_nome or "") if campo]
+
+
+def limpar_valor(valor):
+    return re.sub(INVALIDOS_NOME, "-", str(valor)).strip()
+
+
+def aplicar_modelo_nome(modelo_nome, valores):
+    """
+    Preenche o modelo; campo sem valor sai junto com o separador que o antecede.
+    "{nome_base}_{serie}_{patrimonio}" sem patrimônio -> "BASE_ABC123".
+    """
+    partes = []
+    for literal, campo, _, _ in string.Formatter().parse(modelo_nome):
+        valor = limpar_valor(valores.get(campo) or "") if campo else ""
+        if campo and not valor and literal.strip(SEPARADORES) == "":
+            continue
+        partes.append(literal + valor)
+    return "".join(partes).strip(SEPARADORES)
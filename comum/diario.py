@@ -0,0 +1,251 @@
+# coding: utf-8
+"""
+Diário da execução: um .jsonl só de acréscimos por execução, em <pasta>/.diario/.
+- Cada arquivo terminado vira uma linha gravada com fsync: caminho e hash
+  do original, campos extraídos, destino e as operações feitas no disco
+- Retomar: a execução seguinte abre o último diário sem "fim" e pula os
+  arquivos já registrados (mesmo caminho, tamanho e mtime), devolvendo o
+  registro guardado para o relatório
+- Desfazer: percorre o diário de trás para frente desfazendo as operações
+  (apaga o que foi criado, devolve o que foi movido/renomeado, tira da
+  lixeira o que foi "apagado") e registra cada item desfeito
+- Apagar original = mover para <pasta>/.lixeira/<execução>/, para poder voltar
+- Queda entre a gravação do arquivo e a linha do diário: o item é refeito
+- Nomes reservados vazios (comum/nomes.py) também vão para o diário: os que
+  nenhum arquivo concluído usou são apagados ao retomar ou desfazer
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from comum.cache_ocr import hash_arquivo
+
+PASTA_DIARIOS = ".diario"
+PASTA_LIXEIRA = ".lixeira"
+
+# operações registradas (e como desfazer)
+OP_CRIAR = "criar"  # arquivo novo: apagar
+OP_MOVER = "mover"  # renomeado/movido de -> para: voltar
+OP_LIXEIRA = "lixeira"  # original "apagado": voltar da lixeira
+
+
+def pasta_diarios(pasta):
+    return os.path.join(pasta, PASTA_DIARIOS)
+
+
+def _chave(caminho):
+    return os.path.normcase(os.path.abspath(caminho))
+
+
+def _assinatura(caminho):
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _termina_com_quebra(caminho):
+    with open(caminho, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def ler_diario(caminho):
+    """Eventos do diário; a última linha cortada por uma queda é ignorada."""
+    eventos = []
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            try:
+                eventos.append(json.loads(linha))
+            except ValueError:
+                continue
+    return eventos
+
+
+def listar_diarios(pasta):
+    d = pasta_diarios(pasta)
+    if not os.path.isdir(d):
+        return []
+    return sorted(os.path.join(d, n) for n in os.listdir(d) if n.endswith(".jsonl"))
+
+
+def ultimo_diario(pasta, incompleto=False):
+    """Diário mais recente; com incompleto=True, None se essa execução chegou ao fim."""
+    diarios = listar_diarios(pasta)
+    if not diarios:
+        return None
+    if incompleto and any(e.get("evento") == "fim" for e in ler_diario(diarios[-1])):
+        return None
+    return diarios[-1]
+
+
+class Diario:
+    def __init__(self, caminho, parametros=None, evento=None):
+        self.caminho = caminho
+        self.execucao = os.path.splitext(os.path.basename(caminho))[0]
+        self.trava = threading.Lock()
+        self.feitos = {}  # caminho -> (assinatura, registro)
+        self.seq = 0
+        existente = self.retomado = os.path.exists(caminho)
+        if existente:
+            self._carregar()
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self.arquivo = open(caminho, "a", encoding="utf-8")
+        if existente and os.path.getsize(caminho) and not _termina_com_quebra(caminho):
+            self.arquivo.write("\n")  # linha cortada pela queda fica sozinha (e é ignorada)
+        self.registrar(evento or ("retomada" if existente else "inicio"), parametros=parametros or {})
+
+    @classmethod
+    def abrir(cls, pasta, retomar=False, parametros=None):
+        """Retomar continua o último diário sem "fim"; senão abre um novo."""
+        caminho = ultimo_diario(pasta, incompleto=True) if retomar else None
+        if caminho is None:
+            nome = datetime.now().strftime("execucao_%Y%m%d_%H%M%S_%f") + ".jsonl"
+            caminho = os.path.join(pasta_diarios(pasta), nome)
+        return cls(caminho, parametros)
+
+    def _carregar(self):
+        desfeitos = set()
+        eventos = ler_diario(self.caminho)
+        for e in eventos:
+            self.seq = max(self.seq, e.get("seq", 0))
+            if e.get("evento") == "desfeito":
+                desfeitos.add(e.get("item"))
+        for e in eventos:
+            if e.get("evento") != "concluido" or e["seq"] in desfeitos:
+                continue
+            for caminho, assinatura in e.get("assinaturas", {}).items():
+                self.feitos[caminho] = (assinatura, e.get("registro") or {})
+        self._limpar_reservas(e["caminho"] for e in eventos if e.get("evento") == "reserva")
+
+    def _limpar_reservas(self, reservas):
+        """Reservas que ficaram vazias de uma execução que caiu; as de arquivos concluídos ficam."""
+        for caminho in reservas:
+            if _chave(caminho) in self.feitos:
+                continue
+            try:
+                if os.path.getsize(caminho) == 0:
+                    os.remove(caminho)
+            except OSError:
+                pass
+
+    def registrar(self, evento, **dados):
+        with self.trava:
+            self.seq += 1
+            linha = dict(evento=evento, seq=self.seq, t=time.time(), **dados)
+            self.arquivo.write(json.dumps(linha, ensure_ascii=False, default=str) + "\n")
+            self.arquivo.flush()
+            os.fsync(self.arquivo.fileno())
+            return self.seq
+
+    def reservado(self, caminho):
+        """Nome reservado vazio (comum/nomes.py), antes de o arquivo ser gravado."""
+        self.registrar("reserva", caminho=caminho)
+
+    def concluido(self, origem, operacoes=(), registro=None, hash_origem=None, **dados):
+        """
+        Registra um arquivo terminado. `operacoes` = [(OP_*, caminho) ou (OP_*, de, para)]
+        na ordem em que foram feitas; `registro` volta igual ao retomar.
+        Chame depois das operações: a assinatura é a dos arquivos já no lugar.
+        """
+        ops = [list(op) for op in operacoes]
+        finais = [op[-1] for op in ops if op[0] != OP_LIXEIRA]
+        assinaturas = {}
+        for caminho in [origem] + finais:
+            assinatura = _assinatura(caminho)
+            if assinatura:
+                assinaturas[_chave(caminho)] = assinatura
+        registro = {k: v for k, v in (registro or {}).items() if not k.startswith("_")}
+        self.registrar("concluido", origem=origem, hash=hash_origem, operacoes=ops,
+                       assinaturas=assinaturas, registro=registro, **dados)
+        with self.trava:
+            for caminho, assinatura in assinaturas.items():
+                self.feitos[caminho] = (assinatura, registro)
+
+    def ja_concluido(self, caminho):
+        """Registro guardado se `caminho` (original ou saída) já foi feito e não mudou; senão None."""
+        with self.trava:
+            feito = self.feitos.get(_chave(caminho))
+        if feito is None or _assinatura(caminho) != feito[0]:
+            return None
+        return feito[1]
+
+    def mandar_para_lixeira(self, caminho):
+        """No lugar de os.remove: move para a lixeira da execução; devolve o novo caminho."""
+        lixeira = os.path.join(os.path.dirname(os.path.abspath(caminho)), PASTA_LIXEIRA, self.execucao)
+        os.makedirs(lixeira, exist_ok=True)
+        destino = os.path.join(lixeira, os.path.basename(caminho))
+        n = 1
+        while os.path.exists(destino):
+            base, ext = os.path.splitext(os.path.basename(caminho))
+            destino = os.path.join(lixeira, f"{base}_{n}{ext}")
+            n += 1
+        os.replace(caminho, destino)
+        return destino
+
+    def fechar(self, completo=True):
+        if completo:
+            self.registrar("fim")
+        self.arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *exc):
+        self.fechar(completo=tipo is None)
+
+
+# -------- desfazer ----------
+def _desfazer_operacao(op):
+    tipo = op[0]
+    if tipo == OP_CRIAR:
+        if os.path.exists(op[1]):
+            os.remove(op[1])
+    elif tipo in (OP_MOVER, OP_LIXEIRA):
+        de, para = op[1], op[2]
+        if os.path.exists(de):
+            raise FileExistsError(f"{de} já existe; {para} não foi devolvido")
+        if os.path.exists(para):
+            os.makedirs(os.path.dirname(de) or ".", exist_ok=True)
+            os.replace(para, de)
+
+
+def desfazer(caminho_diario, ao_desfazer=None):
+    """
+    Desfaz a execução do diário, do último arquivo para o primeiro.
+    Cada item desfeito é registrado no próprio diário: rodar de novo continua
+    de onde parou. ao_desfazer(evento, erro) é chamado por item. Devolve (desfeitos, falhas).
+    """
+    eventos = ler_diario(caminho_diario)
+    ja_desfeitos = {e.get("item") for e in eventos if e.get("evento") == "desfeito"}
+    diario = Diario(caminho_diario, evento="desfazer")
+    desfeitos = falhas = 0
+    try:
+        for e in reversed(eventos):
+            if e.get("evento") != "concluido" or e["seq"] in ja_desfeitos:
+                continue
+            erro = None
+            try:
+                for op in reversed(e.get("operacoes", [])):
+                    _desfazer_operacao(op)
+                diario.registrar("desfeito", item=e["seq"], origem=e.get("origem"))
+                desfeitos += 1
+            except OSError as ex:
+                erro = ex
+                falhas += 1
+            if ao_desfazer:
+                ao_desfazer(e, erro)
+    finally:
+        diario.fechar(completo=False)
+    return desfeitos, falhas
+
+
+def hash_para_diario(caminho):
+    try:
+        return hash_arquivo(caminho)
+    except OSError:
+        return None
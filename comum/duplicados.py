@@ -0,0 +1,221 @@
+# coding: utf-8
+"""
+Duplicados antes do OCR: o mesmo RAT escaneado duas vezes, o mesmo arquivo
+copiado em várias pastas.
+- Exato: sha256 do conteúdo (o mesmo hash do cache de OCR e do diário)
+- Semelhante (reescaneado): dHash de 256 bits da primeira página renderizada
+  bem pequena e endireitada (comum/preprocessamento.py); distância de
+  Hamming até `limiar` (0 = só exatos)
+- Semelhantes achados por faixas de bits: dois hashes a menos de FAIXAS bits
+  de distância têm ao menos uma faixa igual, então só esses são comparados
+- assinatura_arquivo() (hash + dHash) roda onde o OCR roda, nos processos do
+  pool: o pdf2image abre um subprocesso, e abrir subprocesso numa thread
+  enquanto o pool faz fork trava (o filho herda o pipe do exec)
+- Em fluxo, na ordem de entrada: o primeiro arquivo de cada grupo é o
+  representante e passa pelo OCR; os seguintes, conforme a ação:
+    pular   - não são convertidos; status "Duplicado"
+    copiar  - recebem os campos do representante, sem OCR
+    revisar - como copiar, com status "Revisar"
+- Semelhante não prova que é cópia: RATs diferentes do mesmo formulário
+  ficam a poucos bits um do outro. Por isso só o exato (sha256) recebe os
+  campos de outro arquivo; o semelhante ("conferir") passa pelo OCR como
+  qualquer arquivo e só sai com status "Revisar", apontando o parecido
+- Todo registro analisado ganha "dup_grupo" (início do sha256 do representante);
+  as cópias ganham também "dup_de" (caminho do representante) e "dup_tipo"
+- numpy, PIL e pdf2image só são importados na primeira assinatura visual
+"""
+
+import threading
+
+from comum.cache_ocr import hash_arquivo
+from comum.formatos import EXT_IMAGEM
+
+ACAO_PULAR = "pular"
+ACAO_COPIAR = "copiar"
+ACAO_REVISAR = "revisar"
+ACOES = (ACAO_PULAR, ACAO_COPIAR, ACAO_REVISAR)
+ACAO_CONFERIR = "conferir"  # semelhante: lido normalmente, marcado para revisão
+
+TIPO_EXATO = "exato"
+TIPO_SEMELHANTE = "semelhante"
+
+STATUS_DUPLICADO = "Duplicado"
+STATUS_REVISAR = "Revisar"  # campos copiados ou arquivo parecido com outro; conferir
+
+COLUNAS_DUPLICADOS = [
+    ("dup_grupo", "Grupo de duplicados"),
+    ("dup_de", "Duplicado de"),
+    ("dup_tipo", "Tipo de duplicado"),
+]
+
+LADO_HASH = 16  # dHash de 16 x 16 = 256 bits
+LIMIAR_SEMELHANCA = 16  # bits diferentes (de 256); no corpus sintético, formulários distintos ficam acima de 22
+FAIXAS = 32  # 32 faixas de 8 bits
+DPI_ASSINATURA = 30
+LARGURA_MINIATURA = 320
+TAMANHO_GRUPO = 12  # caracteres do sha256 no id do grupo
+
+
+# -------- assinatura visual ----------
+def miniatura(caminho, tipo):
+    """Primeira página em tons de cinza, pequena; None se o tipo não tem página."""
+    from PIL import Image
+
+    if tipo == ".pdf":
+        from pdf2image import convert_from_path
+        import comum.extracao
+        paginas = convert_from_path(caminho, dpi=DPI_ASSINATURA, first_page=1, last_page=1, grayscale=True,
+                                    poppler_path=comum.extracao.CAMINHO_POPPLER)
+        return paginas[0] if paginas else None
+    if tipo in EXT_IMAGEM:
+        with Image.open(caminho) as img:
+            img.draft("L", (LARGURA_MINIATURA, LARGURA_MINIATURA * 2))  # JPEG: decodifica já reduzido
+            img = img.convert("L")
+            img.thumbnail((LARGURA_MINIATURA, LARGURA_MINIATURA * 2))
+            return img
+    return None
+
+
+def dhash(img, lado=LADO_HASH):
+    """Cada bit: o pixel à direita é mais claro que o da esquerda (grade lado+1 x lado)."""
+    import numpy as np
+    from PIL import Image
+
+    pequena = np.asarray(img.resize((lado + 1, lado), Image.BOX), dtype=np.int16)
+    bits = (pequena[:, 1:] > pequena[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def assinatura_visual(caminho, tipo):
+    """dHash da primeira página endireitada; None se não der para renderizar."""
+    import numpy as np
+    from PIL import Image
+    from comum.preprocessamento import para_array, cinza, endireitar
+
+    try:
+        img = miniatura(caminho, tipo)
+    except Exception:
+        return None
+    if img is None:
+        return None
+    with img:
+        arr = endireitar(cinza(para_array(img)))
+        return dhash(Image.fromarray(np.ascontiguousarray(arr)))
+
+
+def assinatura_arquivo(caminho, tipo, visual=True, sha=None):
+    """(sha256, dHash ou None); função de módulo para rodar no pool. sha None se não der para ler."""
+    try:
+        sha = sha or hash_arquivo(caminho)
+    except OSError:
+        return None, None
+    return sha, assinatura_visual(caminho, tipo) if visual else None
+
+
+def copia_campos(acao):
+    """A ação dispensa o OCR (cópia exata): pular, copiar ou revisar; "conferir" não."""
+    return acao in ACOES
+
+
+def distancia(a, b):
+    return bin(a ^ b).count("1")
+
+
+def faixas(valor, bits=LADO_HASH * LADO_HASH):
+    largura = bits // FAIXAS
+    mascara = (1 << largura) - 1
+    return [(i, (valor >> (i * largura)) & mascara) for i in range(FAIXAS)]
+
+
+# -------- detector ----------
+class DetectorDuplicados:
+    """
+    classificar(rec) na ordem de entrada; guardar_resultado(rec, valores, origem)
+    quando o representante for lido; resultado(grupo) para as cópias.
+    Pode durar entre lotes (monitor): os grupos e os resultados ficam guardados.
+    """
+
+    def __init__(self, acao=ACAO_COPIAR, limiar=LIMIAR_SEMELHANCA):
+        if acao not in ACOES:
+            raise ValueError(f"Ação para duplicados inválida: {acao!r} (use {', '.join(ACOES)})")
+        self.acao = acao
+        self.limiar = limiar
+        self.visual = limiar > 0  # 0: só cópias exatas, sem renderizar nada
+        self.trava = threading.Lock()
+        self.por_hash = {}  # sha256 -> grupo
+        self.por_faixa = {}  # (faixa, valor) -> [grupo, ...]
+        self.grupos = {}  # id -> {"representante", "visual", "valores", "origem", "copias"}
+
+    def _novo_grupo(self, rec, sha, visual):
+        grupo = sha[:TAMANHO_GRUPO]
+        self.grupos[grupo] = {"representante": rec["orig_path"], "visual": visual,
+                              "valores": None, "origem": None, "copias": 0}
+        self.por_hash[sha] = grupo
+        if visual is not None:
+            for faixa in faixas(visual):
+                self.por_faixa.setdefault(faixa, []).append(grupo)
+        return grupo
+
+    def _semelhante(self, visual):
+        candidatos = {g for faixa in faixas(visual) for g in self.por_faixa.get(faixa, ())}
+        melhor = None
+        for grupo in candidatos:
+            d = distancia(visual, self.grupos[grupo]["visual"])
+            if d <= self.limiar and (melhor is None or d < melhor[0]):
+                melhor = (d, grupo)
+        return melhor[1] if melhor else None
+
+    def classificar(self, rec, assinatura=None):
+        """
+        Anota dup_grupo (e, nas cópias, dup_de/dup_tipo) no registro. Devolve a
+        ação para uma cópia exata (pular, copiar ou revisar), "conferir" para uma
+        semelhante ou None para o representante.
+        `assinatura` = assinatura_arquivo(...) já calculada (senão é calculada aqui).
+        """
+        if assinatura is None:
+            assinatura = assinatura_arquivo(rec["orig_path"], rec["tipo"], self.visual, rec.get("_hash"))
+        sha, visual = assinatura
+        if sha is None:
+            return None
+        rec["_hash"] = sha
+        with self.trava:
+            grupo, tipo = self.por_hash.get(sha), TIPO_EXATO
+            if grupo is None and visual is not None:
+                grupo, tipo = self._semelhante(visual), TIPO_SEMELHANTE
+            if grupo is None:
+                rec["dup_grupo"] = self._novo_grupo(rec, sha, visual)
+                return None
+            dados = self.grupos[grupo]
+            dados["copias"] += 1
+        rec.update(dup_grupo=grupo, dup_de=dados["representante"], dup_tipo=tipo)
+        if tipo == TIPO_SEMELHANTE:
+            return ACAO_CONFERIR
+        return self.acao
+
+    def guardar_resultado(self, rec, valores, origem):
+        with self.trava:
+            dados = self.grupos.get(rec.get("dup_grupo"))
+            if dados is not None and not rec.get("dup_de"):
+                dados["valores"], dados["origem"] = dict(valores), origem
+
+    def resultado(self, grupo):
+        """(valores, origem) do representante; ({}, None) se ele não deu resultado."""
+        with self.trava:
+            dados = self.grupos.get(grupo) or {}
+            return dict(dados.get("valores") or {}), dados.get("origem")
+
+    def mensagem(self, rec, acao):
+        de = rec.get("dup_de", "")
+        if acao == ACAO_PULAR:
+            return f"Duplicado de {de}: não convertido"
+        if acao == ACAO_REVISAR:
+            return f"Revisar: campos copiados de {de} ({rec.get('dup_tipo')})"
+        if acao == ACAO_CONFERIR:
+            return f"Revisar: parecido com {de} ({rec.get('dup_tipo')}); campos lidos do próprio arquivo"
+        return f"Campos copiados de {de}"
+
+    def estatisticas(self):
+        with self.trava:
+            copias = sum(g["copias"] for g in self.grupos.values())
+            com_copias = sum(1 for g in self.grupos.values() if g["copias"])
+        return {"grupos": com_copias, "copias": copias}
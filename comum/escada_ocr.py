@@ -0,0 +1,64 @@
+# coding: utf-8
+"""
+Escada de OCR: passada barata primeiro, sobe de nível só quando precisa.
+- Nível 1: DPI baixo e PSM rápido; a maioria dos arquivos para aqui
+- Níveis seguintes: DPI maior, outro PSM e receita de pré-processamento
+  mais pesada (comum/preprocessamento.py; None = receita padrão)
+- Sobe quando o padrão não aparece ou quando a confiança das palavras do
+  valor (image_to_data) fica abaixo de CONFIANCA_MINIMA
+- O nível que deu certo vai para o relatório (coluna "nivel_ocr")
+- Confiança mínima por variável de ambiente (vale nos processos do pool): OCR_CONFIANCA_MINIMA
+"""
+
+import os
+
+from comum.motor_ocr import obter_motor
+from comum.preprocessamento import chave_receita
+
+# ajuste pelo relatório: se quase tudo passa no nível 1, dá para baixar o DPI dele
+ESCADA_OCR = [
+    {"nivel": 1, "dpi": 150, "psm": 6, "preprocessamento": None},
+    {"nivel": 2, "dpi": 300, "psm": 3, "preprocessamento": "cinza,recortar,reduzir,endireitar"},
+    {"nivel": 3, "dpi": 300, "psm": 11, "preprocessamento": "cinza,recortar,reduzir,endireitar,binarizar"},
+]
+
+CONFIANCA_MINIMA = 60.0  # 0..100, média das palavras que formam o valor
+
+
+def confianca_minima():
+    try:
+        return float(os.environ.get("OCR_CONFIANCA_MINIMA") or CONFIANCA_MINIMA)
+    except ValueError:
+        return CONFIANCA_MINIMA
+
+
+def config_nivel(nivel):
+    return f"--psm {nivel['psm']}"
+
+
+def chave_nivel(nivel):
+    """Parte da chave do cache: o mesmo DPI com outro PSM/pré-processamento é outro texto."""
+    return f"{config_nivel(nivel)} {chave_receita(nivel.get('preprocessamento'))} dados"
+
+
+def ocr_com_confianca(imagem, lang, nivel):
+    """
+    OCR com confiança por palavra (motor de comum/motor_ocr.py); `imagem` é PIL ou
+    caminho, já pré-processada com a receita do nível.
+    Retorna {"texto": ..., "palavras": [[palavra, confiança], ...]}.
+    """
+    return obter_motor().dados(imagem, lang, config_nivel(nivel))
+
+
+def confianca_valor(valor, palavras):
+    """
+    Média da confiança das palavras que contêm o valor (ou os valores, se vier
+    o dict de comum/campos.py); sem elas, a da página toda.
+    """
+    if not palavras:
+        return None
+    valores = [str(v) for v in valor.values()] if isinstance(valor, dict) else [str(valor)]
+    confs = [conf for palavra, conf in palavras
+             if any(v in palavra or (len(palavra) > 2 and palavra in v) for v in valores)]
+    confs = confs or [conf for _, conf in palavras]
+    return round(sum(confs) / len(confs), 1)
@@ -0,0 +1,457 @@
+# coding: utf-8
+"""
+Motor de extração de texto para PDFs.
+- Primeiro lê a camada de texto embutida (pdfplumber, com PyPDF2 como reserva)
+- Só roda OCR (pdf2image + Tesseract) se a camada estiver vazia ou sem match
+- O resultado informa qual caminho produziu o valor ("texto" ou "ocr")
+- Páginas lidas uma a uma (dica opcional, ex.: "1-2,-1"); a busca para no primeiro match
+- OCR pela escada de comum/escada_ocr.py, com cache (comum/cache_ocr.py) e
+  modelos de layout (comum/modelos_layout.py)
+"""
+
+import io
+import json
+import os
+import re
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+
+from comum.cache_ocr import hash_arquivo, obter_cache, ocr_com_cache
+from comum.modelos_layout import obter_modelo, config_tesseract
+from comum.tempos import Tempos
+from comum.rasterizacao import estimar_bytes_pagina, modo_rasterizacao, reservar_pagina, MODO_DISCO
+from comum.motor_ocr import obter_motor
+from comum.preprocessamento import chave_receita, preprocessar
+from comum.escada_ocr import ESCADA_OCR, chave_nivel, confianca_minima, confianca_valor, ocr_com_confianca
+from comum.formatos import ORIGEM_OCR, ORIGEM_REGIAO, ORIGEM_TEXTO, ROTULOS_ORIGEM
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+try:
+    from PyPDF2 import PdfReader
+except ImportError:
+    PdfReader = None
+
+# ========== CONFIG ==========
+CAMINHO_POPPLER = os.environ.get("CAMINHO_POPPLER", r"C:\poppler-25.11.0\Library\bin")
+LINGUA_OCR = "por"
+DPI_OCR = 200  # padrão do pdf2image
+# ===========================
+
+
+# -------- páginas ----------
+def interpretar_faixa_paginas(dica, total):
+    """
+    Converte a dica ("1-2,-1", "3", "2-4,ultima") em lista de páginas (base 1).
+    As páginas da dica vêm primeiro, na ordem escrita; as demais vêm depois,
+    então a dica só muda a ordem de leitura e nunca esconde uma página.
+    """
+    ordem = []
+    for parte in (dica or "").replace(";", ",").split(","):
+        parte = parte.strip().lower()
+        if parte in ("ultima", "última", "last"):
+            parte = "-1"
+        faixa = re.fullmatch(r"(\d+)\s*-\s*(\d+)", parte)
+        if faixa:
+            numeros = range(int(faixa.group(1)), int(faixa.group(2)) + 1)
+        elif re.fullmatch(r"-?\d+", parte):
+            n = int(parte)
+            numeros = [total + 1 + n if n < 0 else n]
+        else:
+            continue
+        for n in numeros:
+            if 1 <= n <= total and n not in ordem:
+                ordem.append(n)
+    ordem.extend(n for n in range(1, total + 1) if n not in ordem)
+    return ordem
+
+
+def info_paginas(pdf_path, poppler_path=None):
+    """(total de páginas, largura_pts, altura_pts) numa só chamada ao pdfinfo."""
+    info = pdfinfo_from_path(pdf_path, poppler_path=poppler_path or CAMINHO_POPPLER)
+    m = re.match(r"\s*([\d.]+)\s*x\s*([\d.]+)", str(info.get("Page size", "")))
+    larg, alt = (float(m.group(1)), float(m.group(2))) if m else (595.0, 842.0)  # A4
+    return int(info.get("Pages", 0)), larg, alt
+
+
+def iterar_paginas_texto(pdf_path, dica_paginas=None, tempos=None):
+    """Gera (num_pagina, texto) da camada de texto, uma página por vez."""
+    tempos = tempos if tempos is not None else Tempos()
+    if pdfplumber is not None:
+        try:
+            with pdfplumber.open(pdf_path) as pdf:
+                tempos.paginas = len(pdf.pages)
+                for n in interpretar_faixa_paginas(dica_paginas, len(pdf.pages)):
+                    with tempos.medir("leitura_texto"):
+                        texto = pdf.pages[n - 1].extract_text() or ""
+                    yield n, texto
+            return
+        except Exception:
+            pass
+    if PdfReader is not None:
+        try:
+            leitor = PdfReader(pdf_path)
+            paginas = leitor.pages
+            tempos.paginas = len(paginas)
+        except Exception:
+            return
+        for n in interpretar_faixa_paginas(dica_paginas, len(paginas)):
+            try:
+                with tempos.medir("leitura_texto"):
+                    texto = paginas[n - 1].extract_text() or ""
+            except Exception:
+                texto = ""
+            yield n, texto
+
+
+def hash_para_cache(path):
+    """Hash do conteúdo só quando o cache está ligado (evita ler o arquivo à toa)."""
+    return hash_arquivo(path) if obter_cache() is not None else None
+
+
+def reconhecer_imagens(imagens, reconhecer, receita=None, tempos=None):
+    """Pré-processa cada imagem (PIL ou caminho) com a receita e devolve a lista reconhecer(imagem)."""
+    tempos = tempos if tempos is not None else Tempos()
+    resultados = []
+    for imagem in imagens:
+        preparada = preprocessar(imagem, receita, tempos)
+        try:
+            with tempos.medir("ocr"):
+                resultados.append(reconhecer(preparada))
+        finally:
+            if preparada is not imagem:
+                preparada.close()
+    return resultados
+
+
+def reconhecer_pagina_pdf(pdf_path, n, reconhecer, poppler_path=None, dpi=DPI_OCR, tempos=None,
+                          tamanho_pts=(595.0, 842.0), receita=None):
+    """
+    Rasteriza a página n dentro do orçamento de memória e devolve a lista
+    reconhecer(imagem) - uma por imagem gerada (normalmente uma só), já com
+    o pré-processamento da `receita` (None = padrão).
+    No modo "disco" a página vai para um arquivo .ppm temporário, lido sem
+    decodificar pelo pré-processamento (ou pelo próprio Tesseract, sem receita).
+    """
+    tempos = tempos if tempos is not None else Tempos()
+    poppler_path = poppler_path or CAMINHO_POPPLER
+    with reservar_pagina(estimar_bytes_pagina(tamanho_pts[0], tamanho_pts[1], dpi)):
+        if modo_rasterizacao() == MODO_DISCO:
+            with tempfile.TemporaryDirectory(prefix="ocr_") as pasta:
+                with tempos.medir("rasterizacao"):
+                    caminhos = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path,
+                                                 first_page=n, last_page=n, output_folder=pasta,
+                                                 fmt="ppm", paths_only=True)
+                return reconhecer_imagens(caminhos, reconhecer, receita, tempos)
+
+        with tempos.medir("rasterizacao"):
+            imagens = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path,
+                                        first_page=n, last_page=n)
+        try:
+            return reconhecer_imagens(imagens, reconhecer, receita, tempos)
+        finally:
+            for img in imagens:
+                img.close()
+
+
+def juntar_dados(lista):
+    return {"texto": "".join(d["texto"] for d in lista),
+            "palavras": [p for d in lista for p in d["palavras"]]}
+
+
+def iterar_paginas_nivel(pdf_path, nivel, dica_paginas=None, poppler_path=None, lang=LINGUA_OCR, tempos=None):
+    """Gera (num_pagina, {"texto", "palavras"}) com o DPI/PSM/pré-processamento do nível da escada."""
+    tempos = tempos if tempos is not None else Tempos()
+    poppler_path = poppler_path or CAMINHO_POPPLER
+    with tempos.medir("rasterizacao"):
+        total, larg, alt = info_paginas(pdf_path, poppler_path=poppler_path)
+    tempos.paginas = total
+    hash_conteudo = hash_para_cache(pdf_path)
+    for n in interpretar_faixa_paginas(dica_paginas, total):
+        def gerar():
+            lista = reconhecer_pagina_pdf(pdf_path, n, lambda img: ocr_com_confianca(img, lang, nivel),
+                                          poppler_path, nivel["dpi"], tempos, (larg, alt),
+                                          nivel.get("preprocessamento"))
+            return json.dumps(juntar_dados(lista), ensure_ascii=False)
+        yield n, json.loads(ocr_com_cache(hash_conteudo, n, nivel["dpi"], lang, gerar, config=chave_nivel(nivel)))
+
+
+# -------- regiões (modelos de layout) ----------
+def executavel_poppler(nome, poppler_path=None):
+    poppler_path = poppler_path or CAMINHO_POPPLER
+    if poppler_path and os.path.isdir(poppler_path):
+        return os.path.join(poppler_path, nome)
+    return nome
+
+
+def tamanho_pagina_pts(pdf_path, poppler_path=None):
+    """(largura, altura) em pontos, lido do pdfinfo ("612 x 792 pts (letter)")."""
+    return info_paginas(pdf_path, poppler_path)[1:]
+
+
+def recortar_relativo(img, caixa):
+    x0, y0, x1, y1 = caixa
+    w, h = img.size
+    return img.crop((int(x0 * w), int(y0 * h), int(x1 * w), int(y1 * h)))
+
+
+def dpi_da_imagem(img):
+    """DPI gravado no arquivo; sem ele, supõe 300 (scanner)."""
+    return float((img.info.get("dpi") or (300, 300))[0] or 300)
+
+
+def reduzir_para_dpi(img, dpi, dpi_imagem):
+    """Reduz (nunca amplia) a imagem de `dpi_imagem` para `dpi`."""
+    escala = min(1.0, dpi / dpi_imagem)
+    if escala >= 1.0:
+        return img
+    return img.resize((max(1, int(img.width * escala)), max(1, int(img.height * escala))))
+
+
+def renderizar_regiao(pdf_path, pagina, caixa, dpi, poppler_path=None, tamanho_pts=None):
+    """
+    Rasteriza só a caixa (pdftoppm -x -y -W -H); se falhar, página inteira + recorte.
+    `tamanho_pts` = (largura, altura) da página já lido (info_paginas, uma vez por arquivo).
+    """
+    larg, alt = tamanho_pts or tamanho_pagina_pts(pdf_path, poppler_path)
+    escala = dpi / 72.0
+    x0, y0, x1, y1 = caixa
+    x, y = int(x0 * larg * escala), int(y0 * alt * escala)
+    w, h = max(1, int((x1 - x0) * larg * escala)), max(1, int((y1 - y0) * alt * escala))
+    cmd = [executavel_poppler("pdftoppm", poppler_path), "-f", str(pagina), "-l", str(pagina),
+           "-r", str(dpi), "-x", str(x), "-y", str(y), "-W", str(w), "-H", str(h),
+           "-gray", "-png", "-singlefile", pdf_path]
+    try:
+        saida = subprocess.run(cmd, capture_output=True, check=True).stdout
+        return Image.open(io.BytesIO(saida))
+    except Exception:
+        imagens = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path or CAMINHO_POPPLER,
+                                    first_page=pagina, last_page=pagina, grayscale=True)
+        return recortar_relativo(imagens[0], caixa)
+
+
+def valor_da_regiao(regiao, texto, buscar):
+    if regiao.get("valor_direto"):
+        partes = texto.split()
+        valor = partes[0] if partes else None
+        padrao = regiao.get("padrao_valor")
+        if valor and padrao and not re.fullmatch(padrao, valor):
+            return None
+        return valor
+    return buscar(texto)
+
+
+def buscar_em_regioes(modelo, buscar, gerar_imagem, hash_conteudo, lang=LINGUA_OCR, tempos=None):
+    """
+    OCR em cada região do modelo, na ordem; para na primeira que der valor.
+    gerar_imagem(regiao) devolve o recorte (PIL) já no DPI da região; a
+    receita de pré-processamento vem de regiao["preprocessamento"] (senão a padrão).
+    """
+    tempos = tempos if tempos is not None else Tempos()
+    for regiao in modelo.get("regioes", []):
+        config = config_tesseract(regiao)
+        receita = regiao.get("preprocessamento")
+
+        def gerar():
+            x0, y0, x1, y1 = regiao["caixa"]
+            # estimativa com página A4; regiões são pequenas perto de uma página inteira
+            with reservar_pagina(estimar_bytes_pagina(595.0 * (x1 - x0), 842.0 * (y1 - y0),
+                                                      regiao.get("dpi", DPI_OCR), canais=1)):
+                with tempos.medir("rasterizacao"):
+                    img = gerar_imagem(regiao)
+                try:
+                    return reconhecer_imagens([img], lambda i: obter_motor().texto(i, lang, config),
+                                              receita, tempos)[0]
+                finally:
+                    img.close()
+
+        chave_cache = f"{regiao.get('pagina', 1)}:{regiao.get('nome', '')}"
+        texto = ocr_com_cache(hash_conteudo, chave_cache, regiao.get("dpi", DPI_OCR), lang, gerar,
+                              config=f"{config} {tuple(regiao['caixa'])} {chave_receita(receita)}")
+        with tempos.medir("regex"):
+            valor = valor_da_regiao(regiao, texto, buscar)
+        if valor:
+            return valor
+    return None
+
+
+@contextmanager
+def abrir_imagem(path, imagem=None):
+    """A `imagem` já aberta (só cabeçalho ou decodificada) ou o arquivo; só fecha o que abriu aqui."""
+    if imagem is not None:
+        yield imagem
+    else:
+        with Image.open(path) as img:
+            yield img
+
+
+def texto_ocr_imagem(path, lang=LINGUA_OCR, hash_conteudo=None, tempos=None):
+    """OCR de um arquivo de imagem, passando pelo cache."""
+    tempos = tempos if tempos is not None else Tempos()
+
+    def gerar():
+        with Image.open(path) as img:
+            # Image.open só lê o cabeçalho: dá para reservar antes de decodificar
+            with reservar_pagina(img.width * img.height * len(img.getbands())):
+                with tempos.medir("rasterizacao"):
+                    img.load()
+                return reconhecer_imagens([img], lambda i: obter_motor().texto(i, lang), tempos=tempos)[0]
+    return ocr_com_cache(hash_conteudo or hash_para_cache(path), 1, 0, lang, gerar, config=chave_receita())
+
+
+def dados_ocr_imagem(path, nivel, lang=LINGUA_OCR, hash_conteudo=None, tempos=None, imagem=None):
+    """
+    OCR de um arquivo de imagem no nível da escada. Sem DPI real no arquivo,
+    supõe 300; a imagem só é reduzida (nunca ampliada) até o DPI do nível.
+    Com `imagem` (já aberta), o arquivo não é aberto de novo e a decodificação vale para todos os níveis.
+    """
+    tempos = tempos if tempos is not None else Tempos()
+
+    def gerar():
+        with abrir_imagem(path, imagem) as img:
+            with reservar_pagina(img.width * img.height * len(img.getbands())):
+                with tempos.medir("rasterizacao"):
+                    img.load()
+                    reduzida = reduzir_para_dpi(img, nivel["dpi"], dpi_da_imagem(img))
+                try:
+                    dados = reconhecer_imagens([reduzida], lambda i: ocr_com_confianca(i, lang, nivel),
+                                               nivel.get("preprocessamento"), tempos)[0]
+                finally:
+                    if reduzida is not img:
+                        reduzida.close()
+                return json.dumps(dados, ensure_ascii=False)
+    return json.loads(ocr_com_cache(hash_conteudo or hash_para_cache(path), 1, nivel["dpi"], lang, gerar,
+                                    config=chave_nivel(nivel)))
+
+
+def buscar_em_paginas(paginas, buscar, tempos=None):
+    """Testa `buscar` no texto acumulado a cada página; para no primeiro match."""
+    tempos = tempos if tempos is not None else Tempos()
+    texto_total = ""
+    lidas = 0
+    for _, texto in paginas:
+        lidas += 1
+        texto_total += texto + "\n"
+        if texto.strip():
+            with tempos.medir("regex"):
+                valor = buscar(texto_total)
+            if valor:
+                return valor, texto_total, lidas
+    return None, texto_total, lidas
+
+
+def buscar_com_escada(gerar_paginas, buscar, tempos=None):
+    """
+    Sobe a escada de OCR: gerar_paginas(nivel) gera (num_pagina, {"texto", "palavras"}).
+    Para no primeiro nível com valor e confiança >= mínima; se nenhum
+    confirmar, fica com o valor de maior confiança.
+    Retorna (valor, nível, confiança, páginas lidas) e anota nível/confiança em `tempos`.
+    """
+    tempos = tempos if tempos is not None else Tempos()
+    minima = confianca_minima()
+    melhor = (None, None, None, 0)
+    for nivel in ESCADA_OCR:
+        palavras = []
+
+        def textos():
+            for n, dados in gerar_paginas(nivel):
+                palavras.extend(dados["palavras"])
+                yield n, dados["texto"]
+
+        valor, _, lidas = buscar_em_paginas(textos(), buscar, tempos)
+        if not valor:
+            melhor = melhor if melhor[0] else (None, None, None, lidas)
+            continue
+        confianca = confianca_valor(valor, palavras)
+        if confianca is None or confianca >= minima:
+            melhor = (valor, nivel["nivel"], confianca, lidas)
+            break
+        if melhor[0] is None or confianca > melhor[2]:
+            melhor = (valor, nivel["nivel"], confianca, lidas)
+    tempos.nivel_ocr, tempos.confianca_ocr = melhor[1], melhor[2]
+    return melhor
+
+
+# -------- extração ----------
+def extrair_valor_pdf(pdf_path, buscar, poppler_path=None, lang=LINGUA_OCR, dica_paginas=None, modelo=None,
+                      tempos=None):
+    """
+    Aplica `buscar(texto)` primeiro na camada de texto; sem match, nas regiões
+    do modelo de layout (se houver) e por fim no OCR da página inteira,
+    página a página (na ordem da dica) com saída antecipada no primeiro match,
+    subindo a escada de OCR (DPI/PSM) só quando o nível anterior não bastou.
+    Retorna dict {"valor": ..., "origem": "texto" | "regiao" | "ocr" | None, "paginas_lidas": n}.
+    """
+    tempos = tempos if tempos is not None else Tempos()
+    resultado = {"valor": None, "origem": None, "paginas_lidas": 0}
+
+    valor, texto, lidas = buscar_em_paginas(iterar_paginas_texto(pdf_path, dica_paginas, tempos), buscar, tempos)
+    if valor:
+        resultado.update(valor=valor, origem=ORIGEM_TEXTO, paginas_lidas=lidas)
+        return resultado
+
+    modelo = obter_modelo(modelo) if isinstance(modelo, str) else modelo
+    if modelo:
+        info = None  # (total, largura, altura): um pdfinfo por arquivo, só se alguma região for rasterizada
+
+        def gerar_imagem(regiao):
+            nonlocal info
+            info = info or info_paginas(pdf_path, poppler_path=poppler_path)
+            pagina = int(regiao.get("pagina", 1))
+            if pagina < 0:
+                pagina = info[0] + 1 + pagina
+            return renderizar_regiao(pdf_path, pagina, regiao["caixa"], regiao.get("dpi", DPI_OCR),
+                                     poppler_path=poppler_path, tamanho_pts=info[1:])
+
+        valor = buscar_em_regioes(modelo, buscar, gerar_imagem, hash_para_cache(pdf_path), lang, tempos)
+        if valor:
+            resultado.update(valor=valor, origem=ORIGEM_REGIAO)
+            return resultado
+
+    valor, _, _, lidas = buscar_com_escada(
+        lambda nivel: iterar_paginas_nivel(pdf_path, nivel, dica_paginas, poppler_path, lang, tempos),
+        buscar, tempos)
+    resultado["paginas_lidas"] = lidas
+    if valor:
+        resultado["valor"] = valor
+        resultado["origem"] = ORIGEM_OCR
+    return resultado
+
+
+def extrair_valor_imagem(path, buscar, lang=LINGUA_OCR, modelo=None, tempos=None, imagem=None):
+    """
+    Igual a extrair_valor_pdf para arquivos de imagem: regiões do modelo, depois a imagem toda.
+    `imagem`: a imagem já aberta pelo manipulador do formato (comum/formatos.py).
+    Região com "dpi": o recorte é reduzido até esse DPI (nunca ampliado, como nos
+    níveis da escada); sem "dpi" fica na resolução do arquivo - não há o que rasterizar.
+    """
+    tempos = tempos if tempos is not None else Tempos()
+    tempos.paginas = 1
+    resultado = {"valor": None, "origem": None, "paginas_lidas": 1}
+    hash_conteudo = hash_para_cache(path)
+
+    modelo = obter_modelo(modelo) if isinstance(modelo, str) else modelo
+    if modelo:
+        def gerar_imagem(regiao):
+            with abrir_imagem(path, imagem) as img:
+                recorte = recortar_relativo(img, regiao["caixa"])
+                if "dpi" in regiao:
+                    recorte = reduzir_para_dpi(recorte, regiao["dpi"], dpi_da_imagem(img))
+                return recorte
+
+        valor = buscar_em_regioes(modelo, buscar, gerar_imagem, hash_conteudo, lang, tempos)
+        if valor:
+            resultado.update(valor=valor, origem=ORIGEM_REGIAO)
+            return resultado
+
+    valor, _, _, _ = buscar_com_escada(
+        lambda nivel: [(1, dados_ocr_imagem(path, nivel, lang, hash_conteudo, tempos, imagem))], buscar, tempos)
+    if valor:
+        resultado.update(valor=valor, origem=ORIGEM_OCR)
+    return resultado
@@ -0,0 +1,279 @@
+# coding: utf-8
+"""
+Fila de trabalhos durável (SQLite) para dividir um lote entre várias máquinas.
+- Um arquivo .sqlite numa pasta compartilhada: o coordenador enfileira, os
+  trabalhadores (processos ou máquinas) pegam trabalhos com concessão
+  (lease) por tempo limitado e gravam o resultado de volta
+- Concessão vencida (trabalhador caiu, rede caiu) volta para a fila; cada
+  pegada conta uma tentativa e, passado o máximo, o trabalho fica com erro
+- Quem está trabalhando renova as suas concessões (renovar) de tempos em tempos
+- Nome de saída reservado na fila, uma vez por trabalho: rodar o mesmo
+  trabalho de novo grava por cima do mesmo arquivo em vez de criar "_1"
+- Enfileirar é idempotente (um trabalho por caminho de origem): rodar o
+  coordenador de novo só acrescenta os arquivos novos
+- Sem WAL: o WAL precisa de memória compartilhada e não funciona com o
+  arquivo numa pasta de rede; cada operação é uma transação curta
+- Horário de parede (time.time) nas concessões: as máquinas precisam do
+  relógio sincronizado (NTP) com folga bem menor que a concessão
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+ESTADOS = (PENDENTE, EXECUTANDO, CONCLUIDO, ERRO)
+
+CONCESSAO_PADRAO = 300  # s; renovada a cada CONCESSAO/3 enquanto o trabalho roda
+TENTATIVAS_PADRAO = 3
+
+
+def novo_dono():
+    """Identifica o trabalhador nas concessões: máquina, processo e um sufixo aleatório."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def chave_nome(nome):
+    # sem diferenciar maiúsculas em nenhum sistema: a pasta compartilhada pode ser
+    # um compartilhamento Windows acessado também de máquinas Linux
+    return nome.casefold()
+
+
+class FilaTrabalhos:
+    def __init__(self, caminho, concessao=CONCESSAO_PADRAO, max_tentativas=TENTATIVAS_PADRAO):
+        self.caminho = caminho
+        self.concessao = concessao
+        self.max_tentativas = max_tentativas
+        self._lock = threading.Lock()
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        self._con = sqlite3.connect(caminho, timeout=60, check_same_thread=False, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=DELETE")
+        self._con.executescript("""
+            CREATE TABLE IF NOT EXISTS trabalhos (
+                id INTEGER PRIMARY KEY,
+                origem TEXT NOT NULL UNIQUE,
+                estado TEXT NOT NULL DEFAULT 'pendente',
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                dono TEXT,
+                concessao_ate REAL,
+                destino TEXT,
+                registro TEXT,
+                mensagem TEXT,
+                seq INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS trabalhos_estado ON trabalhos(estado, id);
+            CREATE INDEX IF NOT EXISTS trabalhos_seq ON trabalhos(seq);
+            CREATE TABLE IF NOT EXISTS nomes (
+                chave TEXT PRIMARY KEY,
+                trabalho INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sufixos (
+                chave TEXT PRIMARY KEY,
+                proximo INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS parametros (
+                nome TEXT PRIMARY KEY,
+                valor TEXT NOT NULL
+            );
+        """)
+
+    def _transacao(self, funcao, *args):
+        """Roda funcao(*args) numa transação BEGIN IMMEDIATE (uma escrita por vez entre as máquinas)."""
+        with self._lock:
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                resultado = funcao(*args)
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+            self._con.execute("COMMIT")
+            return resultado
+
+    # -------- coordenador ----------
+    def gravar_parametros(self, parametros):
+        """Parâmetros do lote (destino, nome base, campos...) que todos os trabalhadores usam."""
+        def gravar():
+            for nome, valor in parametros.items():
+                self._con.execute("INSERT OR REPLACE INTO parametros VALUES (?, ?)", (nome, json.dumps(valor)))
+        self._transacao(gravar)
+
+    def parametros(self):
+        with self._lock:
+            return {nome: json.loads(valor) for nome, valor in self._con.execute("SELECT nome, valor FROM parametros")}
+
+    def enfileirar(self, caminhos, bloco=500):
+        """Acrescenta os caminhos ainda não enfileirados, em transações de `bloco`; devolve quantos entraram."""
+        novos = 0
+        lote = []
+
+        def inserir(itens):
+            cur = self._con.executemany("INSERT OR IGNORE INTO trabalhos (origem) VALUES (?)", [(c,) for c in itens])
+            return cur.rowcount
+
+        for caminho in caminhos:
+            lote.append(caminho)
+            if len(lote) >= bloco:
+                novos += self._transacao(inserir, lote)
+                lote = []
+        if lote:
+            novos += self._transacao(inserir, lote)
+        return novos
+
+    def resultados(self, depois_de=0):
+        """(seq, origem, estado, registro ou None, mensagem) terminados depois de `seq`, na ordem em que terminaram."""
+        with self._lock:
+            linhas = self._con.execute(
+                "SELECT seq, origem, estado, registro, mensagem FROM trabalhos WHERE seq > ? ORDER BY seq",
+                (depois_de,)).fetchall()
+        return [(seq, origem, estado, json.loads(registro) if registro else None, mensagem)
+                for seq, origem, estado, registro, mensagem in linhas]
+
+    def contagem(self):
+        with self._lock:
+            contagem = dict(self._con.execute("SELECT estado, COUNT(*) FROM trabalhos GROUP BY estado").fetchall())
+        return {estado: contagem.get(estado, 0) for estado in ESTADOS}
+
+    def terminada(self):
+        contagem = self.contagem()
+        return not contagem[PENDENTE] and not contagem[EXECUTANDO]
+
+    def reabrir_erros(self):
+        """Devolve os trabalhos com erro para a fila, com as tentativas zeradas."""
+        def reabrir():
+            return self._con.execute("UPDATE trabalhos SET estado = ?, tentativas = 0, dono = NULL, seq = NULL "
+                                     "WHERE estado = ?", (PENDENTE, ERRO)).rowcount
+        return self._transacao(reabrir)
+
+    # -------- trabalhador ----------
+    def _proximo_seq(self):
+        return self._con.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM trabalhos").fetchone()[0]
+
+    def pegar(self, dono):
+        """
+        Concede o próximo trabalho pendente (ou de concessão vencida) a `dono`.
+        Devolve {"id", "origem", "tentativas", "destino"} ou None se não há nada a pegar agora.
+        """
+        def pegar():
+            agora = time.time()
+            while True:
+                linha = self._con.execute(
+                    "SELECT id, origem, tentativas, destino FROM trabalhos "
+                    "WHERE estado = ? OR (estado = ? AND concessao_ate < ?) ORDER BY id LIMIT 1",
+                    (PENDENTE, EXECUTANDO, agora)).fetchone()
+                if linha is None:
+                    return None
+                id_, origem, tentativas, destino = linha
+                if tentativas >= self.max_tentativas:
+                    # a concessão venceu de novo: o trabalho derruba quem o pega
+                    self._con.execute("UPDATE trabalhos SET estado = ?, dono = NULL, mensagem = ?, seq = ? "
+                                      "WHERE id = ?", (ERRO, f"Desistiu após {tentativas} tentativa(s)",
+                                                       self._proximo_seq(), id_))
+                    continue
+                self._con.execute("UPDATE trabalhos SET estado = ?, dono = ?, concessao_ate = ?, "
+                                  "tentativas = tentativas + 1 WHERE id = ?",
+                                  (EXECUTANDO, dono, agora + self.concessao, id_))
+                return {"id": id_, "origem": origem, "tentativas": tentativas + 1, "destino": destino}
+        return self._transacao(pegar)
+
+    def renovar(self, dono):
+        """Estende as concessões de `dono` ainda em execução; devolve quantas."""
+        def renovar():
+            return self._con.execute("UPDATE trabalhos SET concessao_ate = ? WHERE dono = ? AND estado = ?",
+                                     (time.time() + self.concessao, dono, EXECUTANDO)).rowcount
+        return self._transacao(renovar)
+
+    def reservar_nome(self, id_, nome, pasta):
+        """
+        Caminho de saída do trabalho: o já reservado numa tentativa anterior ou
+        o primeiro livre entre nome, nome_1, nome_2... (livre na fila e no disco).
+        """
+        base, ext = os.path.splitext(nome)
+        chave = chave_nome(nome)
+
+        def reservar():
+            ja = self._con.execute("SELECT destino FROM trabalhos WHERE id = ?", (id_,)).fetchone()
+            if ja and ja[0]:
+                return ja[0]
+            linha = self._con.execute("SELECT proximo FROM sufixos WHERE chave = ?", (chave,)).fetchone()
+            n = linha[0] if linha else 0
+            while True:
+                candidato = f"{base}_{n}{ext}" if n else nome
+                n += 1
+                caminho = os.path.join(pasta, candidato)
+                ocupado = self._con.execute("SELECT 1 FROM nomes WHERE chave = ?",
+                                            (chave_nome(candidato),)).fetchone()
+                if ocupado or os.path.exists(caminho):  # no disco: arquivo de fora da fila
+                    continue
+                self._con.execute("INSERT INTO nomes VALUES (?, ?)", (chave_nome(candidato), id_))
+                self._con.execute("INSERT OR REPLACE INTO sufixos VALUES (?, ?)", (chave, n))
+                self._con.execute("UPDATE trabalhos SET destino = ? WHERE id = ?", (caminho, id_))
+                return caminho
+        return self._transacao(reservar)
+
+    def concluir(self, id_, registro):
+        """Grava o resultado; False se o trabalho já tinha terminado (rodou duas vezes)."""
+        registro = {k: v for k, v in registro.items() if not k.startswith("_")}
+
+        def concluir():
+            return self._con.execute(
+                "UPDATE trabalhos SET estado = ?, dono = NULL, registro = ?, mensagem = NULL, seq = ? "
+                "WHERE id = ? AND estado != ?",
+                (CONCLUIDO, json.dumps(registro, ensure_ascii=False, default=str), self._proximo_seq(),
+                 id_, CONCLUIDO)).rowcount > 0
+        return self._transacao(concluir)
+
+    def falhar(self, id_, dono, mensagem, registro=None):
+        """
+        Volta para a fila ou, sem tentativas sobrando, termina com erro. Nada
+        muda se a concessão já passou para outro trabalhador (ou o trabalho terminou).
+        """
+        registro = {k: v for k, v in (registro or {}).items() if not k.startswith("_")}
+
+        def falhar():
+            linha = self._con.execute("SELECT tentativas FROM trabalhos WHERE id = ? AND dono = ? AND estado = ?",
+                                      (id_, dono, EXECUTANDO)).fetchone()
+            if linha is None:
+                return
+            if linha[0] < self.max_tentativas:
+                self._con.execute("UPDATE trabalhos SET estado = ?, dono = NULL, mensagem = ? WHERE id = ?",
+                                  (PENDENTE, mensagem, id_))
+            else:
+                self._con.execute("UPDATE trabalhos SET estado = ?, dono = NULL, mensagem = ?, registro = ?, "
+                                  "seq = ? WHERE id = ?",
+                                  (ERRO, mensagem, json.dumps(registro, ensure_ascii=False, default=str) if registro
+                                   else None, self._proximo_seq(), id_))
+        self._transacao(falhar)
+
+    def fechar(self):
+        with self._lock:
+            self._con.close()
+
+
+class Renovador:
+    """Thread que renova as concessões de `dono` a cada concessão/3 até parar()."""
+
+    def __init__(self, fila, dono):
+        self.fila = fila
+        self.dono = dono
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._rodar, name="fila-renovador", daemon=True)
+        self._thread.start()
+
+    def _rodar(self):
+        while not self._parar.wait(self.fila.concessao / 3):
+            try:
+                self.fila.renovar(self.dono)
+            except sqlite3.Error as e:
+                print(f"Falha ao renovar concessões: {e}")
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
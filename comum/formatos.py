@@ -0,0 +1,232 @@
+# coding: utf-8
+"""
+Um manipulador por formato de arquivo, escolhido pela extensão (obter_formato).
+- Cada manipulador lê o arquivo uma vez: do que leu sai o texto da busca
+  (extrair) e o conteúdo que a conversão usa (gravar_pdf), então o TXT,
+  DOCX ou imagem lido na extração não é aberto de novo para virar PDF
+- Bibliotecas pesadas (fpdf, python-docx, PIL, pdf2image/pdfplumber/pytesseract
+  via comum/extracao.py) só são importadas na primeira vez que o formato
+  aparece (carregar); a GUI abre sem elas
+- Medição: Tempos.aberturas conta quantas vezes o arquivo foi aberto e
+  lido pelos manipuladores (vai para a coluna "aberturas" do relatório);
+  estatisticas() dá o tempo de carga de cada formato neste processo
+- Formato novo: uma subclasse de Formato e registrar(extensões, classe)
+"""
+
+import os
+import threading
+import time
+
+from comum.tempos import Tempos
+from comum.transferencia import MODO_COPIAR, transferir
+
+ORIGEM_TEXTO = "texto"
+ORIGEM_OCR = "ocr"
+ORIGEM_REGIAO = "regiao"
+
+ROTULOS_ORIGEM = {
+    ORIGEM_TEXTO: "Camada de texto",
+    ORIGEM_OCR: "OCR",
+    ORIGEM_REGIAO: "OCR (região do modelo)",
+}
+
+EXT_IMAGEM = (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".webp")
+
+# bytes de páginas decodificadas que a extração devolve para a conversão; acima
+# disso (TIFF de muitas páginas, imagem enorme sem cópia direta) o conteúdo não
+# atravessa o pool nem ocupa as filas do pipeline: gravar_pdf reabre o arquivo
+CONTEUDO_IMAGEM_MAX = 8 * 1024 * 1024
+
+
+def safe_read_text(path):
+    for enc in ("utf-8", "latin-1", "cp1252"):
+        try:
+            with open(path, "r", encoding=enc) as f:
+                return f.read()
+        except Exception:
+            continue
+    return ""
+
+
+# -------- manipuladores ----------
+class Formato:
+    """
+    Base e formato desconhecido: nada a extrair; o PDF é um marcador com o nome/caminho do original.
+    extrair(caminho, busca, ...) -> (valores ou None, origem, conteúdo para gravar_pdf ou None);
+    converter=False: ninguém vai gravar o PDF, o conteúdo só volta se a busca já o leu
+    """
+    nome = "outro"
+
+    def carregar(self):
+        """Importa as bibliotecas do formato; chamado uma vez, no primeiro uso."""
+        from fpdf import FPDF
+        self.FPDF = FPDF
+
+    def extrair(self, caminho, busca, dica_paginas=None, modelo=None, tempos=None, converter=True):
+        return None, None, None
+
+    def gravar_pdf(self, caminho, destino, conteudo=None, modo=MODO_COPIAR, tempos=None):
+        pdf = self.FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", size=11)
+        pdf.multi_cell(0, 6, f"Arquivo original: {os.path.basename(caminho)}")
+        pdf.multi_cell(0, 6, f"Caminho original: {caminho}")
+        pdf.output(destino)
+
+
+class FormatoTexto(Formato):
+    """TXT: o texto lido na extração vai inteiro para a conversão."""
+    nome = "txt"
+
+    def ler(self, caminho, tempos):
+        tempos.aberturas += 1
+        with tempos.medir("leitura_texto"):
+            return safe_read_text(caminho)
+
+    def texto(self, conteudo):
+        return conteudo
+
+    def linhas(self, conteudo):
+        return conteudo.splitlines()
+
+    def extrair(self, caminho, busca, dica_paginas=None, modelo=None, tempos=None, converter=True):
+        tempos = tempos if tempos is not None else Tempos()
+        conteudo = self.ler(caminho, tempos)
+        with tempos.medir("regex"):
+            valores = busca(self.texto(conteudo)) or busca.parcial
+        return valores, (ORIGEM_TEXTO if valores else None), conteudo
+
+    def gravar_pdf(self, caminho, destino, conteudo=None, modo=MODO_COPIAR, tempos=None):
+        if conteudo is None:
+            conteudo = self.ler(caminho, tempos if tempos is not None else Tempos())
+        pdf = self.FPDF()
+        pdf.add_page()
+        pdf.set_auto_page_break(auto=True, margin=12)
+        pdf.set_font("Arial", size=11)
+        for linha in self.linhas(conteudo):
+            pdf.multi_cell(0, 6, linha)
+        pdf.output(destino)
+
+
+class FormatoDocx(FormatoTexto):
+    """DOCX: o documento é aberto uma vez; o conteúdo é a lista de parágrafos."""
+    nome = "docx"
+
+    def carregar(self):
+        super().carregar()
+        from docx import Document
+        self.Document = Document
+
+    def ler(self, caminho, tempos):
+        tempos.aberturas += 1
+        with tempos.medir("leitura_texto"):
+            return [p.text or "" for p in self.Document(caminho).paragraphs]
+
+    def texto(self, conteudo):
+        return "\n".join(conteudo)
+
+    def linhas(self, conteudo):
+        return [linha for paragrafo in conteudo for linha in paragrafo.splitlines()]
+
+
+class FormatoPDF(Formato):
+    """PDF: camada de texto/OCR em comum/extracao.py; a saída é o próprio arquivo (transferir)."""
+    nome = "pdf"
+
+    def carregar(self):
+        import comum.extracao
+        self.extracao = comum.extracao
+
+    def extrair(self, caminho, busca, dica_paginas=None, modelo=None, tempos=None, converter=True):
+        tempos = tempos if tempos is not None else Tempos()
+        tempos.aberturas += 1
+        resultado = self.extracao.extrair_valor_pdf(caminho, busca, dica_paginas=dica_paginas, modelo=modelo,
+                                                    tempos=tempos)
+        return resultado["valor"], resultado["origem"], None
+
+    def gravar_pdf(self, caminho, destino, conteudo=None, modo=MODO_COPIAR, tempos=None):
+        transferir(caminho, destino, modo)
+
+
+class FormatoImagem(Formato):
+    """
+    Imagem: uma abertura (PIL) serve ao OCR de todos os níveis da escada e às
+    páginas do PDF (comum/imagem_pdf.py), montadas ainda com o arquivo aberto.
+    Páginas copiadas direto do arquivo são só referências (caminho, início,
+    tamanho); as decodificadas só voltam até CONTEUDO_IMAGEM_MAX.
+    """
+    nome = "imagem"
+
+    def carregar(self):
+        from PIL import Image
+        import comum.extracao
+        import comum.imagem_pdf
+        self.Image = Image
+        self.extracao = comum.extracao
+        self.imagem_pdf = comum.imagem_pdf
+
+    def extrair(self, caminho, busca, dica_paginas=None, modelo=None, tempos=None, converter=True):
+        tempos = tempos if tempos is not None else Tempos()
+        tempos.aberturas += 1
+        with self.Image.open(caminho) as img:
+            resultado = self.extracao.extrair_valor_imagem(caminho, busca, modelo=modelo, tempos=tempos, imagem=img)
+            paginas = self.paginas_pequenas(img, caminho) if converter else None
+        return resultado["valor"], resultado["origem"], paginas
+
+    def paginas_pequenas(self, img, caminho):
+        """Páginas para gravar_pdf ou None se as decodificadas passarem de CONTEUDO_IMAGEM_MAX."""
+        paginas, decodificados = [], 0
+        for pagina in self.imagem_pdf.paginas_de_imagem(img, caminho):
+            if isinstance(pagina["partes"], bytes):
+                decodificados += len(pagina["partes"])
+                if decodificados > CONTEUDO_IMAGEM_MAX:
+                    return None
+            paginas.append(pagina)
+        return paginas
+
+    def gravar_pdf(self, caminho, destino, conteudo=None, modo=MODO_COPIAR, tempos=None):
+        if conteudo is None:
+            if tempos is not None:
+                tempos.aberturas += 1
+            self.imagem_pdf.imagem_para_pdf(caminho, destino)
+        else:
+            self.imagem_pdf.paginas_para_pdf(conteudo, destino)
+
+
+# -------- registro ----------
+FORMATOS = {}
+_carregados = {}  # classe -> instância já carregada
+_segundos_carga = {}  # nome -> segundos gastos em carregar()
+_trava = threading.Lock()
+
+
+def registrar(extensoes, classe):
+    for ext in extensoes:
+        FORMATOS[ext.lower()] = classe
+
+
+registrar([".txt"], FormatoTexto)
+registrar([".docx"], FormatoDocx)
+registrar([".pdf"], FormatoPDF)
+registrar(EXT_IMAGEM, FormatoImagem)
+
+
+def obter_formato(tipo):
+    """Manipulador da extensão `tipo` (".pdf", ".txt"...), carregado na primeira vez."""
+    classe = FORMATOS.get((tipo or "").lower(), Formato)
+    formato = _carregados.get(classe)
+    if formato is None:
+        with _trava:
+            formato = _carregados.get(classe)
+            if formato is None:
+                formato = classe()
+                inicio = time.perf_counter()
+                formato.carregar()
+                _segundos_carga[formato.nome] = round(time.perf_counter() - inicio, 3)
+                _carregados[classe] = formato
+    return formato
+
+
+def estatisticas():
+    """{formato: segundos de carga} dos formatos já usados neste processo."""
+    return dict(_segundos_carga)
@@ -0,0 +1,271 @@
+# coding: utf-8
+"""
+Imagem → PDF sem decodificar e recodificar quando o formato permite.
+- JPEG vai inteiro para o PDF (DCTDecode), JPEG 2000 idem (JPXDecode)
+- TIFF CCITT grupo 4 (scanner preto e branco): o strip vai direto (CCITTFaxDecode)
+- PNG sem transparência e sem entrelaçamento: os blocos IDAT já são zlib
+  (FlateDecode com o preditor do PNG), sem descompactar
+- O resto é decodificado uma vez pelo PIL e gravado sem perda (FlateDecode);
+  antes o PIL regravava em JPEG
+- Várias imagens → um PDF de várias páginas, gravado em sequência: cada
+  imagem é copiada do arquivo para o PDF em blocos e não fica na memória
+- Página do tamanho da imagem pelo DPI dela (72 se não tiver) ou, com
+  `tamanho_pagina`, a imagem ajustada dentro das margens
+"""
+
+import os
+import struct
+import zlib
+
+from PIL import Image
+
+PT_POR_MM = 72 / 25.4
+A4 = (210 * PT_POR_MM, 297 * PT_POR_MM)
+DPI_PADRAO = 72
+BLOCO = 1024 * 1024
+
+ASSINATURA_PNG = b"\x89PNG\r\n\x1a\n"
+CORES_PNG = {0: ("/DeviceGray", 1), 2: ("/DeviceRGB", 3), 3: (None, 1)}  # 3 = paleta
+CORES_PIL = {"1": ("/DeviceGray", 1), "L": ("/DeviceGray", 8), "RGB": ("/DeviceRGB", 8),
+             "CMYK": ("/DeviceCMYK", 8)}
+
+
+def _num(valor):
+    return f"{valor:.4f}".rstrip("0").rstrip(".")
+
+
+def _dpi(img):
+    dpi = img.info.get("dpi") or (DPI_PADRAO, DPI_PADRAO)
+    try:
+        x, y = float(dpi[0]), float(dpi[1])
+    except (TypeError, ValueError, IndexError):
+        return DPI_PADRAO, DPI_PADRAO
+    return (x if x > 1 else DPI_PADRAO), (y if y > 1 else DPI_PADRAO)
+
+
+# -------- leitura: cada página vira um dict ----------
+# {"largura", "altura", "dpi", "dicionario": entradas do XObject, "partes": [(caminho, início, tamanho)] ou bytes}
+def _pagina(img, dicionario, partes):
+    return {"largura": img.width, "altura": img.height, "dpi": _dpi(img),
+            "dicionario": dicionario, "partes": partes}
+
+
+def _pagina_jpeg(caminho, img):
+    espaco, _ = CORES_PIL.get(img.mode, (None, 8))
+    if espaco is None:
+        return None
+    dicionario = f"/ColorSpace {espaco} /BitsPerComponent 8 /Filter /DCTDecode"
+    if img.mode == "CMYK" and "adobe" in img.info:
+        dicionario += " /Decode [1 0 1 0 1 0 1 0]"  # CMYK invertido do Photoshop
+    return _pagina(img, dicionario, [(caminho, 0, os.path.getsize(caminho))])
+
+
+def _pagina_jpx(caminho, img):
+    return _pagina(img, "/Filter /JPXDecode", [(caminho, 0, os.path.getsize(caminho))])
+
+
+def _pagina_png(caminho, img):
+    idat, paleta, info = [], None, None
+    with open(caminho, "rb") as f:
+        if f.read(8) != ASSINATURA_PNG:
+            return None
+        while True:
+            cabecalho = f.read(8)
+            if len(cabecalho) < 8:
+                return None
+            tamanho, tipo = struct.unpack(">I4s", cabecalho)
+            inicio = f.tell()
+            if tipo == b"IHDR":
+                info = struct.unpack(">IIBBBBB", f.read(13))
+            elif tipo == b"PLTE":
+                paleta = f.read(tamanho)
+            elif tipo == b"tRNS":
+                return None  # transparência: decodifica
+            elif tipo == b"IDAT":
+                idat.append((caminho, inicio, tamanho))
+            elif tipo == b"IEND":
+                break
+            f.seek(inicio + tamanho + 4)  # + CRC
+    if info is None or not idat:
+        return None
+    _, _, bits, tipo_cor, _, _, entrelacado = info
+    if entrelacado or tipo_cor not in CORES_PNG:
+        return None
+    espaco, cores = CORES_PNG[tipo_cor]
+    if tipo_cor == 3:
+        if not paleta:
+            return None
+        espaco = f"[/Indexed /DeviceRGB {len(paleta) // 3 - 1} <{paleta.hex()}>]"
+    parametros = f"/DecodeParms << /Predictor 15 /Colors {cores} /BitsPerComponent {bits} /Columns {img.width} >>"
+    dicionario = f"/ColorSpace {espaco} /BitsPerComponent {bits} /Filter /FlateDecode {parametros}"
+    return _pagina(img, dicionario, idat)
+
+
+def _pagina_g4(caminho, img):
+    tags = img.tag_v2
+    offsets, contagens = tags.get(273), tags.get(279)
+    if img.info.get("compression") != "group4" or not offsets or len(offsets) != 1 or tags.get(266, 1) != 1:
+        return None
+    # o código CCITT descreve trechos brancos/pretos; com BlackIsZero (262 = 1) o TIFF mostra invertido
+    invertido = tags.get(262, 0) == 1
+    dicionario = (f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /CCITTFaxDecode "
+                  f"/DecodeParms << /K -1 /Columns {img.width} /Rows {img.height} "
+                  f"/BlackIs1 {'true' if invertido else 'false'} >>")
+    return _pagina(img, dicionario, [(caminho, offsets[0], contagens[0])])
+
+
+def _pagina_decodificada(img):
+    """Último recurso: decodifica e grava sem perda."""
+    if img.mode not in CORES_PIL:
+        img = img.convert("RGB")
+    espaco, bits = CORES_PIL[img.mode]
+    dados = zlib.compress(img.tobytes(), 6)
+    return _pagina(img, f"/ColorSpace {espaco} /BitsPerComponent {bits} /Filter /FlateDecode", dados)
+
+
+def paginas_de_imagem(img, caminho):
+    """
+    Gera as páginas da imagem já aberta (TIFF pode ter várias), direto do
+    arquivo quando dá; se ela já foi decodificada (OCR), não decodifica de novo.
+    """
+    formato = img.format
+    if formato == "JPEG":
+        yield _pagina_jpeg(caminho, img) or _pagina_decodificada(img)
+    elif formato == "JPEG2000":
+        yield _pagina_jpx(caminho, img)
+    elif formato == "PNG":
+        yield _pagina_png(caminho, img) or _pagina_decodificada(img)
+    elif formato == "TIFF":
+        for quadro in range(getattr(img, "n_frames", 1)):
+            img.seek(quadro)
+            yield _pagina_g4(caminho, img) or _pagina_decodificada(img)
+    else:
+        for quadro in range(getattr(img, "n_frames", 1)):
+            img.seek(quadro)
+            yield _pagina_decodificada(img)
+
+
+def paginas_da_imagem(caminho):
+    with Image.open(caminho) as img:
+        yield from paginas_de_imagem(img, caminho)
+
+
+# -------- escrita ----------
+class EscritorPDF:
+    """PDF mínimo gravado em sequência: objetos na ordem, xref no fim."""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.offsets = {}
+        self.paginas = []
+        self.proximo = 3  # 1 = catálogo, 2 = árvore de páginas (gravados no fim)
+        self._gravar(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+
+    def _gravar(self, dados):
+        self.arquivo.write(dados if isinstance(dados, bytes) else dados.encode("latin-1"))
+
+    def _novo_objeto(self):
+        numero = self.proximo
+        self.proximo += 1
+        return numero
+
+    def _abrir_objeto(self, numero):
+        self.offsets[numero] = self.arquivo.tell()
+        self._gravar(f"{numero} 0 obj\n")
+
+    def _objeto(self, numero, corpo):
+        self._abrir_objeto(numero)
+        self._gravar(f"{corpo}\nendobj\n")
+
+    def _stream(self, numero, dicionario, partes):
+        if isinstance(partes, bytes):
+            tamanho = len(partes)
+        else:
+            tamanho = sum(n for _, _, n in partes)
+        self._abrir_objeto(numero)
+        self._gravar(f"<< {dicionario} /Length {tamanho} >>\nstream\n")
+        if isinstance(partes, bytes):
+            self._gravar(partes)
+        else:
+            f = None
+            try:
+                for caminho, inicio, n in partes:  # PNG: muitos IDAT do mesmo arquivo
+                    if f is None or f.name != caminho:
+                        if f is not None:
+                            f.close()
+                        f = open(caminho, "rb")
+                    f.seek(inicio)
+                    while n > 0:
+                        bloco = f.read(min(BLOCO, n))
+                        if not bloco:
+                            raise ValueError(f"Imagem truncada: {caminho}")
+                        self._gravar(bloco)
+                        n -= len(bloco)
+            finally:
+                if f is not None:
+                    f.close()
+        self._gravar("\nendstream\nendobj\n")
+
+    def adicionar(self, pagina, tamanho_pagina=None, margem=0):
+        larg_img = pagina["largura"] * 72 / pagina["dpi"][0]
+        alt_img = pagina["altura"] * 72 / pagina["dpi"][1]
+        if tamanho_pagina:
+            # ajusta dentro das margens, mantendo a proporção, a partir do canto superior esquerdo
+            larg_pag, alt_pag = tamanho_pagina
+            escala = min((larg_pag - 2 * margem) / larg_img, (alt_pag - 2 * margem) / alt_img)
+            larg_img, alt_img = larg_img * escala, alt_img * escala
+            x, y = margem, alt_pag - margem - alt_img
+        else:
+            larg_pag, alt_pag, x, y = larg_img, alt_img, 0, 0
+
+        imagem, conteudo, pag = self._novo_objeto(), self._novo_objeto(), self._novo_objeto()
+        self._stream(imagem, f"/Type /XObject /Subtype /Image /Width {pagina['largura']} "
+                             f"/Height {pagina['altura']} {pagina['dicionario']}", pagina["partes"])
+        desenho = f"q {_num(larg_img)} 0 0 {_num(alt_img)} {_num(x)} {_num(y)} cm /Im0 Do Q".encode("latin-1")
+        self._stream(conteudo, "", desenho)
+        self._objeto(pag, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(larg_pag)} {_num(alt_pag)}] "
+                          f"/Resources << /XObject << /Im0 {imagem} 0 R >> >> /Contents {conteudo} 0 R >>")
+        self.paginas.append(pag)
+
+    def fechar(self):
+        filhos = " ".join(f"{n} 0 R" for n in self.paginas)
+        self._objeto(2, f"<< /Type /Pages /Kids [{filhos}] /Count {len(self.paginas)} >>")
+        self._objeto(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        inicio_xref = self.arquivo.tell()
+        self._gravar(f"xref\n0 {self.proximo}\n0000000000 65535 f \n")
+        for numero in range(1, self.proximo):
+            self._gravar(f"{self.offsets[numero]:010d} 00000 n \n")
+        self._gravar(f"trailer\n<< /Size {self.proximo} /Root 1 0 R >>\nstartxref\n{inicio_xref}\n%%EOF\n")
+
+
+def paginas_para_pdf(paginas, destino, tamanho_pagina=None, margem=0):
+    """
+    Grava as páginas (dicts de paginas_de_imagem, na ordem) num PDF.
+    Grava num temporário ao lado e troca no fim: PDF pela metade não fica
+    com o nome final. Devolve o número de páginas.
+    """
+    temporario = destino + ".parcial"
+    try:
+        with open(temporario, "wb") as f:
+            pdf = EscritorPDF(f)
+            for pagina in paginas:
+                pdf.adicionar(pagina, tamanho_pagina, margem)
+            if not pdf.paginas:
+                raise ValueError("Nenhuma imagem para gravar no PDF")
+            pdf.fechar()
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return len(pdf.paginas)
+
+
+def imagens_para_pdf(caminhos, destino, tamanho_pagina=None, margem=0):
+    """Junta as imagens (na ordem) num PDF, uma página por imagem/quadro, abrindo uma de cada vez."""
+    paginas = (pagina for caminho in caminhos for pagina in paginas_da_imagem(caminho))
+    return paginas_para_pdf(paginas, destino, tamanho_pagina, margem)
+
+
+def imagem_para_pdf(caminho, destino, tamanho_pagina=None, margem=0):
+    return imagens_para_pdf([caminho], destino, tamanho_pagina, margem)
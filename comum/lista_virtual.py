@@ -0,0 +1,162 @@
+# coding: utf-8
+"""
+Peças de interface (Tkinter) para listas enormes.
+- ListaVirtual: Treeview que só cria as linhas visíveis; ao rolar, as mesmas
+  linhas recebem os valores de outra faixa (linha(i) devolve os valores)
+- AtualizacaoPeriodica: um callback na thread da interface a cada N ms que
+  redesenha o que mudou, no lugar de um root.after por evento
+- listar_em_segundo_plano: lista a pasta numa thread e entrega em lotes
+"""
+
+import os
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+INTERVALO_TELA_MS = 100  # 10 quadros por segundo
+ALTURA_LINHA_PADRAO = 20
+ALTURA_CABECALHO_PADRAO = 24
+
+
+class ListaVirtual:
+    """
+    colunas = [(id, título, largura), ...]; linha(i) -> tupla de valores;
+    total() -> quantidade de linhas. Chame redesenhar() quando os dados mudarem.
+    """
+
+    def __init__(self, master, colunas, linha, total, altura=22):
+        self.linha = linha
+        self.total = total
+        self.inicio = 0
+        self.visiveis = altura
+        self.frame = tk.Frame(master)
+        self.tree = ttk.Treeview(self.frame, columns=[c for c, _, _ in colunas], show="headings",
+                                 height=altura, selectmode="none")
+        for coluna, titulo, largura in colunas:
+            self.tree.heading(coluna, text=titulo)
+            self.tree.column(coluna, width=largura)
+        self.barra = ttk.Scrollbar(self.frame, orient="vertical", command=self._rolar_barra)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.barra.pack(side="right", fill="y")
+        self.itens = []
+
+        self.tree.bind("<MouseWheel>", lambda e: self.rolar(-1 if e.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.rolar(-1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.rolar(1, "units"))
+        self.tree.bind("<Configure>", self._redimensionar)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def _redimensionar(self, evento):
+        altura_linha, cabecalho = ALTURA_LINHA_PADRAO, ALTURA_CABECALHO_PADRAO
+        if self.itens:
+            caixa = self.tree.bbox(self.itens[0])
+            if caixa:
+                cabecalho, altura_linha = caixa[1], caixa[3]
+        visiveis = max(1, (evento.height - cabecalho) // max(1, altura_linha))
+        if visiveis != self.visiveis:
+            self.visiveis = visiveis
+            self.redesenhar()
+
+    def _rolar_barra(self, acao, *args):
+        if acao == "moveto":
+            self.inicio = int(float(args[0]) * self.total())
+            self.redesenhar()
+        elif acao == "scroll":
+            self.rolar(int(args[0]), args[1])
+
+    def rolar(self, passos, unidade="units"):
+        self.inicio += passos * (self.visiveis if unidade == "pages" else 3)
+        self.redesenhar()
+
+    def mostrar(self, indice):
+        """Rola o mínimo para o índice ficar visível."""
+        if indice < self.inicio:
+            self.inicio = indice
+        elif indice >= self.inicio + self.visiveis:
+            self.inicio = indice - self.visiveis + 1
+        self.redesenhar()
+
+    def redesenhar(self):
+        total = self.total()
+        self.inicio = max(0, min(self.inicio, total - self.visiveis))
+        quantidade = max(0, min(self.visiveis, total - self.inicio))
+        while len(self.itens) < quantidade:
+            self.itens.append(self.tree.insert("", "end", values=()))
+        while len(self.itens) > quantidade:
+            self.tree.delete(self.itens.pop())
+        for deslocamento, item in enumerate(self.itens):
+            valores = tuple(self.linha(self.inicio + deslocamento))
+            if tuple(self.tree.item(item, "values")) != valores:
+                self.tree.item(item, values=valores)
+        if total:
+            self.barra.set(self.inicio / total, (self.inicio + quantidade) / total)
+        else:
+            self.barra.set(0, 1)
+
+
+class AtualizacaoPeriodica:
+    """
+    Roda `funcao` na thread da interface a cada `intervalo_ms` enquanto ela
+    devolver True; iniciar() de novo retoma. parar() cancela e roda uma última vez.
+    """
+
+    def __init__(self, root, funcao, intervalo_ms=INTERVALO_TELA_MS):
+        self.root = root
+        self.funcao = funcao
+        self.intervalo_ms = intervalo_ms
+        self._id = None
+
+    def iniciar(self):
+        if self._id is None:
+            self._id = self.root.after(self.intervalo_ms, self._quadro)
+
+    def _quadro(self):
+        self._id = None
+        if self.funcao():
+            self.iniciar()
+
+    def parar(self):
+        if self._id is not None:
+            self.root.after_cancel(self._id)
+            self._id = None
+        self.funcao()
+
+
+def listar_em_segundo_plano(pasta, filtro_ext, entregar, terminar, cancelado, lote=500):
+    """
+    Lista os arquivos de `pasta` (sem subpastas) numa thread; entregar(nomes)
+    recebe lotes e terminar() é chamado no fim. Nada aqui toca no Tk: quem
+    recebe guarda os lotes e o redesenho fica para a AtualizacaoPeriodica.
+    """
+    filtro_ext = (filtro_ext or "").lower()
+
+    def listar():
+        nomes = []
+        try:
+            with os.scandir(pasta) as it:
+                for entrada in it:
+                    if cancelado():
+                        return
+                    try:
+                        if not entrada.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    if filtro_ext and not entrada.name.lower().endswith(filtro_ext):
+                        continue
+                    nomes.append(entrada.name)
+                    if len(nomes) >= lote:
+                        entregar(nomes)
+                        nomes = []
+        except OSError as e:
+            print(f"Erro ao ler pasta {pasta}: {e}")
+        finally:
+            if nomes and not cancelado():
+                entregar(nomes)
+            terminar()
+
+    thread = threading.Thread(target=listar, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,73 @@
+# coding: utf-8
+"""
+Modelos de layout para formulários de posição fixa (OCR só nas regiões).
+- "caixa" = (x0, y0, x1, y1) relativo à página (0..1, origem no canto superior esquerdo)
+- cada região tem seu DPI, PSM do Tesseract e whitelist de caracteres
+- "valor_direto": a caixa contém só o valor (sem o rótulo "Nº de Série"),
+  validado por "padrao_valor" quando informado
+- modelos extras podem vir de um JSON (modelos_layout.json ou MODELOS_LAYOUT_ARQUIVO)
+"""
+
+import json
+import os
+
+# coordenadas medidas no RAT ATESTE impresso em A4; ajuste se o formulário mudar
+MODELOS_LAYOUT = {
+    "RAT ATESTE": {
+        "descricao": "RAT ATESTE - caixa \"Nº de Série\" no cabeçalho",
+        "regioes": [
+            {
+                "nome": "serie",
+                "pagina": 1,
+                "caixa": (0.55, 0.12, 0.97, 0.17),
+                "dpi": 300,
+                "psm": 7,
+                "whitelist": "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-.",
+                "valor_direto": True,
+                "padrao_valor": r"[A-Za-z0-9\-\.]{3,}",
+            },
+            {
+                "nome": "serie_rotulo",
+                "pagina": 1,
+                "caixa": (0.05, 0.10, 0.97, 0.22),
+                "dpi": 200,
+                "psm": 6,
+                "whitelist": "",
+                "valor_direto": False,
+            },
+        ],
+    },
+}
+
+ARQUIVO_MODELOS = os.environ.get("MODELOS_LAYOUT_ARQUIVO") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "modelos_layout.json")
+
+
+def carregar_modelos(caminho=None):
+    """Modelos embutidos + os do JSON (o JSON sobrescreve pelo nome)."""
+    modelos = dict(MODELOS_LAYOUT)
+    caminho = caminho or ARQUIVO_MODELOS
+    if os.path.isfile(caminho):
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                modelos.update(json.load(f))
+        except Exception as e:
+            print(f"Erro ao ler modelos de layout {caminho}: {e}")
+    return modelos
+
+
+def nomes_modelos():
+    return sorted(carregar_modelos())
+
+
+def obter_modelo(nome):
+    if not nome:
+        return None
+    return carregar_modelos().get(nome)
+
+
+def config_tesseract(regiao):
+    config = f"--psm {int(regiao.get('psm', 6))}"
+    if regiao.get("whitelist"):
+        config += f" -c tessedit_char_whitelist={regiao['whitelist']}"
+    return config
@@ -0,0 +1,179 @@
+# coding: utf-8
+"""
+Motor de OCR reaproveitado entre páginas e arquivos.
+- "tesserocr": API da libtesseract no próprio processo; o traineddata é
+  carregado uma vez por thread e idioma e fica vivo entre os arquivos
+- "pytesseract": um processo tesseract por chamada (o caminho de sempre),
+  usado quando o tesserocr não está instalado ou não inicializa
+  (o tesserocr é opcional: pip install tesserocr)
+- Escolha por variável de ambiente (vale nos processos do pool):
+  OCR_MOTOR = auto | tesserocr | pytesseract  (auto = tesserocr se houver);
+  TESSERACT_CMD = executável do tesseract (pytesseract)
+- A API do tesserocr não pode ser dividida entre threads: cada thread tem o seu motor
+"""
+
+import atexit
+import os
+import shlex
+import threading
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+MOTOR_AUTO = "auto"
+MOTOR_TESSEROCR = "tesserocr"
+MOTOR_PYTESSERACT = "pytesseract"
+
+
+def configurar_motor(nome=MOTOR_AUTO):
+    os.environ["OCR_MOTOR"] = nome or MOTOR_AUTO
+
+
+def nome_motor_configurado():
+    return os.environ.get("OCR_MOTOR", MOTOR_AUTO)
+
+
+def separar_config(config):
+    """'--psm 7 -c chave=valor' -> (7, {"chave": "valor"}); psm None se não vier."""
+    psm, variaveis = None, {}
+    partes = shlex.split(config or "")
+    for i, parte in enumerate(partes):
+        if parte == "--psm" and i + 1 < len(partes):
+            psm = int(partes[i + 1])
+        elif parte == "-c" and i + 1 < len(partes) and "=" in partes[i + 1]:
+            chave, valor = partes[i + 1].split("=", 1)
+            variaveis[chave] = valor
+    return psm, variaveis
+
+
+def dados_de_image_to_data(dados):
+    """Saída do image_to_data (DICT) -> {"texto": ..., "palavras": [[palavra, confiança], ...]}."""
+    linhas = {}
+    palavras = []
+    for i, palavra in enumerate(dados["text"]):
+        palavra = (palavra or "").strip()
+        if not palavra:
+            continue
+        linha = (dados["block_num"][i], dados["par_num"][i], dados["line_num"][i])
+        linhas.setdefault(linha, []).append(palavra)
+        conf = float(dados["conf"][i])
+        if conf >= 0:
+            palavras.append([palavra, conf])
+    return {"texto": "\n".join(" ".join(p) for p in linhas.values()), "palavras": palavras}
+
+
+class MotorPytesseract:
+    nome = MOTOR_PYTESSERACT
+
+    def __init__(self):
+        # executável configurado por variável de ambiente (GUI/CLI), vale também nos processos do pool
+        if os.environ.get("TESSERACT_CMD"):
+            pytesseract.pytesseract.tesseract_cmd = os.environ["TESSERACT_CMD"]
+
+    def texto(self, imagem, lang, config=""):
+        return pytesseract.image_to_string(imagem, lang=lang, config=config)
+
+    def dados(self, imagem, lang, config=""):
+        return dados_de_image_to_data(pytesseract.image_to_data(imagem, lang=lang, config=config,
+                                                                output_type=pytesseract.Output.DICT))
+
+    def versao(self):
+        return str(pytesseract.get_tesseract_version())
+
+    def fechar(self):
+        pass
+
+
+class MotorTesserocr:
+    """Uma PyTessBaseAPI por (idioma, variáveis -c); o PSM muda por chamada sem recarregar."""
+    nome = MOTOR_TESSEROCR
+
+    def __init__(self):
+        self.apis = {}
+        self.caminho_tessdata = os.environ.get("TESSDATA_PREFIX") or tesserocr.get_languages()[0]
+
+    def _api(self, lang, variaveis):
+        chave = (lang, tuple(sorted(variaveis.items())))
+        api = self.apis.get(chave)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(path=self.caminho_tessdata, lang=lang)
+            for nome, valor in variaveis.items():
+                api.SetVariable(nome, valor)
+            self.apis[chave] = api
+        return api
+
+    def _preparar(self, imagem, lang, config):
+        psm, variaveis = separar_config(config)
+        api = self._api(lang, variaveis)
+        api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+        if isinstance(imagem, str):
+            api.SetImageFile(imagem)
+        else:
+            api.SetImage(imagem)
+        return api
+
+    def texto(self, imagem, lang, config=""):
+        api = self._preparar(imagem, lang, config)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def dados(self, imagem, lang, config=""):
+        api = self._preparar(imagem, lang, config)
+        try:
+            texto = api.GetUTF8Text()
+            palavras = [[palavra.strip(), float(conf)] for palavra, conf in api.MapWordConfidences()
+                        if palavra.strip() and conf >= 0]
+            return {"texto": texto, "palavras": palavras}
+        finally:
+            api.Clear()
+
+    def versao(self):
+        return tesserocr.tesseract_version().splitlines()[0]
+
+    def fechar(self):
+        for api in self.apis.values():
+            api.End()
+        self.apis.clear()
+
+
+_local = threading.local()
+_motores = []
+_trava = threading.Lock()
+
+
+def criar_motor(nome=None):
+    nome = nome or nome_motor_configurado()
+    if nome != MOTOR_PYTESSERACT and tesserocr is not None:
+        try:
+            return MotorTesserocr()
+        except Exception as e:
+            print(f"tesserocr indisponível, usando pytesseract: {e}")
+    return MotorPytesseract()
+
+
+def obter_motor():
+    """Motor da thread atual, criado na primeira chamada e reaproveitado depois."""
+    motor = getattr(_local, "motor", None)
+    configurado = nome_motor_configurado()
+    if motor is None or _local.configurado != configurado:
+        if motor is not None:
+            motor.fechar()
+        motor = _local.motor = criar_motor(configurado)
+        _local.configurado = configurado
+        with _trava:
+            _motores.append(motor)
+    return motor
+
+
+@atexit.register
+def fechar_motores():
+    with _trava:
+        for motor in _motores:
+            motor.fechar()
+        _motores.clear()
@@ -0,0 +1,71 @@
+# coding: utf-8
+"""
+Nomes de saída sem colisão, sem testar nome por nome no disco.
+- A pasta destino é lida uma vez (os.scandir); os nomes ocupados ficam num
+  conjunto e, para cada nome pedido, o próximo sufixo _N a tentar
+- Cada nome entregue é criado vazio com O_EXCL (reserva atômica): outro
+  worker, outro processo ou um arquivo que apareceu durante a execução
+  fazem a criação falhar e o alocador passa para o próximo sufixo
+- Quem grava o arquivo substitui a reserva (os.replace, cópia, etc.);
+  se a gravação falhar, liberar() apaga a reserva vazia
+- Com `diario` (comum/diario.py), cada reserva é registrada: se a execução
+  cair antes de gravar, retomar ou desfazer apaga a reserva que ficou vazia
+"""
+
+import os
+import threading
+
+
+def chave_nome(nome):
+    return os.path.normcase(nome)  # Windows: maiúsculas e minúsculas são o mesmo arquivo
+
+
+class AlocadorNomes:
+    def __init__(self, pasta, diario=None):
+        self.pasta = pasta
+        self.diario = diario
+        self.trava = threading.Lock()
+        self.ocupados = None  # lido no primeiro alocar()
+        self.proximo = {}  # chave do nome pedido -> próximo sufixo a tentar
+
+    def _ler_pasta(self):
+        self.ocupados = set()
+        try:
+            with os.scandir(self.pasta) as it:
+                for entrada in it:
+                    self.ocupados.add(chave_nome(entrada.name))
+        except FileNotFoundError:
+            pass
+
+    def alocar(self, nome):
+        """Reserva e devolve o caminho livre: nome, nome_1, nome_2..."""
+        base, ext = os.path.splitext(nome)
+        chave = chave_nome(nome)
+        with self.trava:
+            if self.ocupados is None:
+                self._ler_pasta()
+            n = self.proximo.get(chave, 0)
+            while True:
+                candidato = f"{base}_{n}{ext}" if n else nome
+                n += 1
+                if chave_nome(candidato) in self.ocupados:
+                    continue
+                self.ocupados.add(chave_nome(candidato))
+                caminho = os.path.join(self.pasta, candidato)
+                try:
+                    os.close(os.open(caminho, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+                except FileExistsError:
+                    continue  # apareceu depois da leitura da pasta
+                self.proximo[chave] = n
+                break
+        if self.diario is not None:
+            self.diario.reservado(caminho)
+        return caminho
+
+    def liberar(self, caminho):
+        """Apaga a reserva se ela continua vazia (a gravação falhou); o nome não volta a ser usado."""
+        try:
+            if os.path.getsize(caminho) == 0:
+                os.remove(caminho)
+        except OSError:
+            pass
@@ -0,0 +1,48 @@
+# coding: utf-8
+"""
+Execução em pool com resultados na ordem de entrada.
+- modo "processo": OCR / rasterização (CPU)
+- modo "thread": cópia / conversão (I/O)
+- workers <= 1 roda tudo na thread atual, sem pool
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+MODO_PROCESSO = "processo"
+MODO_THREAD = "thread"
+
+
+def criar_executor(workers, modo=MODO_PROCESSO, inicializador=None, initargs=()):
+    if modo == MODO_PROCESSO:
+        return ProcessPoolExecutor(max_workers=workers, initializer=inicializador, initargs=initargs)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def executar_em_ordem(funcao, itens, workers=1, modo=MODO_PROCESSO, janela=None, inicializador=None, initargs=()):
+    """
+    Gera funcao(*item) para cada item de `itens`, sempre na ordem de entrada.
+    `itens` é consumido sob demanda: no máximo `janela` tarefas ficam em voo,
+    então iteradores longos não são carregados inteiros na memória.
+    Fechar o gerador (break + close) cancela o que ainda não começou.
+    `inicializador(*initargs)` roda uma vez em cada processo do pool.
+    """
+    if workers <= 1:
+        for item in itens:
+            yield funcao(*item)
+        return
+
+    janela = janela or workers * 2
+    executor = criar_executor(workers, modo, inicializador, initargs)
+    pendentes = deque()
+    try:
+        for item in itens:
+            pendentes.append(executor.submit(funcao, *item))
+            if len(pendentes) >= janela:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+    finally:
+        for fut in pendentes:
+            fut.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,194 @@
+# coding: utf-8
+"""
+Pipeline por etapas com filas limitadas entre elas.
+- Cada etapa tem uma thread própria que despacha para o seu pool (processos,
+  threads ou na própria thread) com a concorrência da etapa; a saída de cada
+  etapa sai na ordem de entrada e é entregue assim que fica pronta
+- Filas com tamanho máximo: a etapa rápida espera a lenta em vez de acumular
+- Cancelamento (cancelado()): a entrada para; etapas "canceláveis" param de
+  pegar itens novos, mas entregam o que já terminou ou está rodando; as
+  demais processam o que já receberam. Fechar o gerador encerra tudo e espera as threads
+- Erro num item (Exception em funcao) não para o pipeline: o item vira uma
+  Falha, que segue pelas próximas etapas no lugar do resultado, na mesma
+  posição, sem rodar nelas; cada etapa com ao_falhar(falha) a recebe (na
+  thread da etapa, em ordem) e devolve o que segue adiante
+- Regra que evita travar: toda etapa lê a sua fila até o FIM e escreve FIM uma vez
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, wait
+
+from comum.paralelo import criar_executor, MODO_THREAD
+
+FIM = object()
+INTERVALO = 0.05  # s entre verificações de cancelamento
+
+
+class Falha:
+    """Item que deu erro na etapa `etapa`; `item` = argumentos com que ela foi chamada."""
+
+    def __init__(self, etapa, erro, item):
+        self.etapa = etapa
+        self.erro = erro
+        self.item = item
+        self.registro = None  # livre para quem acompanha o item (ao_falhar)
+
+    def __repr__(self):
+        return f"Falha({self.etapa!r}, {self.erro!r})"
+
+
+def etapa(nome, funcao, workers=1, modo=MODO_THREAD, cancelavel=True, inicializador=None, initargs=(),
+          ao_falhar=None):
+    """
+    funcao(*item) -> item da próxima etapa. workers <= 1 roda na thread da etapa, sem pool.
+    ao_falhar(falha) -> o que segue no lugar de uma Falha desta etapa ou das anteriores.
+    """
+    return {"nome": nome, "funcao": funcao, "workers": max(1, int(workers or 1)), "modo": modo,
+            "cancelavel": cancelavel, "inicializador": inicializador, "initargs": initargs,
+            "ao_falhar": ao_falhar}
+
+
+def _colocar(fila, item, parar):
+    """Coloca na fila esperando vaga; desiste (False) se o pipeline for encerrado."""
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=INTERVALO)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _colocar_fim(fila):
+    fila.put(FIM)  # quem está depois sempre lê até o FIM, então a vaga aparece
+
+
+def _descartar_ate_fim(fila):
+    while fila.get() is not FIM:
+        pass
+
+
+def _alimentar(itens, saida, parar, cancelado, erros):
+    try:
+        for item in itens:
+            if parar.is_set() or cancelado() or not _colocar(saida, item, parar):
+                break
+    except BaseException as e:
+        erros.append(e)
+        parar.set()
+    finally:
+        _colocar_fim(saida)
+
+
+def _saida_falha(etp, falha):
+    return etp["ao_falhar"](falha) if etp["ao_falhar"] else falha
+
+
+def _resultado(etp, fut, item):
+    """Resultado do futuro ou, se a função deu erro, a Falha no lugar dele."""
+    if isinstance(item, Falha):
+        return _saida_falha(etp, item)
+    try:
+        return fut.result()
+    except Exception as e:
+        return _saida_falha(etp, Falha(etp["nome"], e, item))
+
+
+def _rodar_etapa(etp, entrada, saida, parar, cancelado, erros):
+    janela = etp["workers"] * 2
+    executor = None
+    if etp["workers"] > 1:
+        executor = criar_executor(etp["workers"], etp["modo"], etp["inicializador"], etp["initargs"])
+    pendentes = deque()  # (futuro, item) em voo, na ordem de entrada
+    recebeu_fim = False
+    try:
+        while not parar.is_set() and not (etp["cancelavel"] and cancelado()):
+            # entrega o que já terminou, na ordem de entrada
+            while pendentes and pendentes[0][0].done():
+                if not _colocar(saida, _resultado(etp, *pendentes.popleft()), parar):
+                    break
+            if recebeu_fim and not pendentes:
+                break
+            if recebeu_fim or len(pendentes) >= janela:
+                wait([pendentes[0][0]], timeout=INTERVALO)
+                continue
+            try:
+                item = entrada.get(timeout=INTERVALO)
+            except queue.Empty:
+                continue
+            if item is FIM:
+                recebeu_fim = True
+            elif isinstance(item, Falha):
+                if pendentes:
+                    # entra na fila de entrega atrás dos que estão em voo
+                    fut = Future()
+                    fut.set_result(None)
+                    pendentes.append((fut, item))
+                else:
+                    _colocar(saida, _saida_falha(etp, item), parar)
+            elif executor is None:
+                try:
+                    resultado = etp["funcao"](*item)
+                except Exception as e:
+                    resultado = _saida_falha(etp, Falha(etp["nome"], e, item))
+                _colocar(saida, resultado, parar)
+            else:
+                pendentes.append((executor.submit(etp["funcao"], *item), item))
+        # cancelado: o que não começou fica; o que terminou ou está rodando é entregue
+        for fut, _ in pendentes:
+            fut.cancel()
+        while pendentes and not parar.is_set() and not pendentes[0][0].cancelled():
+            if not _colocar(saida, _resultado(etp, *pendentes.popleft()), parar):
+                break
+    except BaseException as e:
+        erros.append(e)
+        parar.set()
+    finally:
+        for fut, _ in pendentes:
+            fut.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if not recebeu_fim:
+            _descartar_ate_fim(entrada)
+        _colocar_fim(saida)
+
+
+def executar_pipeline(itens, etapas, cancelado=None, tamanho_fila=None):
+    """
+    Passa cada item de `itens` (tuplas de argumentos da 1ª etapa) por todas
+    as etapas e gera a saída da última, na ordem de entrada.
+    `itens` é consumido sob demanda numa thread própria.
+    """
+    cancelado = cancelado or (lambda: False)
+    parar = threading.Event()
+    erros = []
+    filas = [queue.Queue(maxsize=tamanho_fila or max(2, etp["workers"] * 2))
+             for etp in etapas] + [queue.Queue(maxsize=tamanho_fila or 4)]
+    threads = [threading.Thread(target=_alimentar, args=(itens, filas[0], parar, cancelado, erros),
+                                name="pipeline-entrada", daemon=True)]
+    for i, etp in enumerate(etapas):
+        threads.append(threading.Thread(target=_rodar_etapa,
+                                        args=(etp, filas[i], filas[i + 1], parar, cancelado, erros),
+                                        name=f"pipeline-{etp['nome']}", daemon=True))
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            item = filas[-1].get()
+            if item is FIM:
+                break
+            yield item
+    finally:
+        if any(t.is_alive() for t in threads):
+            parar.set()
+            while any(t.is_alive() for t in threads):
+                try:
+                    filas[-1].get(timeout=INTERVALO)
+                except queue.Empty:
+                    pass
+        for t in threads:
+            t.join()
+    if erros:
+        raise erros[0]
@@ -0,0 +1,311 @@
+# coding: utf-8
+"""
+Pré-processamento das páginas antes do Tesseract, vetorizado com NumPy.
+- Receita = etapas separadas por vírgula, aplicadas na ordem escrita:
+  cinza, recortar, reduzir, endireitar, binarizar ("nenhum" = imagem como veio)
+- A imagem vira array uma vez; o PPM do modo "disco" (comum/rasterizacao.py)
+  é mapeado com np.memmap, sem decodificar. As etapas trabalham em visões
+  (recortar é fatia, reduzir é reshape) e gravam com out= sempre que dá
+- cinza: BT.601 em inteiros; binarizar: Sauvola (limiar local pela média e
+  desvio da janela) com imagens integrais, em faixas para limitar a memória
+- reduzir: altura-x pela moda das corridas verticais de tinta (hastes de
+  n, m, u...) e média de blocos até perto de ALTURA_X_ALVO; nunca amplia
+- endireitar: ângulo em que o perfil horizontal da tinta fica mais "pontudo"
+  (todos os ângulos de uma vez); a rotação em si é do PIL
+- Cada etapa é medida em `tempos` como "pre_<etapa>"; a leitura da imagem para
+  o array, como "pre_array"
+- Receita padrão por variável de ambiente (vale nos processos do pool): OCR_PREPROCESSAMENTO
+"""
+
+import os
+import re
+
+import numpy as np
+from PIL import Image
+
+from comum.tempos import Tempos
+
+RECEITA_PADRAO = "cinza,recortar,reduzir"
+SEM_PREPROCESSAMENTO = "nenhum"
+
+ALTURA_X_ALVO = 30  # px; o Tesseract perde precisão bem abaixo disso e só gasta tempo bem acima
+PASSO_AMOSTRA = 2  # estimativas (limiar, bordas, inclinação) numa amostra 1 a cada N pixels
+
+# recortar: linha/coluna com mais tinta que isso é borda escura do scanner
+FRACAO_BORDA = 0.6
+MARGEM_RECORTE = 0.01  # da menor dimensão; o Tesseract quer um pouco de branco em volta
+
+# endireitar: ângulos testados (graus) e o mínimo que vale girar
+INCLINACAO_MAXIMA = 5.0
+PASSO_INCLINACAO = 0.25
+INCLINACAO_MINIMA = 0.1
+PONTOS_INCLINACAO = 60000
+
+# binarizar (Sauvola): T = média * (1 + K * (desvio / R - 1))
+JANELA_SAUVOLA = 25
+K_SAUVOLA = 0.34
+R_SAUVOLA = 128.0
+LINHAS_POR_FAIXA = 512
+
+PNM = re.compile(rb"(P[56])\s+(\d+)\s+(\d+)\s+(\d+)\s")
+
+
+def configurar_preprocessamento(receita=None):
+    os.environ["OCR_PREPROCESSAMENTO"] = receita or SEM_PREPROCESSAMENTO
+
+
+def receita_padrao():
+    return os.environ.get("OCR_PREPROCESSAMENTO", RECEITA_PADRAO)
+
+
+def interpretar_receita(receita=None):
+    """'cinza, reduzir' -> ["cinza", "reduzir"]; None = receita padrão; "nenhum" = []."""
+    receita = receita_padrao() if receita is None else receita
+    etapas = [e.strip().lower() for e in receita.split(",") if e.strip()]
+    etapas = [e for e in etapas if e != SEM_PREPROCESSAMENTO]
+    desconhecidas = [e for e in etapas if e not in ETAPAS]
+    if desconhecidas:
+        raise ValueError(f"Etapa de pré-processamento desconhecida: {', '.join(desconhecidas)} "
+                         f"(use {', '.join(ETAPAS)} ou {SEM_PREPROCESSAMENTO})")
+    return etapas
+
+
+def chave_receita(receita=None):
+    """Parte da chave do cache de OCR: outra receita é outro texto."""
+    return "pre=" + (",".join(interpretar_receita(receita)) or SEM_PREPROCESSAMENTO)
+
+
+# -------- array ----------
+def ler_pnm(caminho):
+    """PGM/PPM de 8 bits mapeado do disco (np.memmap), sem decodificar; None se não for."""
+    with open(caminho, "rb") as f:
+        m = PNM.match(f.read(64))
+    if not m or int(m.group(4)) != 255:
+        return None
+    largura, altura = int(m.group(2)), int(m.group(3))
+    forma = (altura, largura) if m.group(1) == b"P5" else (altura, largura, 3)
+    return np.memmap(caminho, dtype=np.uint8, mode="r", offset=m.end(), shape=forma)
+
+
+def para_array(imagem):
+    """PIL ou caminho -> array uint8 (altura, largura) ou (altura, largura, 3)."""
+    if isinstance(imagem, str):
+        arr = ler_pnm(imagem)
+        if arr is not None:
+            return arr
+        with Image.open(imagem) as img:
+            return para_array(img)
+    if imagem.mode not in ("L", "RGB"):
+        imagem = imagem.convert("L" if imagem.mode in ("1", "LA", "I", "I;16", "F") else "RGB")
+    return np.asarray(imagem)
+
+
+def limiar_otsu(cinza):
+    """Limiar de Otsu pelo histograma (amostra da imagem)."""
+    hist = np.bincount(cinza[::PASSO_AMOSTRA, ::PASSO_AMOSTRA].ravel(), minlength=256).astype(np.float64)
+    peso = np.cumsum(hist)
+    soma = np.cumsum(hist * np.arange(256))
+    total, soma_total = peso[-1], soma[-1]
+    fundo = total - peso
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entre = (soma_total * peso - soma * total) ** 2 / (peso * fundo)
+    entre[~np.isfinite(entre)] = 0
+    return int(np.argmax(entre))
+
+
+def mascara_tinta(cinza, passo=PASSO_AMOSTRA):
+    """Pixels escuros da amostra, sem os pontos soltos (ruído do scanner)."""
+    tinta = cinza[::passo, ::passo] <= limiar_otsu(cinza)
+    vizinha = np.zeros_like(tinta)
+    vizinha[1:] |= tinta[:-1]
+    vizinha[:-1] |= tinta[1:]
+    vizinha[:, 1:] |= tinta[:, :-1]
+    vizinha[:, :-1] |= tinta[:, 1:]
+    tinta &= vizinha
+    return tinta
+
+
+# -------- etapas: (array, contexto) -> array ----------
+def cinza(arr, contexto=None):
+    if arr.ndim == 2:
+        return arr
+    # (77 R + 150 G + 29 B) / 256: soma máxima 65280 cabe em uint16
+    soma = np.empty(arr.shape[:2], np.uint16)
+    parcela = np.empty_like(soma)
+    np.multiply(arr[..., 0], 77, out=soma, dtype=np.uint16)
+    np.multiply(arr[..., 1], 150, out=parcela, dtype=np.uint16)
+    soma += parcela
+    np.multiply(arr[..., 2], 29, out=parcela, dtype=np.uint16)
+    soma += parcela
+    soma >>= 8
+    return soma.astype(np.uint8)
+
+
+def recortar_bordas(arr, contexto=None):
+    """Corta as margens vazias e as bordas escuras do scanner; devolve uma visão."""
+    tinta = mascara_tinta(cinza(arr))
+    tinta[tinta.mean(axis=1) >= FRACAO_BORDA] = False
+    tinta[:, tinta.mean(axis=0) >= FRACAO_BORDA] = False
+    linhas = np.flatnonzero(np.count_nonzero(tinta, axis=1) >= 2)
+    colunas = np.flatnonzero(np.count_nonzero(tinta, axis=0) >= 2)
+    if not linhas.size or not colunas.size:
+        return arr
+    altura, largura = arr.shape[:2]
+    margem = max(8, int(min(altura, largura) * MARGEM_RECORTE))
+    y0, y1 = max(0, linhas[0] * PASSO_AMOSTRA - margem), min(altura, (linhas[-1] + 1) * PASSO_AMOSTRA + margem)
+    x0, x1 = max(0, colunas[0] * PASSO_AMOSTRA - margem), min(largura, (colunas[-1] + 1) * PASSO_AMOSTRA + margem)
+    return arr[y0:y1, x0:x1]
+
+
+def corridas_verticais(tinta):
+    """Comprimento de cada corrida vertical de tinta, todas as colunas de uma vez."""
+    colunas = np.zeros((tinta.shape[1], tinta.shape[0] + 2), np.int8)
+    colunas[:, 1:-1] = tinta.T
+    bordas = np.diff(colunas, axis=1)  # a coluna começa e termina sem tinta: inícios e fins se alternam
+    return np.flatnonzero(bordas == -1) - np.flatnonzero(bordas == 1)
+
+
+def estimar_altura_x(cinza_arr):
+    """
+    Altura-x em pixels: a corrida vertical mais comum é a espessura do traço;
+    das bem mais longas (curvas e diagonais dão corridas curtas), a que soma
+    mais tinta é a haste das minúsculas.
+    """
+    corridas = corridas_verticais(mascara_tinta(cinza_arr, passo=1)[:, ::PASSO_AMOSTRA])
+    if corridas.size < 100:
+        return None
+    hist = np.bincount(corridas)
+    espessura = int(np.argmax(hist))
+    hist = np.convolve(hist * np.arange(hist.size), np.ones(3), mode="same")  # tinta por comprimento, ±1 px
+    hist[:3 * espessura + 1] = 0
+    return int(np.argmax(hist)) if hist.any() else None
+
+
+def reduzir(arr, contexto=None):
+    """Média de blocos fator x fator até a altura-x chegar perto do alvo."""
+    contexto = contexto if contexto is not None else {}
+    altura_x = contexto.get("altura_x") or estimar_altura_x(cinza(arr))
+    contexto["altura_x"] = altura_x
+    fator = int(altura_x // ALTURA_X_ALVO) if altura_x else 0
+    if fator < 2:
+        return arr
+    altura, largura = arr.shape[0] // fator * fator, arr.shape[1] // fator * fator
+    blocos = arr[:altura, :largura].reshape((altura // fator, fator, largura // fator, fator) + arr.shape[2:])
+    soma = blocos.sum(axis=(1, 3), dtype=np.uint32)
+    soma += fator * fator // 2
+    soma //= fator * fator
+    contexto["altura_x"] = altura_x // fator
+    return soma.astype(np.uint8)
+
+
+def estimar_inclinacao(cinza_arr):
+    """Ângulo (graus) que deixa as linhas de texto na horizontal; todos os candidatos numa passada."""
+    ys, xs = np.nonzero(mascara_tinta(cinza_arr))
+    if ys.size < 100:
+        return 0.0
+    if ys.size > PONTOS_INCLINACAO:
+        ys, xs = ys[::ys.size // PONTOS_INCLINACAO], xs[::xs.size // PONTOS_INCLINACAO]
+    melhor = 0.0
+    for amplitude, passo in ((INCLINACAO_MAXIMA, PASSO_INCLINACAO), (PASSO_INCLINACAO, PASSO_INCLINACAO / 10)):
+        angulos = melhor + np.arange(-amplitude, amplitude + passo / 2, passo)
+        # linha de cada ponto girado por cada ângulo: (ângulos, pontos)
+        linhas = np.rint(ys[None, :] + xs[None, :] * np.tan(np.radians(angulos))[:, None]).astype(np.int64)
+        linhas -= linhas.min()
+        total = int(linhas.max()) + 1
+        linhas += np.arange(len(angulos))[:, None] * total
+        perfis = np.bincount(linhas.ravel(), minlength=len(angulos) * total).reshape(len(angulos), total)
+        nitidez = (perfis.astype(np.float64) ** 2).sum(axis=1)
+        melhor = float(angulos[np.argmax(nitidez)])
+    return melhor
+
+
+def endireitar(arr, contexto=None):
+    angulo = estimar_inclinacao(cinza(arr))
+    if contexto is not None:
+        contexto["inclinacao"] = angulo
+    if abs(angulo) < INCLINACAO_MINIMA:
+        return arr
+    branco = 255 if arr.ndim == 2 else (255, 255, 255)
+    img = Image.fromarray(arr).rotate(-angulo, resample=Image.BILINEAR, fillcolor=branco)
+    return np.asarray(img)
+
+
+def _somas_janela(faixa, raio):
+    """
+    Soma de cada janela (2 raio + 1)² da faixa já cercada de `raio` zeros:
+    imagem integral e quatro fatias, sem índices avulsos.
+    """
+    integral = np.zeros((faixa.shape[0] + 1, faixa.shape[1] + 1), np.float64)
+    np.cumsum(faixa, axis=0, out=integral[1:, 1:])
+    np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+    lado = 2 * raio + 1
+    soma = integral[lado:, lado:] - integral[:-lado, lado:]
+    soma -= integral[lado:, :-lado]
+    soma += integral[:-lado, :-lado]
+    return soma
+
+
+def binarizar_sauvola(arr, contexto=None):
+    """Sauvola por faixas de LINHAS_POR_FAIXA linhas; texto 0, fundo 255."""
+    arr = cinza(arr)
+    altura_x = (contexto or {}).get("altura_x")
+    janela = max(JANELA_SAUVOLA, 2 * altura_x + 1) if altura_x else JANELA_SAUVOLA
+    raio = janela // 2
+    altura, largura = arr.shape
+    # pixels de verdade em cada janela (menos perto das bordas)
+    x = np.arange(largura)
+    n_x = np.minimum(x + raio + 1, largura) - np.maximum(x - raio, 0)
+    fundo = np.empty(arr.shape, bool)
+    faixa = np.zeros((min(altura, LINHAS_POR_FAIXA) + 2 * raio, largura + 2 * raio), np.float64)
+    for inicio in range(0, altura, LINHAS_POR_FAIXA):
+        fim = min(altura, inicio + LINHAS_POR_FAIXA)
+        a, b = max(0, inicio - raio), min(altura, fim + raio)
+        linhas = fim - inicio + 2 * raio
+        faixa[:] = 0
+        faixa[a - inicio + raio:b - inicio + raio, raio:raio + largura] = arr[a:b]
+        media = _somas_janela(faixa[:linhas], raio)
+        faixa *= faixa
+        limiar = _somas_janela(faixa[:linhas], raio)  # soma dos quadrados; vira o limiar abaixo
+        y = np.arange(inicio, fim)
+        n = (np.minimum(y + raio + 1, altura) - np.maximum(y - raio, 0))[:, None] * n_x[None, :]
+        media /= n
+        limiar /= n
+        limiar -= media * media
+        np.maximum(limiar, 0, out=limiar)
+        np.sqrt(limiar, out=limiar)  # desvio
+        limiar /= R_SAUVOLA
+        limiar -= 1
+        limiar *= K_SAUVOLA
+        limiar += 1
+        limiar *= media
+        np.greater(arr[inicio:fim], limiar, out=fundo[inicio:fim])
+    saida = fundo.view(np.uint8)
+    saida *= 255
+    return saida
+
+
+ETAPAS = {
+    "cinza": cinza,
+    "recortar": recortar_bordas,
+    "reduzir": reduzir,
+    "endireitar": endireitar,
+    "binarizar": binarizar_sauvola,
+}
+
+
+def preprocessar(imagem, receita=None, tempos=None):
+    """
+    Aplica a receita (None = padrão) a uma imagem PIL ou caminho e devolve a
+    imagem PIL para o motor de OCR; sem etapas, devolve `imagem` como veio.
+    """
+    etapas = interpretar_receita(receita)
+    if not etapas:
+        return imagem
+    tempos = tempos if tempos is not None else Tempos()
+    with tempos.medir("pre_array"):
+        arr = para_array(imagem)
+    contexto = {}
+    for etapa in etapas:
+        with tempos.medir(f"pre_{etapa}"):
+            arr = ETAPAS[etapa](arr, contexto)
+    return Image.fromarray(np.ascontiguousarray(arr))
@@ -0,0 +1,362 @@
+# coding: utf-8
+"""
+Processamento sem interface gráfica: extração dos campos (palavra-chave e
+extras, comum/campos.py), conversão para PDF e o lote completo
+(extrair → nomear pelo modelo → backup/converter).
+Usado pela GUI (todos_arquivos_para_pdf) e pelo modo em lote (lote/main.py).
+Cada tipo de arquivo é tratado pelo manipulador de comum/formatos.py.
+"""
+
+import os
+import traceback
+from collections import deque
+from datetime import datetime
+
+from comum.campos import (BuscaCampos, CAMPO_CHAVE, MODELO_NOME_PADRAO, aplicar_modelo_nome, campos_busca,
+                          campos_do_modelo)
+from comum.diario import OP_CRIAR, OP_MOVER, PASTA_DIARIOS, PASTA_LIXEIRA, hash_para_diario
+from comum.duplicados import (ACAO_CONFERIR, ACAO_PULAR, ACAO_REVISAR, STATUS_DUPLICADO, STATUS_REVISAR,
+                               assinatura_arquivo, copia_campos)
+from comum.formatos import ROTULOS_ORIGEM, obter_formato
+from comum.nomes import AlocadorNomes
+from comum.paralelo import MODO_PROCESSO, MODO_THREAD
+from comum.pipeline import etapa, executar_pipeline
+from comum.rasterizacao import preparar_orcamento
+from comum.tempos import Tempos, tamanho
+from comum.transferencia import MODO_COPIAR, MODO_MOVER, transferir
+
+# ordem de leitura das páginas por palavra-chave (ex.: "1-2,-1" = 1, 2 e a última)
+DICAS_PAGINAS = {
+    "série": "1-2,-1",
+    "serie": "1-2,-1",
+}
+
+# -------- utils ----------
+def ensure_dir(p):
+    if not os.path.exists(p):
+        os.makedirs(p, exist_ok=True)
+
+# -------- extratores de campos ----------
+def dica_dos_campos(campos):
+    for nome, campo in campos.items():
+        for chave in (nome, campo.get("palavra", "")):
+            if chave.strip().lower() in DICAS_PAGINAS:
+                return DICAS_PAGINAS[chave.strip().lower()]
+    return None
+
+# todos retornam (valores, origem): valores = {campo: valor}, origem = "texto" (camada de texto) ou "ocr"
+# `campos` vem de comum/campos.py; sem todos os `obrigatorios`, volta o que foi achado
+# `tempos` (opcional) recebe o tempo de cada etapa e a contagem de páginas
+def extrair_com_formato(path, tipo, campos, obrigatorios=None, dica_paginas=None, modelo=None, tempos=None,
+                        converter=True):
+    """
+    (valores, origem, conteúdo): o conteúdo lido pelo manipulador do tipo vai para a conversão;
+    converter=False quando não há conversão (o manipulador não monta o que só ela usaria).
+    """
+    if not campos:
+        return {}, None, None
+    busca = BuscaCampos(campos, obrigatorios)
+    try:
+        valores, origem, conteudo = obter_formato(tipo).extrair(
+            path, busca, dica_paginas or dica_dos_campos(campos), modelo, tempos, converter)
+        return valores or busca.parcial, origem, conteudo
+    except Exception:
+        return busca.parcial, None, None
+
+def extrair_campos_pdf(path, campos, obrigatorios=None, dica_paginas=None, modelo=None, tempos=None):
+    return extrair_com_formato(path, ".pdf", campos, obrigatorios, dica_paginas, modelo, tempos, False)[:2]
+
+def extrair_campos_imagem(path, campos, obrigatorios=None, modelo=None, tempos=None):
+    return extrair_com_formato(path, os.path.splitext(path)[1], campos, obrigatorios, None, modelo, tempos,
+                               False)[:2]
+
+def extrair_campos_txt(path, campos, obrigatorios=None, tempos=None):
+    return extrair_com_formato(path, ".txt", campos, obrigatorios, tempos=tempos, converter=False)[:2]
+
+def extrair_campos_docx(path, campos, obrigatorios=None, tempos=None):
+    return extrair_com_formato(path, ".docx", campos, obrigatorios, tempos=tempos, converter=False)[:2]
+
+def extrair_campos_arquivo(path, tipo, campos, obrigatorios=None, dica_paginas=None, modelo=None, converter=True):
+    """
+    Extrai pelo manipulador do tipo; função de módulo para poder rodar em outro processo.
+    Retorna (valores, origem, tempos, conteúdo) - os tempos e o conteúdo já lido
+    (para converter_para_pdf não abrir o arquivo de novo) voltam do processo junto com o resultado.
+    """
+    tempos = Tempos()
+    valores, origem, conteudo = extrair_com_formato(path, tipo, campos, obrigatorios, dica_paginas, modelo, tempos,
+                                                    converter)
+    return valores or {}, origem, tempos, conteudo
+
+# -------- conversor para PDF ----------
+def converter_para_pdf(caminho_arquivo, caminho_destino, modo=MODO_COPIAR, conteudo=None, tempos=None):
+    """
+    PDF passa direto pelo `modo` de comum/transferencia.py; o resto é convertido (o original fica).
+    `conteudo`: o que a extração já leu do arquivo (extrair_campos_arquivo); sem ele, o arquivo é lido aqui.
+    """
+    ext = os.path.splitext(caminho_arquivo)[1].lower()
+    try:
+        obter_formato(ext).gravar_pdf(caminho_arquivo, caminho_destino, conteudo, modo, tempos)
+        return True
+    except Exception as e:
+        print(f"Erro converter {caminho_arquivo}: {e}")
+        traceback.print_exc()
+        return False
+
+# -------- varredura de pastas ----------
+PASTAS_IGNORADAS = ("BACKUP", PASTA_DIARIOS, PASTA_LIXEIRA)
+
+
+def percorrer_arquivos(raiz, filtro_ext="", recursivo=True, ignorar=PASTAS_IGNORADAS):
+    """
+    Gera os caminhos dos arquivos sob `raiz` conforme vão sendo encontrados
+    (os.scandir, pilha explícita). Nada é listado por inteiro antes de começar.
+    """
+    filtro_ext = (filtro_ext or "").lower()
+    pilha = [raiz]
+    while pilha:
+        pasta = pilha.pop()
+        try:
+            with os.scandir(pasta) as it:
+                subpastas = []
+                for entrada in it:
+                    try:
+                        if entrada.is_dir(follow_symlinks=False):
+                            if recursivo and entrada.name not in ignorar:
+                                subpastas.append(entrada.path)
+                        elif entrada.is_file():
+                            if not filtro_ext or entrada.name.lower().endswith(filtro_ext):
+                                yield entrada.path
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Erro ao ler pasta {pasta}: {e}")
+            continue
+        # subpastas na ordem em que apareceram
+        pilha.extend(reversed(subpastas))
+
+
+def novo_registro(path, **extra):
+    nome = os.path.basename(path)
+    rec = {
+        "antigo": nome,
+        "novo": "",
+        "status": "Aguardando",
+        "tipo": os.path.splitext(nome)[1].lower(),
+        "orig_path": path,
+        "dest_path": "",
+        "keyword": "",
+        "origem": "",
+        "timestamp": "",
+        "mensagem": ""
+    }
+    rec.update(extra)
+    return rec
+
+
+# -------- lote ----------
+def montar_nome(nome_base, valores, modelo_nome=MODELO_NOME_PADRAO):
+    # modelo padrão: somente nome_base, se houver chave adiciona _chave
+    return (aplicar_modelo_nome(modelo_nome, dict(valores, nome_base=nome_base)) or nome_base) + ".pdf"
+
+
+def finalizar_registro(rec, caminho_destino, valores, origem_chave, backup_dir=None, alocador=None, tempos=None,
+                       modo_saida=MODO_COPIAR, modo_backup=MODO_COPIAR, conteudo=None, alocador_backup=None):
+    """
+    Backup + conversão de um arquivo; preenche e devolve o registro (uma coluna campo_<nome> por campo).
+    modo_saida/modo_backup: copiar, mover (só saída), hardlink ou reflink (comum/transferencia.py).
+    conteudo: o que a extração já leu do arquivo (extrair_campos_arquivo), para não abri-lo de novo.
+    O nome no backup sai de `alocador_backup` (comum/nomes.py; um por lote): originais de
+    mesmo nome em subpastas diferentes ganham _1, _2... em vez de um substituir o outro.
+    """
+    path_origem = rec["orig_path"]
+    tempos = tempos if tempos is not None else Tempos()
+    bytes_entrada = tamanho(path_origem)  # antes: no modo mover o original some
+
+    # backup original (antes da saída, que pode mover o arquivo)
+    if backup_dir:
+        alocador_backup = alocador_backup or AlocadorNomes(backup_dir)
+        caminho_backup = None
+        try:
+            with tempos.medir("backup"):
+                caminho_backup = alocador_backup.alocar(rec["antigo"])
+                transferir(path_origem, caminho_backup, modo_backup)
+            rec["_backup"] = caminho_backup
+        except Exception as e:
+            if caminho_backup:
+                alocador_backup.liberar(caminho_backup)
+            print("Backup falhou:", e)
+
+    # converter
+    with tempos.medir("conversao"):
+        sucesso = converter_para_pdf(path_origem, caminho_destino, modo_saida, conteudo, tempos)
+    if not sucesso and alocador is not None:
+        alocador.liberar(caminho_destino)  # apaga a reserva vazia
+
+    # grava dados no registro
+    rec["novo"] = os.path.basename(caminho_destino) if sucesso else ""
+    rec["status"] = "Concluído" if sucesso else "Erro"
+    rec["dest_path"] = caminho_destino if sucesso else ""
+    rec["keyword"] = valores.get(CAMPO_CHAVE) or ""
+    for nome, valor in valores.items():
+        rec[f"campo_{nome}"] = valor
+    rec["origem"] = ROTULOS_ORIGEM.get(origem_chave, "")
+    rec["timestamp"] = datetime.now().isoformat(sep=' ', timespec='seconds')
+    rec["mensagem"] = "" if sucesso else "Falha conversão"
+    tempos.registrar(rec)
+    rec["paginas"] = rec.get("paginas") or 1
+    rec["bytes_entrada"] = bytes_entrada
+    rec["bytes_saida"] = tamanho(caminho_destino) if sucesso else 0
+    return rec
+
+
+def processar_lote(registros, destino, nome_base, palavra_chave="", dica_paginas="", modelo=None,
+                   backup_dir=None, workers=1, cancelado=None, ao_iniciar=None, campos_extras="",
+                   modelo_nome=MODELO_NOME_PADRAO, workers_conversao=None, modo_saida=MODO_COPIAR,
+                   modo_backup=MODO_COPIAR, diario=None, duplicados=None):
+    """
+    Processa um iterável de registros (novo_registro) e gera cada registro
+    concluído, na ordem de entrada. Pipeline (comum/pipeline.py) com filas
+    limitadas entre as etapas, que rodam ao mesmo tempo:
+      [duplicados: hash/assinatura em processos, depois a triagem em ordem]
+      leitura/rasterização/OCR/extração - processos (`workers`)
+      nomes - uma thread, reservados no disco na hora (comum/nomes.py)
+      backup/conversão - threads (`workers_conversao`, padrão = `workers`)
+      relatório - quem consome este gerador
+    - `registros` é consumido sob demanda: pode ser um gerador de percorrer_arquivos
+    - cancelado(): nada novo é extraído; o que já foi extraído ganha nome e é convertido;
+      o que já tinha passado por ao_iniciar e não rodou volta para "Aguardando"
+    - erro num arquivo (em qualquer etapa): ele sai com status "Erro" e a mensagem; o lote segue
+    - páginas renderizadas dividem o orçamento de memória (comum/rasterizacao.py)
+    - palavra-chave + `campos_extras` numa passada só; nome pelo `modelo_nome`
+    - PDFs vão para o destino e o backup por `modo_saida`/`modo_backup` (hardlink,
+      reflink ou mover evitam regravar os bytes no mesmo dispositivo)
+    - `diario` (comum/diario.py): cada arquivo concluído é registrado na hora; os
+      que o diário já tem são pulados e saem com o registro guardado, assim que vistos
+    - `duplicados` (comum/duplicados.DetectorDuplicados): cópias de um arquivo já
+      visto não passam pelo OCR; recebem os campos dele ou saem como "Duplicado"
+    """
+    em_triagem = deque()
+    em_extracao = deque()
+    alocador = AlocadorNomes(destino, diario)
+    alocador_backup = AlocadorNomes(backup_dir, diario) if backup_dir else None
+    inicializador, initargs = preparar_orcamento()
+    campos = campos_busca(palavra_chave, campos_extras)
+    obrigatorios = campos_do_modelo(modelo_nome)
+
+    pulados = deque()
+
+    def tarefas():
+        for rec in registros:
+            feito = diario.ja_concluido(rec["orig_path"]) if diario is not None else None
+            if feito is not None:
+                rec.update(feito)
+                pulados.append(rec)
+                continue
+            if cancelado is not None and cancelado():
+                return  # antes do ao_iniciar: o item não fica "Processando" sem ir para a fila
+            if ao_iniciar:
+                ao_iniciar(rec)
+            if duplicados is not None:
+                em_triagem.append(rec)
+                yield (rec["orig_path"], rec["tipo"], duplicados.visual, rec.get("_hash"))
+            else:
+                em_extracao.append(rec)
+                yield (rec["orig_path"], rec["tipo"], campos, obrigatorios, dica_paginas, modelo)
+
+    def triar(sha, visual):
+        rec = em_triagem[0]  # sai da fila só no fim: com erro aqui, falhou_triagem() o leva adiante
+        acao = duplicados.classificar(rec, (sha, visual))
+        em_extracao.append(em_triagem.popleft())
+        if acao:
+            rec["_duplicado"] = acao
+        if copia_campos(acao):
+            # cópia exata: passa pela extração sem ler nada e recebe os campos do representante em nomear()
+            return (rec["orig_path"], "", {}, (), None, None)
+        return (rec["orig_path"], rec["tipo"], campos, obrigatorios, dica_paginas, modelo)
+
+    def nomear(valores, origem_chave, tempos, conteudo):
+        rec = em_extracao[0]  # idem (falhou_nomes)
+        if duplicados is not None:
+            # em ordem: o representante já passou por aqui antes das cópias dele
+            if rec.get("_duplicado") == ACAO_PULAR:
+                em_extracao.popleft()
+                return (rec, None, {}, None, backup_dir, alocador, tempos, modo_saida, modo_backup, None)
+            if copia_campos(rec.get("_duplicado")):
+                valores, origem_chave = duplicados.resultado(rec["dup_grupo"])
+            else:
+                duplicados.guardar_resultado(rec, valores, origem_chave)
+        nome = montar_nome(nome_base, valores, modelo_nome)
+        caminho_destino = alocador.alocar(nome)
+        em_extracao.popleft()
+        return (rec, caminho_destino, valores, origem_chave, backup_dir, alocador, tempos, modo_saida, modo_backup,
+                conteudo)
+
+    def converter(rec, caminho_destino, valores, *resto):
+        if rec.get("_duplicado") == ACAO_PULAR:
+            rec.pop("_duplicado")
+            rec.update(status=STATUS_DUPLICADO, mensagem=duplicados.mensagem(rec, ACAO_PULAR),
+                       timestamp=datetime.now().isoformat(sep=' ', timespec='seconds'))
+            return rec
+        hash_origem = None
+        if diario is not None:
+            hash_origem = rec.get("_hash") or hash_para_diario(rec["orig_path"])  # antes: o modo mover leva o original
+        finalizar_registro(rec, caminho_destino, valores, *resto, alocador_backup=alocador_backup)
+        acao = rec.pop("_duplicado", None)
+        if acao and rec["status"] == "Concluído":
+            rec["mensagem"] = duplicados.mensagem(rec, acao)
+            if acao in (ACAO_REVISAR, ACAO_CONFERIR):
+                rec["status"] = STATUS_REVISAR
+        if diario is not None and rec["status"] in ("Concluído", STATUS_REVISAR):
+            # a cópia de backup também: desfazer a execução apaga o que ela criou
+            operacoes = [(OP_CRIAR, rec["_backup"])] if rec.get("_backup") else []
+            if rec["tipo"] == ".pdf" and modo_saida == MODO_MOVER:
+                operacoes.append((OP_MOVER, rec["orig_path"], caminho_destino))
+            else:
+                operacoes.append((OP_CRIAR, caminho_destino))
+            diario.concluido(rec["orig_path"], operacoes, rec, hash_origem, campos=valores)
+        return rec
+
+    # -------- erro num arquivo: o registro sai com status "Erro" e o lote continua ----------
+    def falhou_triagem(falha):
+        em_extracao.append(em_triagem.popleft())
+        return falha
+
+    def falhou_nomes(falha):
+        falha.registro = em_extracao.popleft()
+        return falha
+
+    def falhou_conversao(falha):
+        rec = falha.registro
+        if rec is None:  # erro na própria conversão
+            rec, caminho_destino = falha.item[0], falha.item[1]
+            if caminho_destino:
+                alocador.liberar(caminho_destino)
+        rec.pop("_duplicado", None)
+        rec.update(status="Erro", novo="", dest_path="", mensagem=f"Erro ({falha.etapa}): {falha.erro}",
+                   timestamp=datetime.now().isoformat(sep=' ', timespec='seconds'))
+        return rec
+
+    etapas = []
+    if duplicados is not None:
+        etapas += [
+            etapa("assinatura", assinatura_arquivo, workers, MODO_PROCESSO),
+            etapa("triagem", triar, ao_falhar=falhou_triagem),
+        ]
+    etapas += [
+        etapa("extracao", extrair_campos_arquivo, workers, MODO_PROCESSO,
+              inicializador=inicializador, initargs=initargs),
+        etapa("nomes", nomear, cancelavel=False, ao_falhar=falhou_nomes),
+        etapa("conversao", converter, workers_conversao or workers, MODO_THREAD, cancelavel=False,
+              ao_falhar=falhou_conversao),
+    ]
+    try:
+        for rec in executar_pipeline(tarefas(), etapas, cancelado):
+            while pulados:
+                yield pulados.popleft()
+            yield rec
+        while pulados:
+            yield pulados.popleft()
+    finally:
+        # cancelado: o que entrou (ao_iniciar) mas ficou na fila sem rodar volta a aguardar
+        for rec in list(em_triagem) + list(em_extracao):
+            rec["status"] = "Aguardando"
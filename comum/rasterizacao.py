@@ -0,0 +1,107 @@
+# coding: utf-8
+"""
+Rasterização com memória limitada.
+- Orçamento compartilhado entre threads e processos do pool: cada página
+  reserva sua estimativa (largura x altura x 3 bytes) antes de ser renderizada
+  e devolve quando o OCR termina; se não couber, espera
+- Modo "disco": o Poppler grava a página num arquivo temporário (paths_only)
+  e o Tesseract lê direto do arquivo - a imagem nunca fica inteira no Python
+- Configuração por variável de ambiente (vale nos processos do pool):
+  RASTER_ORCAMENTO_MB (0 = sem limite), RASTER_MAX_PAGINAS (0 = sem limite), RASTER_MODO (memoria | disco)
+"""
+
+import multiprocessing
+import os
+from contextlib import contextmanager
+
+MODO_MEMORIA = "memoria"
+MODO_DISCO = "disco"
+
+
+def configurar_rasterizacao(orcamento_mb=0, max_paginas=0, modo=MODO_MEMORIA):
+    os.environ["RASTER_ORCAMENTO_MB"] = str(int(orcamento_mb or 0))
+    os.environ["RASTER_MAX_PAGINAS"] = str(int(max_paginas or 0))
+    os.environ["RASTER_MODO"] = modo or MODO_MEMORIA
+
+
+def modo_rasterizacao():
+    return os.environ.get("RASTER_MODO", MODO_MEMORIA)
+
+
+def estimar_bytes_pagina(largura_pts, altura_pts, dpi, canais=3):
+    escala = dpi / 72.0
+    return int(largura_pts * escala) * int(altura_pts * escala) * canais
+
+
+class OrcamentoMemoria:
+    """Semáforo por bytes (e opcionalmente por páginas) que atravessa processos."""
+
+    def __init__(self, limite_bytes=0, limite_paginas=0):
+        self.limite_bytes = int(limite_bytes)
+        self.limite_paginas = int(limite_paginas)
+        self._cond = multiprocessing.Condition()
+        self._bytes = multiprocessing.Value("q", 0, lock=False)
+        self._paginas = multiprocessing.Value("i", 0, lock=False)
+
+    def _cabe(self, n):
+        if self._paginas.value == 0:
+            return True  # uma página maior que o orçamento ainda passa sozinha
+        if self.limite_paginas and self._paginas.value + 1 > self.limite_paginas:
+            return False
+        if self.limite_bytes and self._bytes.value + n > self.limite_bytes:
+            return False
+        return True
+
+    @contextmanager
+    def reservar(self, n):
+        with self._cond:
+            while not self._cabe(n):
+                self._cond.wait()
+            self._bytes.value += n
+            self._paginas.value += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._bytes.value -= n
+                self._paginas.value -= 1
+                self._cond.notify_all()
+
+    def em_uso(self):
+        with self._cond:
+            return self._bytes.value, self._paginas.value
+
+
+# orçamento do processo atual (instalado pelo inicializador do pool)
+_orcamento = None
+
+
+def criar_orcamento():
+    """Orçamento a partir do ambiente, ou None se não houver limite."""
+    mb = int(os.environ.get("RASTER_ORCAMENTO_MB") or 0)
+    paginas = int(os.environ.get("RASTER_MAX_PAGINAS") or 0)
+    if not mb and not paginas:
+        return None
+    return OrcamentoMemoria(mb * 1024 * 1024, paginas)
+
+
+def instalar_orcamento(orcamento):
+    """Inicializador do pool: todos os processos passam a dividir o mesmo orçamento."""
+    global _orcamento
+    _orcamento = orcamento
+
+
+def preparar_orcamento():
+    """Cria e instala o orçamento no processo atual; devolve (inicializador, initargs) para o pool."""
+    orcamento = criar_orcamento()
+    instalar_orcamento(orcamento)
+    return instalar_orcamento, (orcamento,)
+
+
+@contextmanager
+def reservar_pagina(n_bytes):
+    if _orcamento is None:
+        yield
+    else:
+        with _orcamento.reservar(n_bytes):
+            yield
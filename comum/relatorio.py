@@ -0,0 +1,241 @@
+# coding: utf-8
+"""
+Relatórios gravados linha a linha, conforme os arquivos terminam.
+- Diário bruto .jsonl: o registro inteiro, descarregado no disco a cada
+  N linhas ou T segundos; sobrevive a uma queda e serve para regerar o
+  relatório com outras colunas/formato sem reprocessar (regerar_relatorio)
+- Formatos do relatório pela extensão: .xlsx (openpyxl write_only), .csv,
+  .parquet (pyarrow, opcional: um row group por descarga) e .jsonl
+- O .xlsx e o .parquet só ficam válidos no fechar(); o .csv e o diário valem a qualquer momento
+- colunas = [(chave no registro, rótulo), ...], como em comum/tempos.COLUNAS_METRICAS
+"""
+
+import csv
+import json
+import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+LINHAS_POR_DESCARGA = 50
+SEGUNDOS_POR_DESCARGA = 5.0
+
+FORMATOS = (".xlsx", ".csv", ".parquet", ".jsonl")
+
+
+def formato_do_caminho(caminho):
+    ext = os.path.splitext(caminho)[1].lower()
+    if ext not in FORMATOS:
+        raise ValueError(f"Formato de relatório não suportado: {ext or caminho} (use {', '.join(FORMATOS)})")
+    return ext
+
+
+def valor_celula(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, (dict, list, tuple, set)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    return valor
+
+
+# -------- escritores ----------
+class EscritorJSONL:
+    def __init__(self, caminho, colunas=None, anexar=True):
+        self.colunas = colunas
+        self.arquivo = open(caminho, "a" if anexar else "w", encoding="utf-8")
+
+    def escrever(self, rec):
+        if self.colunas:
+            rec = {chave: rec.get(chave) for chave, _ in self.colunas}
+        else:
+            rec = {k: v for k, v in rec.items() if not k.startswith("_")}  # _hash, _stat...: uso interno
+        self.arquivo.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+    def descarregar(self):
+        self.arquivo.flush()
+        os.fsync(self.arquivo.fileno())
+
+    def fechar(self):
+        self.descarregar()
+        self.arquivo.close()
+
+
+class EscritorCSV:
+    def __init__(self, caminho, colunas):
+        self.colunas = colunas
+        # utf-8-sig: o Excel abre com acentos certos
+        self.arquivo = open(caminho, "w", encoding="utf-8-sig", newline="")
+        self.csv = csv.writer(self.arquivo, delimiter=";")
+        self.csv.writerow([rotulo for _, rotulo in colunas])
+
+    def escrever(self, rec):
+        self.csv.writerow([valor_celula(rec.get(chave)) for chave, _ in self.colunas])
+
+    def descarregar(self):
+        self.arquivo.flush()
+        os.fsync(self.arquivo.fileno())
+
+    def fechar(self):
+        self.descarregar()
+        self.arquivo.close()
+
+
+class EscritorXLSX:
+    """openpyxl write_only: as linhas vão para um XML temporário, não ficam na memória."""
+
+    def __init__(self, caminho, colunas, titulo="Relatório"):
+        self.caminho = caminho
+        self.colunas = colunas
+        from openpyxl import Workbook  # só quem grava .xlsx paga a importação
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(titulo[:31])
+        self.ws.append([rotulo for _, rotulo in colunas])
+
+    def escrever(self, rec):
+        self.ws.append([valor_celula(rec.get(chave)) for chave, _ in self.colunas])
+
+    def descarregar(self):
+        pass  # só o save() gera um .xlsx válido; o diário bruto cobre a queda
+
+    def fechar(self):
+        self.wb.save(self.caminho)
+
+
+class EscritorParquet:
+    """Um row group por descarga; tipo da coluna (número ou texto) fixado pelo primeiro lote."""
+
+    def __init__(self, caminho, colunas):
+        if pa is None:
+            raise RuntimeError("Relatório .parquet precisa do pyarrow (pip install pyarrow)")
+        self.caminho = caminho
+        self.colunas = colunas
+        self.pendentes = []
+        self.esquema = None
+        self.escritor = None
+
+    def escrever(self, rec):
+        self.pendentes.append([rec.get(chave) for chave, _ in self.colunas])
+
+    def _montar_esquema(self):
+        campos = []
+        for i, (_, rotulo) in enumerate(self.colunas):
+            valores = [linha[i] for linha in self.pendentes if linha[i] not in (None, "")]
+            numerica = valores and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in valores)
+            campos.append(pa.field(rotulo, pa.float64() if numerica else pa.string()))
+        return pa.schema(campos)
+
+    def _converter(self, valor, tipo):
+        if valor in (None, ""):
+            return None
+        if tipo == pa.float64():
+            try:
+                return float(valor)
+            except (TypeError, ValueError):
+                return None
+        return str(valor_celula(valor))
+
+    def descarregar(self):
+        if not self.pendentes:
+            return
+        if self.esquema is None:
+            self.esquema = self._montar_esquema()
+            self.escritor = pq.ParquetWriter(self.caminho, self.esquema)
+        colunas = [pa.array([self._converter(linha[i], campo.type) for linha in self.pendentes], type=campo.type)
+                   for i, campo in enumerate(self.esquema)]
+        self.escritor.write_table(pa.Table.from_arrays(colunas, schema=self.esquema))
+        self.pendentes = []
+
+    def fechar(self):
+        self.descarregar()
+        if self.escritor is None:
+            self.esquema = self._montar_esquema()
+            self.escritor = pq.ParquetWriter(self.caminho, self.esquema)
+        self.escritor.close()
+
+
+def abrir_escritor(caminho, colunas, titulo="Relatório"):
+    ext = formato_do_caminho(caminho)
+    if ext == ".xlsx":
+        return EscritorXLSX(caminho, colunas, titulo)
+    if ext == ".csv":
+        return EscritorCSV(caminho, colunas)
+    if ext == ".parquet":
+        return EscritorParquet(caminho, colunas)
+    return EscritorJSONL(caminho, colunas)
+
+
+# -------- relatório em andamento ----------
+class Relatorio:
+    """
+    Recebe cada registro concluído: grava o bruto no diário (se houver) e a
+    linha do relatório (se houver), com `formatar(rec)` aplicado só ao relatório.
+    Descarrega a cada LINHAS_POR_DESCARGA linhas ou SEGUNDOS_POR_DESCARGA segundos.
+    """
+
+    def __init__(self, caminho=None, colunas=(), caminho_bruto=None, formatar=None, titulo="Relatório",
+                 anexar_bruto=True, a_cada=LINHAS_POR_DESCARGA, intervalo=SEGUNDOS_POR_DESCARGA):
+        self.formatar = formatar or (lambda rec: rec)
+        self.escritores = []
+        self.bruto = EscritorJSONL(caminho_bruto, anexar=anexar_bruto) if caminho_bruto else None
+        if self.bruto:
+            self.escritores.append(self.bruto)
+        self.relatorio = abrir_escritor(caminho, list(colunas), titulo) if caminho else None
+        if self.relatorio:
+            self.escritores.append(self.relatorio)
+        self.a_cada = a_cada
+        self.intervalo = intervalo
+        self._linhas = 0
+        self._ultima_descarga = time.monotonic()
+
+    def adicionar(self, rec):
+        if self.bruto:
+            self.bruto.escrever(rec)
+        if self.relatorio:
+            self.relatorio.escrever(self.formatar(rec))
+        self._linhas += 1
+        if self._linhas >= self.a_cada or time.monotonic() - self._ultima_descarga >= self.intervalo:
+            self.descarregar()
+
+    def descarregar(self):
+        for escritor in self.escritores:
+            escritor.descarregar()
+        self._linhas = 0
+        self._ultima_descarga = time.monotonic()
+
+    def fechar(self):
+        for escritor in self.escritores:
+            escritor.fechar()
+        self.escritores = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def ler_bruto(caminho_bruto):
+    """Registros do diário, um por linha; a última linha cortada por uma queda é ignorada."""
+    with open(caminho_bruto, "r", encoding="utf-8") as f:
+        for linha in f:
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                continue
+
+
+def escrever_relatorio(registros, caminho, colunas, formatar=None, titulo="Relatório"):
+    """Grava um relatório a partir de um iterável de registros, sem montá-lo na memória."""
+    with Relatorio(caminho, colunas, formatar=formatar, titulo=titulo) as relatorio:
+        for rec in registros:
+            relatorio.adicionar(rec)
+    return caminho
+
+
+def regerar_relatorio(caminho_bruto, caminho, colunas, formatar=None, titulo="Relatório"):
+    """Novo relatório (outras colunas/formato) a partir do diário bruto, sem reprocessar."""
+    return escrever_relatorio(ler_bruto(caminho_bruto), caminho, colunas, formatar, titulo)
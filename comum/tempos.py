@@ -0,0 +1,132 @@
+# coding: utf-8
+"""
+Tempo por etapa de cada arquivo (rasterização, pré-processamento, OCR, regex, backup, conversão...).
+Tempos é um dict etapa -> segundos que atravessa processos (pickle) junto com
+a contagem de páginas, o nível da escada de OCR e quantas vezes o arquivo
+foi aberto (comum/formatos.py); os registros recebem uma coluna "t_<etapa>" por etapa.
+"""
+
+import heapq
+import os
+import time
+from contextlib import contextmanager
+
+# (chave no registro, rótulo no relatório)
+ETAPAS = [
+    ("t_leitura_texto", "Leitura camada de texto (s)"),
+    ("t_rasterizacao", "Rasterização (s)"),
+    # etapas de comum/preprocessamento.py, na ordem de uma receita completa
+    ("t_pre_array", "Pré: leitura (s)"),
+    ("t_pre_cinza", "Pré: cinza (s)"),
+    ("t_pre_recortar", "Pré: recortar (s)"),
+    ("t_pre_reduzir", "Pré: reduzir (s)"),
+    ("t_pre_endireitar", "Pré: endireitar (s)"),
+    ("t_pre_binarizar", "Pré: binarizar (s)"),
+    ("t_ocr", "OCR (s)"),
+    ("t_regex", "Busca regex (s)"),
+    ("t_backup", "Backup (s)"),
+    ("t_conversao", "Conversão (s)"),
+    ("t_renomear", "Renomear (s)"),
+]
+
+# nível da escada de OCR que achou o valor e a confiança das palavras
+COLUNAS_OCR = [
+    ("nivel_ocr", "Nível OCR"),
+    ("confianca_ocr", "Confiança OCR (%)"),
+]
+
+COLUNAS_METRICAS = ETAPAS + [
+    ("t_total", "Tempo total (s)"),
+    ("paginas", "Páginas"),
+    ("aberturas", "Aberturas do arquivo"),
+    ("bytes_entrada", "Bytes entrada"),
+    ("bytes_saida", "Bytes saída"),
+]
+
+
+class Tempos(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.paginas = 0
+        self.nivel_ocr = None  # nível da escada (comum/escada_ocr.py) que achou o valor
+        self.confianca_ocr = None
+        self.aberturas = 0  # leituras do arquivo pelos manipuladores de formato (extração + conversão)
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self[etapa] = self.get(etapa, 0.0) + time.perf_counter() - inicio
+
+    def registrar(self, rec):
+        """Copia as etapas para o registro (colunas t_*), arredondadas em ms."""
+        for etapa, segundos in self.items():
+            rec[f"t_{etapa}"] = round(segundos, 3)
+        rec["t_total"] = round(sum(self.values()), 3)
+        if self.paginas:
+            rec["paginas"] = self.paginas
+        if self.aberturas:
+            rec["aberturas"] = self.aberturas
+        if self.nivel_ocr is not None:
+            rec["nivel_ocr"] = self.nivel_ocr
+            rec["confianca_ocr"] = self.confianca_ocr
+        return rec
+
+
+def tamanho(path):
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+class ResumoTempos:
+    """Soma das etapas e os n arquivos mais lentos, sem guardar todos os registros."""
+
+    def __init__(self, n=5):
+        self.n = n
+        self.totais = {}
+        self.lentos = []  # heap (t_total, seq, antigo, pior etapa)
+        self.niveis = {}  # nível da escada de OCR -> arquivos
+        self._seq = 0
+
+    def adicionar(self, rec):
+        if rec.get("nivel_ocr"):
+            self.niveis[rec["nivel_ocr"]] = self.niveis.get(rec["nivel_ocr"], 0) + 1
+        for chave, rotulo in ETAPAS:
+            if rec.get(chave):
+                self.totais[rotulo] = self.totais.get(rotulo, 0.0) + rec[chave]
+        if rec.get("t_total"):
+            pior = max(ETAPAS, key=lambda e: rec.get(e[0]) or 0)[1]
+            self._seq += 1
+            item = (rec["t_total"], self._seq, rec.get("antigo", ""), pior)
+            if len(self.lentos) < self.n:
+                heapq.heappush(self.lentos, item)
+            else:
+                heapq.heappushpop(self.lentos, item)
+
+    def texto(self):
+        """Texto com as etapas que mais pesaram e os arquivos mais lentos."""
+        if not self.totais:
+            return ""
+        soma = sum(self.totais.values()) or 1.0
+        linhas = ["Etapas (tempo somado):"]
+        for rotulo, seg in sorted(self.totais.items(), key=lambda x: -x[1]):
+            linhas.append(f"  {rotulo:<30} {seg:9.2f}s  {seg / soma:6.1%}")
+        if self.lentos:
+            linhas.append("Arquivos mais lentos:")
+            for t_total, _, antigo, pior in sorted(self.lentos, reverse=True):
+                linhas.append(f"  {t_total:8.2f}s  {antigo}  (mais lento: {pior})")
+        if self.niveis:
+            linhas.append("Nível da escada de OCR: " +
+                          ", ".join(f"{n}: {q} arquivo(s)" for n, q in sorted(self.niveis.items())))
+        return "\n".join(linhas)
+
+
+def resumo_execucao(registros, n=5):
+    resumo = ResumoTempos(n)
+    for rec in registros:
+        resumo.adicionar(rec)
+    return resumo.texto()
@@ -0,0 +1,133 @@
+# coding: utf-8
+"""
+Transferência de arquivos sem regravar os bytes quando dá.
+- copiar: shutil.copy2 (lê e grava tudo)
+- mover: os.rename no mesmo sistema de arquivos; entre dispositivos, copia e apaga
+- hardlink: mais um nome para o mesmo arquivo (mesmo dispositivo; não edite
+  nenhum dos dois depois, a mudança aparece nos dois)
+- reflink: cópia que divide os blocos até alguém alterar (Btrfs, XFS, APFS...)
+- Mesmo dispositivo detectado por st_dev; quando o modo não é possível
+  (outro dispositivo, sistema sem suporte), cai para cópia
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import shutil
+import sys
+import threading
+
+MODO_COPIAR = "copiar"
+MODO_MOVER = "mover"
+MODO_HARDLINK = "hardlink"
+MODO_REFLINK = "reflink"
+
+MODOS = (MODO_COPIAR, MODO_MOVER, MODO_HARDLINK, MODO_REFLINK)
+MODOS_BACKUP = (MODO_COPIAR, MODO_HARDLINK, MODO_REFLINK)  # o original ainda vai para o destino
+
+FICLONE = 0x40049409  # ioctl do Linux (linux/fs.h)
+
+# (modo, st_dev origem, st_dev destino) em que o link/reflink já falhou: vai direto para a cópia
+_sem_suporte = set()
+_trava = threading.Lock()
+
+
+def dispositivo(caminho):
+    """st_dev do arquivo ou, se ainda não existe, da pasta onde vai ficar."""
+    try:
+        return os.stat(caminho).st_dev
+    except OSError:
+        return os.stat(os.path.dirname(os.path.abspath(caminho)) or ".").st_dev
+
+
+def mesmo_dispositivo(origem, destino):
+    try:
+        return dispositivo(origem) == dispositivo(destino)
+    except OSError:
+        return False
+
+
+def _sem_suporte_marcado(modo, origem, destino):
+    with _trava:
+        return (modo, dispositivo(origem), dispositivo(destino)) in _sem_suporte
+
+
+def _marcar_sem_suporte(modo, origem, destino):
+    with _trava:
+        _sem_suporte.add((modo, dispositivo(origem), dispositivo(destino)))
+
+
+def _reflink_linux(origem, destino):
+    import fcntl
+    with open(origem, "rb") as fo:
+        fd = os.open(destino, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            fcntl.ioctl(fd, FICLONE, fo.fileno())
+        except OSError:
+            os.close(fd)
+            os.remove(destino)
+            raise
+        os.close(fd)
+
+
+def _reflink_macos(origem, destino):
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if libc.clonefile(os.fsencode(origem), os.fsencode(destino), 0) != 0:
+        erro = ctypes.get_errno()
+        raise OSError(erro, os.strerror(erro), destino)
+
+
+def reflink(origem, destino):
+    """Clona o arquivo (FICLONE no Linux, clonefile no macOS); OSError se não der."""
+    if sys.platform.startswith("linux"):
+        _reflink_linux(origem, destino)
+    elif sys.platform == "darwin":
+        _reflink_macos(origem, destino)
+    else:
+        raise OSError(errno.EOPNOTSUPP, "reflink não suportado neste sistema", destino)
+    shutil.copystat(origem, destino)
+
+
+def _no_lugar(criar, destino):
+    """Cria em nome temporário e troca: substitui a reserva vazia de comum/nomes.py sem janela."""
+    temporario = destino + ".parcial"
+    try:
+        os.remove(temporario)  # sobra de uma execução interrompida
+    except FileNotFoundError:
+        pass
+    criar(temporario)
+    try:
+        os.replace(temporario, destino)
+    except OSError:
+        os.remove(temporario)
+        raise
+
+
+def transferir(origem, destino, modo=MODO_COPIAR):
+    """
+    Leva `origem` para `destino` no `modo` pedido e devolve o modo usado de
+    fato (cópia quando o pedido não foi possível). Se `destino` já existe
+    (a reserva do alocador de nomes), é substituído.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo de transferência inválido: {modo!r} (use {', '.join(MODOS)})")
+    if modo in (MODO_HARDLINK, MODO_REFLINK, MODO_MOVER) and not mesmo_dispositivo(origem, destino):
+        if modo == MODO_MOVER:
+            shutil.move(origem, destino)  # copia e apaga
+            return modo
+        modo = MODO_COPIAR
+    if modo in (MODO_HARDLINK, MODO_REFLINK) and _sem_suporte_marcado(modo, origem, destino):
+        modo = MODO_COPIAR
+
+    if modo == MODO_MOVER:
+        os.replace(origem, destino)
+        return modo
+    if modo in (MODO_HARDLINK, MODO_REFLINK):
+        try:
+            _no_lugar(lambda tmp: os.link(origem, tmp) if modo == MODO_HARDLINK else reflink(origem, tmp), destino)
+            return modo
+        except OSError:
+            _marcar_sem_suporte(modo, origem, destino)
+    shutil.copy2(origem, destino)
+    return MODO_COPIAR
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Lote dividido entre várias máquinas por uma fila compartilhada (comum/fila.py).
+- coordenar: percorre a origem, enfileira os arquivos num .sqlite da pasta
+  compartilhada e acompanha os resultados (JSON Lines e --relatorio, como o
+  lote/main.py) conforme os trabalhadores terminam
+- trabalhar: em cada máquina (uma ou mais vezes), pega trabalhos com
+  concessão, extrai (processos, --workers), reserva o nome na fila, converte
+  e grava o resultado; concessão vencida volta para a fila
+- estado: quantos trabalhos em cada estado; reabrir: devolve os com erro
+- Origem, destino e --backup precisam ter o mesmo caminho em todas as
+  máquinas (pasta de rede mapeada igual ou caminho UNC)
+- Sem "mover" na saída: uma tentativa repetida precisa do original no lugar
+
+Exemplo:
+    python fila_distribuida/main.py coordenar \\\\servidor\\fila\\mes.sqlite \\\\servidor\\scans \\\\servidor\\saida --nome-base RAT --palavra-chave Série
+    python fila_distribuida/main.py trabalhar \\\\servidor\\fila\\mes.sqlite --workers 8     (em cada máquina)
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+import pytesseract
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import comum.extracao
+from comum.cache_ocr import configurar_cache
+from comum.campos import MODELO_NOME_PADRAO, campos_busca, campos_do_modelo
+from comum.fila import CONCESSAO_PADRAO, TENTATIVAS_PADRAO, ESTADOS, FilaTrabalhos, Renovador, novo_dono
+from comum.modelos_layout import nomes_modelos
+from comum.motor_ocr import configurar_motor, MOTOR_AUTO, MOTOR_PYTESSERACT, MOTOR_TESSEROCR
+from comum.paralelo import executar_em_ordem, MODO_PROCESSO
+from comum.preprocessamento import RECEITA_PADRAO, configurar_preprocessamento, interpretar_receita
+from comum.processamento import (PASTAS_IGNORADAS, ensure_dir, extrair_campos_arquivo, finalizar_registro,
+                                 montar_nome, novo_registro, percorrer_arquivos)
+from comum.rasterizacao import configurar_rasterizacao, preparar_orcamento, MODO_DISCO, MODO_MEMORIA
+from comum.relatorio import Relatorio, formato_do_caminho
+from comum.tempos import ResumoTempos
+from comum.transferencia import MODO_COPIAR, MODOS_BACKUP
+from lote.main import CAMINHO_POPPLER, COLUNAS_RELATORIO, ROTULOS_RELATORIO, TESSERACT_CMD
+
+INTERVALO_PADRAO = 5  # s entre consultas à fila quando não há nada novo
+
+
+def montar_parser():
+    parser = argparse.ArgumentParser(description="Divide um lote entre várias máquinas por uma fila compartilhada.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    c = sub.add_parser("coordenar", help="enfileira a origem e acompanha os resultados")
+    c.add_argument("fila", help="arquivo .sqlite da fila (numa pasta compartilhada)")
+    c.add_argument("origem", help="pasta de origem (percorrida recursivamente)")
+    c.add_argument("destino", help="pasta onde os PDFs serão gravados")
+    c.add_argument("--nome-base", required=True, help="nome base dos arquivos gerados")
+    c.add_argument("--palavra-chave", default="", help="palavra-chave cujo valor entra no nome")
+    c.add_argument("--campos", default="", help="campos extras lidos na mesma passada (ex.: serie,patrimonio)")
+    c.add_argument("--modelo-nome", default=MODELO_NOME_PADRAO, help="modelo do nome gerado")
+    c.add_argument("--paginas", default="", help="ordem de leitura das páginas (ex.: 1-2,-1)")
+    c.add_argument("--modelo", choices=nomes_modelos(), default=None, help="modelo de layout")
+    c.add_argument("--filtro", default="", help="só arquivos com esta extensão (ex.: .pdf)")
+    c.add_argument("--nao-recursivo", action="store_true", help="não entra nas subpastas")
+    c.add_argument("--backup", default="", help="pasta para cópia dos originais")
+    c.add_argument("--modo-saida", choices=MODOS_BACKUP, default=MODO_COPIAR,
+                   help="como os PDFs vão para o destino (mover não: uma tentativa repetida precisa do original)")
+    c.add_argument("--modo-backup", choices=MODOS_BACKUP, default=MODO_COPIAR, help="como os originais vão para --backup")
+    c.add_argument("--concessao", type=float, default=CONCESSAO_PADRAO,
+                   help="segundos de concessão de cada trabalho; sem renovação nesse tempo, volta para a fila")
+    c.add_argument("--max-tentativas", type=int, default=TENTATIVAS_PADRAO,
+                   help="tentativas por trabalho antes de desistir com erro")
+    c.add_argument("--saida", default="-", help="arquivo .jsonl com os resultados ('-' = stdout)")
+    c.add_argument("--relatorio", default="", help="relatório gravado conforme os trabalhos terminam")
+    c.add_argument("--colunas", default=",".join(COLUNAS_RELATORIO), help="chaves do registro no relatório")
+    c.add_argument("--sem-aguardar", action="store_true", help="só enfileira; não acompanha os resultados")
+    c.add_argument("--intervalo", type=float, default=INTERVALO_PADRAO, help="segundos entre consultas à fila")
+
+    t = sub.add_parser("trabalhar", help="processa trabalhos da fila até ela acabar")
+    t.add_argument("fila", help="arquivo .sqlite da fila")
+    t.add_argument("--workers", type=int, default=1, help="processos de extração/OCR nesta máquina")
+    t.add_argument("--continuo", action="store_true", help="não para quando a fila acaba; espera trabalhos novos")
+    t.add_argument("--intervalo", type=float, default=INTERVALO_PADRAO, help="segundos entre consultas à fila vazia")
+    t.add_argument("--tesseract", default=TESSERACT_CMD, help="caminho do executável do Tesseract")
+    t.add_argument("--poppler", default=CAMINHO_POPPLER, help="pasta bin do Poppler")
+    t.add_argument("--sem-cache", action="store_true", help="não usa o cache de OCR")
+    t.add_argument("--memoria-mb", type=int, default=0, help="memória máxima para páginas rasterizadas")
+    t.add_argument("--max-paginas", type=int, default=0, help="páginas rasterizadas ao mesmo tempo")
+    t.add_argument("--raster-disco", action="store_true", help="rasteriza em arquivo temporário")
+    t.add_argument("--motor-ocr", choices=[MOTOR_AUTO, MOTOR_TESSEROCR, MOTOR_PYTESSERACT], default=MOTOR_AUTO)
+    t.add_argument("--preprocessamento", default=RECEITA_PADRAO, help="etapas antes do OCR (ver lote/main.py)")
+
+    e = sub.add_parser("estado", help="quantos trabalhos em cada estado")
+    e.add_argument("fila", help="arquivo .sqlite da fila")
+
+    r = sub.add_parser("reabrir", help="devolve os trabalhos com erro para a fila")
+    r.add_argument("fila", help="arquivo .sqlite da fila")
+    return parser
+
+
+def abrir_fila(caminho, parametros=None):
+    """Fila com a concessão e as tentativas gravadas pelo coordenador."""
+    if parametros is None:
+        fila = FilaTrabalhos(caminho)
+        parametros = fila.parametros()
+        fila.fechar()
+    return FilaTrabalhos(caminho, parametros.get("concessao", CONCESSAO_PADRAO),
+                         parametros.get("max_tentativas", TENTATIVAS_PADRAO))
+
+
+# -------- coordenador ----------
+def coordenar(args):
+    if not os.path.isdir(args.origem):
+        print(f"Pasta de origem inválida: {args.origem}", file=sys.stderr)
+        return 2
+    try:
+        campos = campos_busca(args.palavra_chave, args.campos)
+        if args.relatorio:
+            formato_do_caminho(args.relatorio)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    desconhecidos = [c for c in campos_do_modelo(args.modelo_nome) if c != "nome_base" and c not in campos]
+    if desconhecidos:
+        print(f"Campos do modelo de nome sem definição: {', '.join(desconhecidos)}", file=sys.stderr)
+        return 2
+    ensure_dir(args.destino)
+    if args.backup:
+        ensure_dir(args.backup)
+
+    parametros = {"destino": args.destino, "nome_base": args.nome_base, "palavra_chave": args.palavra_chave,
+                  "campos": args.campos, "modelo_nome": args.modelo_nome, "paginas": args.paginas,
+                  "modelo": args.modelo, "backup": args.backup, "modo_saida": args.modo_saida,
+                  "modo_backup": args.modo_backup, "concessao": args.concessao,
+                  "max_tentativas": args.max_tentativas}
+    fila = abrir_fila(args.fila, parametros)
+    fila.gravar_parametros(parametros)
+    destino_abs = os.path.abspath(args.destino)
+    arquivos = (p for p in percorrer_arquivos(args.origem, args.filtro, not args.nao_recursivo, PASTAS_IGNORADAS)
+                if not os.path.abspath(p).startswith(destino_abs + os.sep))
+    novos = fila.enfileirar(arquivos)
+    print(f"{novos} trabalho(s) novo(s) na fila {args.fila}", file=sys.stderr)
+    if args.sem_aguardar:
+        return 0
+    return acompanhar(fila, args)
+
+
+def acompanhar(fila, args):
+    """Escreve cada resultado conforme termina, até não sobrar pendente nem em execução."""
+    saida = sys.stdout if args.saida == "-" else open(args.saida, "a", encoding="utf-8")
+    relatorio = None
+    if args.relatorio:
+        colunas = [c.strip() for c in args.colunas.split(",") if c.strip()]
+        relatorio = Relatorio(args.relatorio, [(c, ROTULOS_RELATORIO.get(c, c)) for c in colunas])
+    resumo = ResumoTempos()
+    ultimo = total = erros = 0
+    inicio = time.perf_counter()
+    try:
+        while True:
+            terminada = fila.terminada()  # antes de ler: o que terminou até aqui entra nesta leitura
+            for seq, origem, estado, rec, mensagem in fila.resultados(ultimo):
+                ultimo = seq
+                rec = rec or novo_registro(origem, status="Erro", mensagem=mensagem or "")
+                total += 1
+                if rec.get("status") == "Erro":
+                    erros += 1
+                resumo.adicionar(rec)
+                saida.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                saida.flush()
+                if relatorio:
+                    relatorio.adicionar(rec)
+            if terminada:
+                break
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        print("Acompanhamento interrompido; os trabalhadores continuam (coordenar de novo retoma).",
+              file=sys.stderr)
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+        if relatorio:
+            relatorio.fechar()
+        fila.fechar()
+    print(f"{total} arquivos ({erros} com erro) em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    if resumo.texto():
+        print(resumo.texto(), file=sys.stderr)
+    return 1 if erros else 0
+
+
+# -------- trabalhador ----------
+def configurar_trabalhador(args):
+    try:
+        interpretar_receita(args.preprocessamento)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return False
+    # pelo ambiente, para valer também nos processos do pool
+    os.environ["TESSERACT_CMD"] = pytesseract.pytesseract.tesseract_cmd = args.tesseract
+    os.environ["CAMINHO_POPPLER"] = comum.extracao.CAMINHO_POPPLER = args.poppler
+    configurar_cache(ativo=not args.sem_cache)
+    configurar_motor(args.motor_ocr)
+    configurar_preprocessamento(args.preprocessamento)
+    configurar_rasterizacao(args.memoria_mb, args.max_paginas, MODO_DISCO if args.raster_disco else MODO_MEMORIA)
+    return True
+
+
+def processar_disponiveis(fila, dono, p, workers, inicializador, initargs):
+    """Pega e processa trabalhos enquanto houver algum a pegar; devolve quantos terminou."""
+    campos = campos_busca(p["palavra_chave"], p["campos"])
+    obrigatorios = campos_do_modelo(p["modelo_nome"])
+    em_andamento = deque()
+
+    def tarefas():
+        # pega um trabalho de cada vez, conforme o pool tem vaga
+        while True:
+            trabalho = fila.pegar(dono)
+            if trabalho is None:
+                return
+            rec = novo_registro(trabalho["origem"])
+            em_andamento.append((trabalho, rec))
+            yield (rec["orig_path"], rec["tipo"], campos, obrigatorios, p["paginas"], p["modelo"])
+
+    feitos = 0
+    for valores, origem_chave, tempos, conteudo in executar_em_ordem(extrair_campos_arquivo, tarefas(), workers,
+                                                                     MODO_PROCESSO, inicializador=inicializador,
+                                                                     initargs=initargs):
+        trabalho, rec = em_andamento.popleft()
+        try:
+            # o mesmo caminho em todas as tentativas: repetir grava por cima, sem "_1"
+            caminho = fila.reservar_nome(trabalho["id"], montar_nome(p["nome_base"], valores, p["modelo_nome"]),
+                                         p["destino"])
+            finalizar_registro(rec, caminho, valores, origem_chave, p["backup"] or None, None, tempos,
+                               p["modo_saida"], p["modo_backup"], conteudo)
+        except Exception as e:
+            rec.update(status="Erro", mensagem=str(e))
+        rec["tentativa"] = trabalho["tentativas"]
+        if rec["status"] == "Concluído":
+            fila.concluir(trabalho["id"], rec)
+        else:
+            fila.falhar(trabalho["id"], dono, rec["mensagem"] or "Erro", rec)
+        print(f"{rec['status']}: {rec['antigo']} -> {rec['novo'] or '-'}", file=sys.stderr)
+        feitos += 1
+    return feitos
+
+
+def trabalhar(args):
+    if not configurar_trabalhador(args):
+        return 2
+    fila = abrir_fila(args.fila)
+    p = fila.parametros()
+    if "destino" not in p:
+        print(f"Fila sem parâmetros (rode o coordenar antes): {args.fila}", file=sys.stderr)
+        return 2
+    dono = novo_dono()
+    inicializador, initargs = preparar_orcamento()
+    renovador = Renovador(fila, dono)
+    total = 0
+    print(f"Trabalhador {dono} na fila {args.fila}", file=sys.stderr)
+    try:
+        while True:
+            total += processar_disponiveis(fila, dono, p, max(1, args.workers), inicializador, initargs)
+            if fila.terminada() and not args.continuo:
+                break
+            # nada a pegar agora: o resto está com outros trabalhadores (ou a fila acabou, --continuo)
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        print("Interrompido; as concessões deste trabalhador vencem e voltam para a fila.", file=sys.stderr)
+    finally:
+        renovador.parar()
+        fila.fechar()
+    print(f"{total} trabalho(s) processado(s) por {dono}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    args = montar_parser().parse_args(argv)
+    if args.comando == "coordenar":
+        return coordenar(args)
+    if args.comando == "trabalhar":
+        return trabalhar(args)
+    fila = abrir_fila(args.fila)
+    try:
+        if args.comando == "reabrir":
+            print(f"{fila.reabrir_erros()} trabalho(s) de volta na fila", file=sys.stderr)
+        contagem = fila.contagem()
+        print(", ".join(f"{estado}: {contagem[estado]}" for estado in ESTADOS))
+    finally:
+        fila.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,64 +1,107 @@
 import os
 import re
 import shutil
+import sys
 import threading
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-from pdf2image import convert_from_path
+from tkinter import filedialog, messagebox
 import pytesseract
-from fpdf import FPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from comum.diario import Diario, OP_CRIAR, OP_LIXEIRA, OP_MOVER, desfazer, ultimo_diario
+from comum.extracao import extrair_valor_pdf, texto_ocr_imagem
+from comum.imagem_pdf import A4, PT_POR_MM, imagens_para_pdf, imagem_para_pdf
+from comum.lista_virtual import AtualizacaoPeriodica, ListaVirtual, listar_em_segundo_plano
+from comum.nomes import AlocadorNomes, chave_nome
 
 # ===============================
 # CONFIGURAÇÕES
 # ===============================
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 CAMINHO_POPPLER = r"C:\poppler-25.11.0\Library\bin"
+EXT_IMAGENS = (".png", ".jpg", ".jpeg", ".bmp", ".tiff")
+MARGEM_PAGINA = 10 * PT_POR_MM  # imagem ajustada numa folha A4 com 10 mm de margem
 
 # ===============================
 # VARIÁVEL DE CONTROLE
 # ===============================
 cancelar = False
 
+# linhas da lista: [nome original, novo nome]; a tela mostra só as visíveis
+linhas = []
+trava_lista = threading.Lock()
+novas_linhas = []
+listagem = {"geracao": 0, "fim": 0, "ativa": False}
+processando = threading.Event()
+
 # ===============================
 # FUNÇÕES
 # ===============================
+def buscar_chave(texto, palavra_chave):
+    padrao = rf"{palavra_chave}[: ]+([A-Za-z0-9\-\.]+)"
+    encontrado = re.search(padrao, texto, re.IGNORECASE)
+    return encontrado.group(1) if encontrado else None
+
 def extrair_chave_pdf(pdf_path, palavra_chave):
+    # camada de texto primeiro, OCR só se não achar
     try:
-        paginas = convert_from_path(pdf_path, poppler_path=CAMINHO_POPPLER)
-        texto_total = ""
-        for pagina in paginas:
-            texto_total += pytesseract.image_to_string(pagina, lang="por")
         if palavra_chave:
-            padrao = rf"{palavra_chave}[: ]+([A-Za-z0-9\-\.]+)"
-            encontrado = re.search(padrao, texto_total, re.IGNORECASE)
-            return encontrado.group(1) if encontrado else None
+            resultado = extrair_valor_pdf(pdf_path, lambda texto: buscar_chave(texto, palavra_chave),
+                                          poppler_path=CAMINHO_POPPLER)
+            return resultado["valor"]
         return None
     except Exception as e:
         return None
 
 def extrair_chave_imagem(img_path, palavra_chave):
     try:
-        texto = pytesseract.image_to_string(img_path, lang="por")
+        texto = texto_ocr_imagem(img_path, lang="por")
         if palavra_chave:
-            padrao = rf"{palavra_chave}[: ]+([A-Za-z0-9\-\.]+)"
-            encontrado = re.search(padrao, texto, re.IGNORECASE)
-            return encontrado.group(1) if encontrado else None
+            return buscar_chave(texto, palavra_chave)
         return None
     except Exception as e:
         return None
 
+def atualizar_tela():
+    """Um quadro: recebe lotes da listagem e redesenha as linhas visíveis."""
+    global novas_linhas
+    ativo = listagem["ativa"] or processando.is_set()
+    with trava_lista:
+        novas, novas_linhas = novas_linhas, []
+        terminou = listagem["ativa"] and listagem["fim"] == listagem["geracao"]
+    linhas.extend(novas)
+    if terminou:
+        listagem["ativa"] = False
+    lista_arquivos.redesenhar()
+    return ativo
+
 def atualizar_lista():
-    lista_arquivos.delete(*lista_arquivos.get_children())
+    global novas_linhas
+    with trava_lista:
+        listagem["geracao"] += 1
+        geracao = listagem["geracao"]
+        novas_linhas = []
+    linhas.clear()
     pasta = pasta_var.get()
     ext_filtro = ext_var.get().strip().lower()
-    if not pasta:
+    if not pasta or not os.path.isdir(pasta):
+        listagem["ativa"] = False
+        atualizar_tela()
         return
-    arquivos = [f for f in os.listdir(pasta) if os.path.isfile(os.path.join(pasta, f))]
-    for arquivo in arquivos:
-        if ext_filtro and not arquivo.lower().endswith(ext_filtro):
-            continue
+
+    def entregar(nomes):
         # Apenas mostra o arquivo, sem processar OCR
-        lista_arquivos.insert("", "end", values=(arquivo, "Aguardando..."))
+        with trava_lista:
+            if geracao == listagem["geracao"]:
+                novas_linhas.extend([arquivo, "Aguardando..."] for arquivo in nomes)
+
+    def terminar():
+        with trava_lista:
+            listagem["fim"] = geracao
+
+    listagem["ativa"] = True
+    listar_em_segundo_plano(pasta, ext_filtro, entregar, terminar, lambda: geracao != listagem["geracao"])
+    tela.iniciar()
 
 
 def processar_ocr_lista():
@@ -66,16 +109,16 @@ def processar_ocr_lista():
     pasta = pasta_var.get()
     palavra = palavra_chave_var.get()
     nome_base = nome_base_var.get()
-    for item in lista_arquivos.get_children():
+    for linha in list(linhas):
         if cancelar:
-            return
-        antigo, _ = lista_arquivos.item(item, "values")
+            break
+        antigo = linha[0]
         caminho = os.path.join(pasta, antigo)
         novo_nome = antigo
         chave = None
         if antigo.lower().endswith(".pdf"):
             chave = extrair_chave_pdf(caminho, palavra)
-        elif antigo.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".tiff")):
+        elif antigo.lower().endswith(EXT_IMAGENS):
             chave = extrair_chave_imagem(caminho, palavra)
             # Garante que vai ser PDF
             if chave:
@@ -84,8 +127,8 @@ def processar_ocr_lista():
                 novo_nome = f"{nome_base}_{os.path.splitext(antigo)[0]}.pdf" if nome_base else f"{os.path.splitext(antigo)[0]}.pdf"
         elif chave:
             novo_nome = f"{nome_base}_{chave}.pdf" if nome_base else f"{chave}.pdf"
-        root.after(0, lambda i=item, a=antigo, n=novo_nome:
-                   lista_arquivos.item(i, values=(a, n)))
+        linha[1] = novo_nome  # aparece no próximo quadro da tela
+    processando.clear()
 
 def renomear_arquivos():
     pasta = pasta_var.get()
@@ -97,32 +140,89 @@ def renomear_arquivos():
     backup_path = os.path.join(pasta, "BACKUP") if backup else None
     if backup and not os.path.exists(backup_path):
         os.makedirs(backup_path)
+    # cada renomeação/conversão (e a cópia de backup) vai para o diário (pasta/.diario) e pode ser desfeita;
+    # com "retomar", o que a execução interrompida já fez é pulado
+    with Diario.abrir(pasta, retomar=retomar_var.get(), parametros={"nome_base": nome_base_var.get()}) as diario:
+        # nomes livres reservados no disco (comum/nomes.py): nada existente é sobrescrito
+        alocador = AlocadorNomes(pasta, diario)
+        alocador_backup = AlocadorNomes(backup_path, diario) if backup else None
+        for linha in list(linhas):
+            antigo, novo = linha
+            caminho_antigo = os.path.join(pasta, antigo)
+            eh_imagem = antigo.lower().endswith(EXT_IMAGENS)
+            eh_pdf = antigo.lower().endswith(".pdf")
+            if not (eh_imagem or eh_pdf) or diario.ja_concluido(caminho_antigo) is not None:
+                continue
+            if eh_pdf and chave_nome(novo) == chave_nome(antigo):
+                continue  # sem chave: fica com o nome que tem
 
-    for item in lista_arquivos.get_children():
-        antigo, novo = lista_arquivos.item(item, "values")
-        caminho_antigo = os.path.join(pasta, antigo)
-        caminho_novo = os.path.join(pasta, novo)
-
-        if backup:
-            shutil.copy2(caminho_antigo, os.path.join(backup_path, antigo))
-
-        # Se o arquivo original é imagem → converte para PDF
-        if antigo.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".tiff")):
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.image(caminho_antigo, x=10, y=10, w=180)
-            pdf.output(caminho_novo)
-            os.remove(caminho_antigo)  # opcional: remove a imagem original
-        # Se é PDF → renomeia
-        elif antigo.lower().endswith(".pdf"):
-            if not os.path.exists(caminho_novo):
-                os.rename(caminho_antigo, caminho_novo)
-            else:
-                messagebox.showwarning("Aviso", f"Arquivo {novo} já existe.")
+            operacoes = []
+            try:
+                if backup:
+                    caminho_backup = alocador_backup.alocar(antigo)
+                    operacoes.append((OP_CRIAR, caminho_backup))
+                    shutil.copy2(caminho_antigo, caminho_backup)
+
+                # Se o arquivo original é imagem → PDF com a imagem embutida sem recodificar
+                if eh_imagem:
+                    caminho_novo = alocador.alocar(novo)
+                    operacoes.append((OP_CRIAR, caminho_novo))
+                    imagem_para_pdf(caminho_antigo, caminho_novo, A4, MARGEM_PAGINA)
+                    linha[1] = os.path.basename(caminho_novo)
+                    # opcional: tira a imagem original da pasta (vai para a lixeira do diário)
+                    lixo = diario.mandar_para_lixeira(caminho_antigo)
+                    operacoes.append((OP_LIXEIRA, caminho_antigo, lixo))
+                # Se é PDF → renomeia para o nome reservado (substitui a reserva vazia)
+                else:
+                    caminho_novo = alocador.alocar(novo)
+                    try:
+                        os.replace(caminho_antigo, caminho_novo)
+                    except OSError:
+                        alocador.liberar(caminho_novo)
+                        raise
+                    operacoes.append((OP_MOVER, caminho_antigo, caminho_novo))
+                    linha[1] = os.path.basename(caminho_novo)
+            except Exception as e:
+                # nada fica pela metade: o que foi criado para este arquivo é apagado
+                for op in operacoes:
+                    if op[0] == OP_CRIAR and os.path.exists(op[1]):
+                        os.remove(op[1])
+                messagebox.showwarning("Aviso", f"Falha em {antigo}: {e}")
+                continue
+            diario.concluido(caminho_antigo, operacoes)
 
     messagebox.showinfo("Sucesso", "Arquivos renomeados e salvos!")
     atualizar_lista()
 
+def desfazer_renomeacao():
+    pasta = pasta_var.get()
+    caminho = ultimo_diario(pasta) if pasta else None
+    if not caminho:
+        messagebox.showinfo("Desfazer", "Nenhuma renomeação registrada nesta pasta.")
+        return
+    if not messagebox.askyesno("Desfazer", "Voltar os nomes e as imagens da última renomeação?"):
+        return
+    desfeitos, falhas = desfazer(caminho)
+    messagebox.showinfo("Desfazer", f"{desfeitos} arquivo(s) desfeito(s), {falhas} falha(s).")
+    atualizar_lista()
+
+def juntar_imagens():
+    """Todas as imagens da lista, na ordem, num PDF só (uma página por imagem)."""
+    pasta = pasta_var.get()
+    imagens = [os.path.join(pasta, antigo) for antigo, _ in list(linhas) if antigo.lower().endswith(EXT_IMAGENS)]
+    if not imagens:
+        messagebox.showwarning("Aviso", "Nenhuma imagem na lista.")
+        return
+    destino = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF", "*.pdf")],
+                                           initialdir=pasta, title="Salvar PDF com as imagens")
+    if not destino:
+        return
+    try:
+        paginas = imagens_para_pdf(imagens, destino, A4, MARGEM_PAGINA)
+        messagebox.showinfo("Sucesso", f"PDF com {paginas} página(s) salvo em: {destino}")
+    except Exception as e:
+        messagebox.showerror("Erro", f"Falha ao juntar imagens: {e}")
+
 def selecionar_pasta():
     caminho = filedialog.askdirectory()
     if caminho:
@@ -131,8 +231,13 @@ def selecionar_pasta():
 
 def iniciar_processamento():
     global cancelar
+    if listagem["ativa"]:
+        messagebox.showinfo("Atenção", "Aguarde a lista de arquivos terminar de carregar.")
+        return
     cancelar = False
+    processando.set()
     threading.Thread(target=processar_ocr_lista, daemon=True).start()
+    tela.iniciar()
 
 def cancelar_processamento():
     global cancelar
@@ -151,6 +256,7 @@ palavra_chave_var = tk.StringVar()
 nome_base_var = tk.StringVar()
 ext_var = tk.StringVar()
 backup_var = tk.BooleanVar()
+retomar_var = tk.BooleanVar()
 
 frame_top = tk.Frame(root)
 frame_top.pack(pady=10)
@@ -167,12 +273,13 @@ tk.Entry(frame_top, textvariable=nome_base_var, width=30).grid(row=2, column=1,
 tk.Label(frame_top, text="Filtrar Extensão (ex: .pdf):").grid(row=3, column=0, sticky="w")
 tk.Entry(frame_top, textvariable=ext_var, width=20).grid(row=3, column=1, sticky="w")
 tk.Checkbutton(frame_top, text="Salvar PDFs originais em BACKUP", variable=backup_var).grid(row=4, column=1, sticky="w")
+tk.Checkbutton(frame_top, text="Retomar execução interrompida", variable=retomar_var).grid(row=5, column=1, sticky="w")
 tk.Button(frame_top, text="Atualizar Lista", command=atualizar_lista).grid(row=3, column=2, padx=5)
 
-lista_arquivos = ttk.Treeview(root, columns=("Antigo", "Novo"), show="headings")
-lista_arquivos.heading("Antigo", text="Nome Original")
-lista_arquivos.heading("Novo", text="Novo Nome")
+lista_arquivos = ListaVirtual(root, [("Antigo", "Nome Original", 420), ("Novo", "Novo Nome", 420)],
+                              lambda i: linhas[i], lambda: len(linhas))
 lista_arquivos.pack(expand=True, fill="both", padx=10, pady=10)
+tela = AtualizacaoPeriodica(root, atualizar_tela)
 
 frame_botoes = tk.Frame(root)
 frame_botoes.pack(pady=5)
@@ -181,6 +288,11 @@ tk.Button(frame_botoes, text="Iniciar Processamento", bg="blue", fg="white",
 tk.Button(frame_botoes, text="Cancelar", bg="red", fg="white",
           command=cancelar_processamento).grid(row=0, column=1, padx=10)
 
+tk.Button(frame_botoes, text="Juntar Imagens em um PDF",
+          command=juntar_imagens).grid(row=0, column=2, padx=10)
+tk.Button(frame_botoes, text="Desfazer Última Renomeação",
+          command=desfazer_renomeacao).grid(row=0, column=3, padx=10)
+
 tk.Button(root, text="Renomear Arquivos", command=renomear_arquivos, bg="green", fg="white").pack(pady=10)
 
 root.mainloop()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Modo em lote (sem interface gráfica) para servidor / compartilhamentos grandes.
+- Percorre a pasta de origem recursivamente, sob demanda (os.scandir)
+- Começa a processar no primeiro arquivo encontrado
+- Mesma extração/conversão da GUI (comum/processamento.py)
+- Cada arquivo concluído vira uma linha JSON (JSON Lines) na saída, na hora
+- Diário da execução no destino: --retomar continua, --desfazer volta (comum/diario.py)
+
+Exemplo:
+    python lote/main.py \\\\servidor\\scans D:\\saida --nome-base RAT --palavra-chave Série --workers 8 > resultado.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pytesseract
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import comum.extracao
+from comum.cache_ocr import configurar_cache
+from comum.diario import Diario, desfazer, ultimo_diario
+from comum.duplicados import ACOES, COLUNAS_DUPLICADOS, LIMIAR_SEMELHANCA, DetectorDuplicados
+from comum.campos import MODELO_NOME_PADRAO, campos_busca, campos_do_modelo
+from comum.modelos_layout import nomes_modelos
+from comum.processamento import PASTAS_IGNORADAS, ensure_dir, novo_registro, percorrer_arquivos, processar_lote
+from comum.motor_ocr import configurar_motor, MOTOR_AUTO, MOTOR_PYTESSERACT, MOTOR_TESSEROCR
+from comum.preprocessamento import RECEITA_PADRAO, configurar_preprocessamento, interpretar_receita
+from comum.rasterizacao import configurar_rasterizacao, MODO_DISCO, MODO_MEMORIA
+from comum.relatorio import Relatorio, formato_do_caminho
+from comum.tempos import COLUNAS_METRICAS, COLUNAS_OCR, ResumoTempos
+from comum.transferencia import MODO_COPIAR, MODOS, MODOS_BACKUP
+
+# ========== CONFIG ==========
+TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+CAMINHO_POPPLER = r"C:\poppler-25.11.0\Library\bin"
+# ===========================
+
+# lidos do ambiente para valer também nos processos do pool (spawn reimporta este módulo)
+pytesseract.pytesseract.tesseract_cmd = os.environ.get("TESSERACT_CMD", TESSERACT_CMD)
+comum.extracao.CAMINHO_POPPLER = os.environ.get("CAMINHO_POPPLER", CAMINHO_POPPLER)
+
+
+COLUNAS_RELATORIO = ("antigo", "novo", "status", "origem", "mensagem")
+ROTULOS_RELATORIO = dict(COLUNAS_METRICAS + COLUNAS_OCR + COLUNAS_DUPLICADOS)
+
+
+def montar_parser():
+    parser = argparse.ArgumentParser(description="Renomeia e converte para PDF em lote, sem interface gráfica.")
+    parser.add_argument("origem", help="pasta de origem (percorrida recursivamente)")
+    parser.add_argument("destino", help="pasta onde os PDFs serão gravados")
+    parser.add_argument("--nome-base", required=True, help="nome base dos arquivos gerados")
+    parser.add_argument("--palavra-chave", default="", help="palavra-chave cujo valor entra no nome")
+    parser.add_argument("--campos", default="",
+                        help="campos extras lidos na mesma passada (ex.: serie,patrimonio,data ou lote:Lote Nº)")
+    parser.add_argument("--modelo-nome", default=MODELO_NOME_PADRAO,
+                        help="modelo do nome gerado (ex.: {nome_base}_{serie}_{patrimonio})")
+    parser.add_argument("--paginas", default="", help="ordem de leitura das páginas (ex.: 1-2,-1)")
+    parser.add_argument("--modelo", choices=nomes_modelos(), default=None, help="modelo de layout")
+    parser.add_argument("--filtro", default="", help="só arquivos com esta extensão (ex.: .pdf)")
+    parser.add_argument("--nao-recursivo", action="store_true", help="não entra nas subpastas")
+    parser.add_argument("--backup", default="", help="pasta para cópia dos originais")
+    parser.add_argument("--modo-saida", choices=MODOS, default=MODO_COPIAR,
+                        help="como os PDFs vão para o destino; hardlink/reflink/mover não regravam os bytes "
+                             "no mesmo dispositivo (em outro, cópia)")
+    parser.add_argument("--modo-backup", choices=MODOS_BACKUP, default=MODO_COPIAR,
+                        help="como os originais vão para --backup")
+    parser.add_argument("--workers", type=int, default=1, help="processos de extração/OCR em paralelo")
+    parser.add_argument("--workers-conversao", type=int, default=0,
+                        help="threads de backup/conversão (padrão: o mesmo de --workers)")
+    parser.add_argument("--saida", default="-", help="arquivo .jsonl de saída ('-' = stdout)")
+    parser.add_argument("--relatorio", default="",
+                        help="relatório gravado conforme os arquivos terminam (.xlsx, .csv ou .parquet)")
+    parser.add_argument("--colunas", default=",".join(COLUNAS_RELATORIO),
+                        help="chaves do registro no relatório, separadas por vírgula "
+                             "(campo_<nome> para cada campo lido)")
+    parser.add_argument("--sem-cache", action="store_true", help="não usa o cache de OCR")
+    parser.add_argument("--retomar", action="store_true",
+                        help="continua a última execução interrompida neste destino, pulando o que já foi feito")
+    parser.add_argument("--desfazer", nargs="?", const="", metavar="DIARIO",
+                        help="não processa: desfaz a última execução neste destino (ou o diário indicado)")
+    parser.add_argument("--tesseract", default=TESSERACT_CMD, help="caminho do executável do Tesseract")
+    parser.add_argument("--poppler", default=CAMINHO_POPPLER, help="pasta bin do Poppler")
+    parser.add_argument("--memoria-mb", type=int, default=0,
+                        help="memória máxima para páginas rasterizadas, somando os workers (0 = sem limite)")
+    parser.add_argument("--max-paginas", type=int, default=0,
+                        help="páginas rasterizadas ao mesmo tempo, somando os workers (0 = sem limite)")
+    parser.add_argument("--raster-disco", action="store_true",
+                        help="rasteriza em arquivo temporário e o Tesseract lê do disco")
+    parser.add_argument("--motor-ocr", choices=[MOTOR_AUTO, MOTOR_TESSEROCR, MOTOR_PYTESSERACT], default=MOTOR_AUTO,
+                        help="tesserocr mantém o Tesseract carregado; pytesseract abre um processo por página")
+    parser.add_argument("--preprocessamento", default=RECEITA_PADRAO,
+                        help="etapas antes do OCR, na ordem: cinza, recortar, reduzir, endireitar, "
+                             "binarizar (\"nenhum\" desliga; os níveis 2 e 3 da escada usam receitas próprias)")
+    parser.add_argument("--duplicados", choices=ACOES, default=None,
+                        help="cópias de um arquivo já visto: pular (não converte), copiar (campos do primeiro, "
+                             "sem OCR) ou revisar (como copiar, status Revisar); semelhantes são lidos e saem como Revisar")
+    parser.add_argument("--limiar-semelhanca", type=int, default=LIMIAR_SEMELHANCA,
+                        help="bits diferentes (de 256) para considerar um reescaneado semelhante (0 = só cópias exatas)")
+    return parser
+
+
+def preparar(args):
+    """Valida pastas e aplica a configuração (também usado pelo monitor/main.py)."""
+    if not os.path.isdir(args.origem):
+        print(f"Pasta de origem inválida: {args.origem}", file=sys.stderr)
+        return False
+    ensure_dir(args.destino)
+    try:
+        campos = campos_busca(args.palavra_chave, args.campos)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return False
+    desconhecidos = [c for c in campos_do_modelo(args.modelo_nome) if c != "nome_base" and c not in campos]
+    if desconhecidos:
+        print(f"Campos do modelo de nome sem definição: {', '.join(desconhecidos)}", file=sys.stderr)
+        return False
+    if args.backup:
+        ensure_dir(args.backup)
+    if args.relatorio:
+        try:
+            formato_do_caminho(args.relatorio)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return False
+    try:
+        interpretar_receita(args.preprocessamento)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return False
+
+    os.environ["TESSERACT_CMD"] = pytesseract.pytesseract.tesseract_cmd = args.tesseract
+    os.environ["CAMINHO_POPPLER"] = comum.extracao.CAMINHO_POPPLER = args.poppler
+    configurar_cache(ativo=not args.sem_cache)
+    configurar_motor(args.motor_ocr)
+    configurar_preprocessamento(args.preprocessamento)
+    configurar_rasterizacao(args.memoria_mb, args.max_paginas, MODO_DISCO if args.raster_disco else MODO_MEMORIA)
+    return True
+
+
+def abrir_relatorio(args):
+    """Relatório de --relatorio (ou None); também usado pelo monitor/main.py."""
+    if not args.relatorio:
+        return None
+    colunas = [c.strip() for c in args.colunas.split(",") if c.strip()]
+    if args.duplicados:
+        colunas += [c for c, _ in COLUNAS_DUPLICADOS if c not in colunas]
+    return Relatorio(args.relatorio, [(c, ROTULOS_RELATORIO.get(c, c)) for c in colunas])
+
+
+def abrir_duplicados(args):
+    """Detector de --duplicados (ou None); também usado pelo monitor/main.py."""
+    if not args.duplicados:
+        return None
+    return DetectorDuplicados(args.duplicados, max(0, args.limiar_semelhanca))
+
+
+def desfazer_execucao(destino, caminho=""):
+    caminho = caminho or ultimo_diario(destino)
+    if not caminho:
+        print(f"Nenhuma execução registrada em {destino}", file=sys.stderr)
+        return 2
+
+    def mostrar(evento, erro):
+        if erro:
+            print(f"Falha ao desfazer {evento.get('origem')}: {erro}", file=sys.stderr)
+
+    desfeitos, falhas = desfazer(caminho, mostrar)
+    print(f"{desfeitos} arquivo(s) desfeito(s), {falhas} falha(s) ({caminho})", file=sys.stderr)
+    return 1 if falhas else 0
+
+
+def main(argv=None):
+    args = montar_parser().parse_args(argv)
+    if args.desfazer is not None:
+        return desfazer_execucao(args.destino, args.desfazer)
+    if not preparar(args):
+        return 2
+
+    destino_abs = os.path.abspath(args.destino)
+    arquivos = (p for p in percorrer_arquivos(args.origem, args.filtro, not args.nao_recursivo, PASTAS_IGNORADAS)
+                if not os.path.abspath(p).startswith(destino_abs + os.sep))
+    registros = (novo_registro(p) for p in arquivos)
+
+    saida = sys.stdout if args.saida == "-" else open(args.saida, "a", encoding="utf-8")
+    relatorio = abrir_relatorio(args)
+    duplicados = abrir_duplicados(args)
+    diario = Diario.abrir(args.destino, retomar=args.retomar,
+                          parametros={"origem": args.origem, "nome_base": args.nome_base,
+                                      "modelo_nome": args.modelo_nome})
+    if args.retomar and not diario.retomado:
+        print("Nenhuma execução interrompida neste destino; começando uma nova.", file=sys.stderr)
+    completo = False
+    total = erros = 0
+    resumo = ResumoTempos()
+    inicio = time.perf_counter()
+    try:
+        for rec in processar_lote(registros, args.destino, args.nome_base, args.palavra_chave,
+                                  args.paginas, args.modelo, backup_dir=args.backup or None,
+                                  workers=max(1, args.workers), workers_conversao=args.workers_conversao or None,
+                                  campos_extras=args.campos,
+                                  modelo_nome=args.modelo_nome,
+                                  modo_saida=args.modo_saida, modo_backup=args.modo_backup,
+                                  diario=diario, duplicados=duplicados):
+            total += 1
+            resumo.adicionar(rec)
+            if rec["status"] == "Erro":
+                erros += 1
+            saida.write(json.dumps({k: v for k, v in rec.items() if not k.startswith("_")}, ensure_ascii=False) + "\n")
+            saida.flush()
+            if relatorio:
+                relatorio.adicionar(rec)
+        completo = True
+    except KeyboardInterrupt:
+        print("Interrompido (--retomar continua daqui).", file=sys.stderr)
+    finally:
+        diario.fechar(completo)
+        if saida is not sys.stdout:
+            saida.close()
+        if relatorio:
+            relatorio.fechar()
+
+    duracao = time.perf_counter() - inicio
+    print(f"{total} arquivos ({erros} com erro) em {duracao:.1f}s", file=sys.stderr)
+    if resumo.texto():
+        print(resumo.texto(), file=sys.stderr)
+    if duplicados:
+        est = duplicados.estatisticas()
+        print(f"{est['copias']} duplicado(s) em {est['grupos']} grupo(s), sem OCR", file=sys.stderr)
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
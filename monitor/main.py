@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Monitor de pasta de entrada (roda direto, sem GUI).
+- A cada ciclo varre a pasta e compara com o estado salvo (mtime, tamanho, hash)
+- Só processa arquivos novos ou alterados, e só depois de "estáveis"
+  (tamanho/mtime sem mudar por --estabilidade segundos e arquivo abrível)
+- Mesmo pipeline do lote / GUI (comum/processamento.processar_lote)
+- Contrapressão: no máximo --fila-max arquivos aguardando OCR; o resto
+  fica para os próximos ciclos em vez de acumular na memória
+- Arquivo com "Erro" volta nos ciclos seguintes, até --tentativas vezes
+
+Exemplo:
+    python monitor/main.py D:\\entrada D:\\saida --nome-base RAT --palavra-chave Série --workers 4 --saida log.jsonl
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from comum.cache_ocr import hash_arquivo
+from comum.processamento import novo_registro, percorrer_arquivos, processar_lote
+from comum.diario import Diario
+from lote.main import abrir_duplicados, abrir_relatorio, desfazer_execucao, montar_parser, preparar
+
+STATUS_ERRO = "Erro"  # status de processar_lote para o arquivo que falhou
+
+
+class EstadoMonitor:
+    """Estado persistido em JSON: caminho -> {mtime, tamanho, hash, status, tentativas}."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.arquivos = {}
+        self._lock = threading.Lock()
+        self._alterado = False
+        if os.path.isfile(caminho):
+            try:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    self.arquivos = json.load(f)
+            except Exception as e:
+                print(f"Estado ilegível ({e}), começando do zero.", file=sys.stderr)
+
+    def conhecido(self, path, st, tentativas=1):
+        info = self.arquivos.get(path)
+        return (bool(info) and info["mtime"] == st.st_mtime and info["tamanho"] == st.st_size
+                and not self.tentar_de_novo(path, tentativas))
+
+    def tentar_de_novo(self, path, tentativas):
+        """Terminou com erro e ainda não esgotou as tentativas."""
+        info = self.arquivos.get(path) or {}
+        return info.get("status") == STATUS_ERRO and info.get("tentativas", 1) < tentativas
+
+    def hash_de(self, path):
+        info = self.arquivos.get(path)
+        return info.get("hash") if info else None
+
+    def marcar(self, path, st, hash_conteudo, status):
+        with self._lock:
+            anterior = self.arquivos.get(path) or {}
+            tentativas = 0
+            if status == STATUS_ERRO:
+                # conteúdo novo recomeça a contagem
+                mesmo = anterior.get("status") == STATUS_ERRO and anterior.get("hash") == hash_conteudo
+                tentativas = (anterior.get("tentativas", 1) if mesmo else 0) + 1
+            self.arquivos[path] = {"mtime": st.st_mtime, "tamanho": st.st_size,
+                                   "hash": hash_conteudo, "status": status, "tentativas": tentativas}
+            self._alterado = True
+
+    def salvar(self):
+        with self._lock:
+            if not self._alterado:
+                return
+            temp = self.caminho + ".tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(self.arquivos, f, ensure_ascii=False)
+            os.replace(temp, self.caminho)
+            self._alterado = False
+
+
+def arquivo_abrivel(path):
+    try:
+        with open(path, "rb") as f:
+            f.read(1)
+        return True
+    except OSError:
+        return False
+
+
+class Monitor:
+    def __init__(self, args):
+        self.args = args
+        self.estado = EstadoMonitor(args.estado or os.path.join(args.destino, ".estado_monitor.json"))
+        self.fila = queue.Queue(maxsize=max(1, args.fila_max))
+        self.em_andamento = set()   # caminhos na fila ou sendo processados
+        self.estabilizando = {}     # caminho -> (mtime, tamanho, visto_em)
+        self.parar = threading.Event()
+        self.saida = sys.stdout if args.saida == "-" else open(args.saida, "a", encoding="utf-8")
+        self.relatorio = abrir_relatorio(args)
+        self.duplicados = abrir_duplicados(args)  # um só para todos os ciclos
+        # diário para --desfazer; os arquivos já vistos quem pula é o estado acima
+        self.diario = Diario.abrir(args.destino, retomar=args.retomar, parametros={"origem": args.origem})
+        self.destino_abs = os.path.abspath(args.destino)
+
+    # ---------- varredura ----------
+    def ciclo(self):
+        agora = time.time()
+        enfileirados = 0
+        for path in percorrer_arquivos(self.args.origem, self.args.filtro, not self.args.nao_recursivo):
+            if os.path.abspath(path).startswith(self.destino_abs + os.sep) or path in self.em_andamento:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if self.estado.conhecido(path, st, self.args.tentativas):
+                continue
+
+            # espera o arquivo parar de crescer
+            anterior = self.estabilizando.get(path)
+            if not anterior or anterior[:2] != (st.st_mtime, st.st_size):
+                self.estabilizando[path] = (st.st_mtime, st.st_size, agora)
+                continue
+            if agora - anterior[2] < self.args.estabilidade or not arquivo_abrivel(path):
+                continue
+
+            # mtime mudou mas o conteúdo é o mesmo: só atualiza o estado
+            hash_conteudo = hash_arquivo(path)
+            repetir = self.estado.tentar_de_novo(path, self.args.tentativas)
+            if hash_conteudo == self.estado.hash_de(path) and not repetir:
+                self.estado.marcar(path, st, hash_conteudo, "sem alteração")
+                del self.estabilizando[path]
+                continue
+
+            if self.args.max_por_ciclo and enfileirados >= self.args.max_por_ciclo:
+                break
+            try:
+                self.fila.put_nowait((path, st, hash_conteudo))
+            except queue.Full:
+                # contrapressão: OCR atrasado, o resto espera o próximo ciclo
+                break
+            del self.estabilizando[path]
+            self.em_andamento.add(path)
+            enfileirados += 1
+
+        # esquece candidatos que sumiram da pasta
+        for path in [p for p in self.estabilizando if not os.path.exists(p)]:
+            del self.estabilizando[path]
+        self.estado.salvar()
+        return enfileirados
+
+    # ---------- processamento ----------
+    def _registros(self, no_lote):
+        """Drena o que estiver na fila agora (lote do ciclo); `no_lote` recebe os caminhos tirados."""
+        while True:
+            try:
+                path, st, hash_conteudo = self.fila.get_nowait()
+            except queue.Empty:
+                return
+            no_lote.add(path)
+            yield novo_registro(path, _stat=st, _hash=hash_conteudo)
+
+    def trabalhador(self):
+        a = self.args
+        while not self.parar.is_set():
+            if self.fila.empty():
+                time.sleep(0.5)
+                continue
+            no_lote = set()
+            try:
+                for rec in processar_lote(self._registros(no_lote), a.destino, a.nome_base, a.palavra_chave,
+                                          a.paginas, a.modelo, backup_dir=a.backup or None,
+                                          workers=max(1, a.workers), workers_conversao=a.workers_conversao or None,
+                                          cancelado=self.parar.is_set,
+                                          campos_extras=a.campos, modelo_nome=a.modelo_nome,
+                                          modo_saida=a.modo_saida, modo_backup=a.modo_backup,
+                                          diario=self.diario, duplicados=self.duplicados):
+                    st, hash_conteudo = rec.pop("_stat"), rec.pop("_hash")
+                    self.estado.marcar(rec["orig_path"], st, hash_conteudo, rec["status"])
+                    no_lote.discard(rec["orig_path"])
+                    self.em_andamento.discard(rec["orig_path"])
+                    self.saida.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    self.saida.flush()
+                    if self.relatorio:
+                        self.relatorio.adicionar(rec)
+            except Exception:
+                # o lote caiu: registra e segue; o que não terminou volta para a varredura
+                print(f"Lote com erro ({len(no_lote)} arquivo(s) voltam para a varredura):", file=sys.stderr)
+                traceback.print_exc()
+            finally:
+                self.em_andamento.difference_update(no_lote)
+            self.estado.salvar()
+
+    def executar(self):
+        """Roda até Ctrl+C; devolve o código de saída (1 se o trabalhador morreu)."""
+        t = threading.Thread(target=self.trabalhador, daemon=True)
+        t.start()
+        print(f"Monitorando {self.args.origem} (Ctrl+C para sair)", file=sys.stderr)
+        codigo = 0
+        try:
+            while not self.parar.is_set():
+                if not t.is_alive():
+                    print("Trabalhador encerrado com erro; saindo.", file=sys.stderr)
+                    codigo = 1
+                    break
+                n = self.ciclo()
+                if n:
+                    print(f"{n} arquivo(s) na fila ({self.fila.qsize()} aguardando)", file=sys.stderr)
+                self.parar.wait(self.args.intervalo)
+        except KeyboardInterrupt:
+            print("Encerrando...", file=sys.stderr)
+        finally:
+            self.parar.set()
+            t.join()
+            self.estado.salvar()
+            if self.saida is not sys.stdout:
+                self.saida.close()
+            if self.relatorio:
+                self.relatorio.fechar()
+            self.diario.fechar()
+        return codigo
+
+
+def main(argv=None):
+    parser = montar_parser()
+    parser.description = "Monitora uma pasta de entrada e processa só os arquivos novos ou alterados."
+    parser.add_argument("--intervalo", type=float, default=10, help="segundos entre varreduras")
+    parser.add_argument("--estabilidade", type=float, default=5,
+                        help="segundos sem mudança de tamanho/mtime antes de processar")
+    parser.add_argument("--fila-max", type=int, default=100,
+                        help="máximo de arquivos aguardando OCR (contrapressão)")
+    parser.add_argument("--max-por-ciclo", type=int, default=0,
+                        help="máximo de arquivos enfileirados por varredura (0 = sem limite)")
+    parser.add_argument("--tentativas", type=int, default=3,
+                        help="vezes que um arquivo com erro é processado (com o mesmo conteúdo)")
+    parser.add_argument("--estado", default="", help="arquivo de estado (padrão: destino/.estado_monitor.json)")
+    args = parser.parse_args(argv)
+    if args.desfazer is not None:
+        return desfazer_execucao(args.destino, args.desfazer)
+    if not preparar(args):
+        return 2
+    return Monitor(args).executar()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,14 +1,30 @@
-
-
-# este codigo funciona apenas com arquivos na mesma pasta que a main #
+# por padrão usa os arquivos da mesma pasta que a main (--pasta para outra, --recursivo para subpastas) #
 # NÃO TEM INTERFACE GRAFICA - TE LIGA!!!
 
-
+import argparse
+import multiprocessing
 import os
-import re
-from pdf2image import convert_from_path
+import sys
+from collections import deque
 import pytesseract
-from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import comum.extracao
+from comum.campos import BuscaCampos, aplicar_modelo_nome, campos_do_modelo, interpretar_campos, rotulo_campo
+from comum.extracao import extrair_valor_pdf, ROTULOS_ORIGEM
+from comum.paralelo import executar_em_ordem, MODO_PROCESSO
+from comum.cache_ocr import obter_cache, configurar_cache
+from comum.diario import Diario, OP_MOVER, desfazer, hash_para_diario, ultimo_diario
+from comum.duplicados import (ACAO_PULAR, ACOES, COLUNAS_DUPLICADOS, LIMIAR_SEMELHANCA, DetectorDuplicados,
+                              assinatura_arquivo, copia_campos)
+from comum.modelos_layout import nomes_modelos
+from comum.nomes import AlocadorNomes, chave_nome
+from comum.processamento import percorrer_arquivos
+from comum.motor_ocr import configurar_motor, MOTOR_AUTO, MOTOR_PYTESSERACT, MOTOR_TESSEROCR
+from comum.preprocessamento import RECEITA_PADRAO, configurar_preprocessamento, interpretar_receita
+from comum.rasterizacao import configurar_rasterizacao, preparar_orcamento, MODO_DISCO, MODO_MEMORIA
+from comum.relatorio import FORMATOS, Relatorio, escrever_relatorio, formato_do_caminho, regerar_relatorio
+from comum.tempos import Tempos, COLUNAS_METRICAS, ResumoTempos, tamanho
 
 os.environ["TESSDATA_PREFIX"] = r"C:\Program Files\Tesseract-OCR\tessdata"
 
@@ -17,76 +33,335 @@ pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tessera
 
 # Caminho do Poppler
 CAMINHO_POPPLER = r"C:\poppler-25.11.0\Library\bin"
+comum.extracao.CAMINHO_POPPLER = CAMINHO_POPPLER
 
-# Pasta com os PDFs
+# Pasta com os PDFs (padrão)
 PASTA = os.path.dirname(os.path.abspath(__file__))
 
-# Regex para localizar o número de série
-PADRAO_SERIE = r"(?:Série|Serie|Serial|Nº de Série|Numero de Serie)[: ]+([A-Za-z0-9\-\.]+)"
+# Campos lidos numa passada só (comum/campos.py): "serie", "serie,patrimonio,data", "lote:Lote Nº"...
+CAMPOS = "serie"
+
+# Modelo do novo nome; o arquivo só é renomeado se todos os campos do modelo forem achados
+MODELO_NOME = "RAT ATESTE 7876 - CIAUS - ALMOXARIFADO PORTO ALEGRE SERIE - {serie}"
+
+# Ordem de leitura das páginas: a série quase sempre está na 1ª (depois 2ª e a última)
+PAGINAS_SERIE = "1-2,-1"
+
+# Modelo de layout (comum/modelos_layout.py) para OCR só na caixa da série; None = página inteira
+MODELO_LAYOUT = None
+
+# Relatório gravado conforme os PDFs terminam (.xlsx, .csv ou .parquet) e o diário
+# bruto ao lado dele, que permite regerar o relatório com outras colunas (--regerar)
+NOME_RELATORIO = "resultado"
+FORMATO_RELATORIO = ".xlsx"
 
 
 # FUNÇÕES
 
-def extrair_serie(pdf_path):
+def extrair_campos(pdf_path, modelo=None, campos=CAMPOS, modelo_nome=MODELO_NOME):
+    """
+    Retorna (valores, origem, tempos) - valores = {campo: valor} lidos numa só
+    passada; origem indica se veio da camada de texto, da região do modelo ou
+    do OCR; tempos traz a duração de cada etapa.
+    """
+    tempos = Tempos()
+    campos = interpretar_campos(campos) if isinstance(campos, str) else campos
+    busca = BuscaCampos(campos, campos_do_modelo(modelo_nome))
     try:
-        paginas = convert_from_path(pdf_path, poppler_path=CAMINHO_POPPLER)
-        texto_total = ""
-        for pagina in paginas:
-            texto_total += pytesseract.image_to_string(pagina, lang="por")
-        
-        encontrado = re.search(PADRAO_SERIE, texto_total, re.IGNORECASE)
-        return encontrado.group(1) if encontrado else None
-    
+        resultado = extrair_valor_pdf(pdf_path, busca, poppler_path=CAMINHO_POPPLER,
+                                      dica_paginas=PAGINAS_SERIE, modelo=modelo, tempos=tempos)
+        return resultado["valor"] or busca.parcial, resultado["origem"], tempos
+
     except Exception as e:
         print(f"Erro ao processar {pdf_path}: {e}")
-        return None
+        return busca.parcial, None, tempos
+
+
+def extrair_serie(pdf_path, modelo=None):
+    """Retorna (serie, origem, tempos)."""
+    valores, origem, tempos = extrair_campos(pdf_path, modelo, "serie", "{serie}")
+    return valores.get("serie"), origem, tempos
+
 
+def renomear_pdfs(workers=1, modelo=MODELO_LAYOUT, pasta=PASTA, recursivo=False, colunas_extras=(),
+                  campos=CAMPOS, modelo_nome=MODELO_NOME, formato=FORMATO_RELATORIO, retomar=False,
+                  duplicados=None, ao_iniciar=None, ao_concluir=None):
+    """
+    Renomeia os PDFs pelos campos lidos. Cada renomeação vai para o diário da
+    execução (pasta/.diario): `retomar` pula o que uma execução interrompida
+    já fez e desfazer_execucao() volta os nomes.
+    `duplicados` (comum/duplicados.DetectorDuplicados): cópias de um PDF já
+    lido não passam pelo OCR; usam os campos dele (ou ficam com o nome, se "pular").
+    ao_iniciar(caminho) quando o PDF entra no processamento; ao_concluir(caminho, registro)
+    depois de renomeado e registrado (o benchmark mede a latência de cada arquivo entre os dois).
+    """
+    campos = interpretar_campos(campos) if isinstance(campos, str) else campos
+    necessarios = [c for c in campos_do_modelo(modelo_nome) if c in campos]
+    caminho_relatorio = os.path.join(pasta, NOME_RELATORIO + formato)
+    caminho_bruto = os.path.join(pasta, NOME_RELATORIO + ".jsonl")
+    resumo = ResumoTempos()
 
-def renomear_pdfs():
-    resultados = []  # Guardará (arquivo_original, serie)
+    if recursivo:
+        caminhos = percorrer_arquivos(pasta, ".pdf")
+    else:
+        caminhos = (os.path.join(pasta, a) for a in sorted(os.listdir(pasta)) if a.lower().endswith(".pdf"))
+    diario = Diario.abrir(pasta, retomar=retomar, parametros={"campos": list(campos), "modelo_nome": modelo_nome})
+    if retomar and not diario.retomado:
+        print("Nenhuma execução interrompida nesta pasta; começando uma nova.")
+    lidos = deque()  # (caminho, dados de duplicado, ação) na ordem de entrada
+    alocadores = {}  # pasta -> AlocadorNomes (com --recursivo, uma por subpasta)
+    pulados = deque()  # já feitos numa execução anterior: só entram no relatório
 
-    for arquivo in os.listdir(PASTA):
-        if arquivo.lower().endswith(".pdf"):
-            caminho = os.path.join(PASTA, arquivo)
-            print(f"Lendo: {arquivo}")
+    def a_fazer():
+        for caminho in caminhos:
+            feito = diario.ja_concluido(caminho)
+            if feito is not None:
+                print(f"Já feito na execução anterior: {os.path.relpath(caminho, pasta)}")
+                pulados.append(feito)
+                continue
+            yield caminho
 
-            serie = extrair_serie(caminho)
+    def assinados():
+        """(caminho, assinatura): hash + dHash (pdf2image) nos processos, como em processar_lote."""
+        if duplicados is None:
+            for caminho in a_fazer():
+                yield caminho, None
+            return
+        enviados = deque()
 
-            # Armazena resultado para exportação
-            resultados.append((arquivo, serie))
+        def entrada():
+            for caminho in a_fazer():
+                enviados.append(caminho)
+                yield (caminho, ".pdf", duplicados.visual)
 
-            if serie:
-                novo_nome = f"RAT ATESTE 7876 - CIAUS - ALMOXARIFADO PORTO ALEGRE SERIE - {serie}.pdf"
-                novo_caminho = os.path.join(PASTA, novo_nome)
+        assinaturas = executar_em_ordem(assinatura_arquivo, entrada(), workers, MODO_PROCESSO)
+        try:
+            for assinatura in assinaturas:
+                yield enviados.popleft(), assinatura
+        finally:
+            assinaturas.close()
 
-                if not os.path.exists(novo_caminho):
-                    os.rename(caminho, novo_caminho)
-                    print(f"Renomeado para: {novo_nome}")
-                else:
-                    print(f"⚠ Arquivo {novo_nome} já existe.")
+    def tarefas():
+        for caminho, assinatura in assinados():
+            print(f"Lendo: {os.path.relpath(caminho, pasta)}")  # antes do OCR, que pode demorar
+            if ao_iniciar:
+                ao_iniciar(caminho)
+            dup = {"orig_path": caminho, "tipo": ".pdf"}
+            acao = duplicados.classificar(dup, assinatura) if duplicados is not None else None
+            lidos.append((caminho, dup, acao))
+            if not copia_campos(acao):  # cópias exatas não vão para o OCR: saem logo depois do representante
+                yield (caminho, modelo, campos, modelo_nome)
+
+    def renomear(caminho, valores, origem, tempos, dup, acao=None):
+        arquivo = os.path.relpath(caminho, pasta)
+        bytes_arquivo = tamanho(caminho)
+
+        hash_origem = dup.get("_hash") or hash_para_diario(caminho)
+        operacoes = []
+        faltando = [c for c in necessarios if not valores.get(c)]
+        if acao:
+            print(f"↪ {duplicados.mensagem(dup, acao)}")
+        if acao == ACAO_PULAR:
+            pass  # fica com o nome que tem
+        elif not faltando:
+            novo_nome = aplicar_modelo_nome(modelo_nome, valores) + ".pdf"
+            pasta_pdf = os.path.dirname(caminho)
+            if chave_nome(novo_nome) == chave_nome(os.path.basename(caminho)):
+                print(f"Já tem o nome: {novo_nome}")
             else:
-                print("❌ Número de série não encontrado.")
+                # nome livre reservado no disco (comum/nomes.py): nada existente é sobrescrito
+                alocador = alocadores.setdefault(pasta_pdf, AlocadorNomes(pasta_pdf, diario))
+                with tempos.medir("renomear"):
+                    novo_caminho = alocador.alocar(novo_nome)
+                    try:
+                        os.replace(caminho, novo_caminho)
+                    except OSError:
+                        alocador.liberar(novo_caminho)
+                        raise
+                operacoes.append((OP_MOVER, caminho, novo_caminho))
+                print(f"Renomeado para: {os.path.basename(novo_caminho)}")
+        else:
+            print(f"❌ Não encontrado: {', '.join(rotulo_campo(c) for c in faltando)}.")
+
+        rec = {"antigo": arquivo, "origem": origem, "bytes_entrada": bytes_arquivo, "bytes_saida": bytes_arquivo}
+        for nome in campos:
+            rec[f"campo_{nome}"] = valores.get(nome)
+        for chave, _ in COLUNAS_DUPLICADOS:
+            if dup.get(chave):
+                rec[chave] = dup[chave]
+        if acao:
+            rec["mensagem"] = duplicados.mensagem(dup, acao)
+        tempos.registrar(rec)
+        diario.concluido(caminho, operacoes, rec, hash_origem, campos=valores)
+        relatorio.adicionar(rec)
+        resumo.adicionar(rec)
+        if ao_concluir:
+            ao_concluir(caminho, rec)
+
+    def copias():
+        # cópias enfileiradas logo atrás do representante que acabou de sair
+        while lidos and copia_campos(lidos[0][2]):
+            caminho, dup, acao = lidos.popleft()
+            valores, origem = duplicados.resultado(dup["dup_grupo"])
+            renomear(caminho, {} if acao == ACAO_PULAR else valores, origem, Tempos(), dup, acao)
+
+    # OCR em paralelo (processos); renomeação aqui, em ordem, sem disputa entre workers;
+    # cada PDF vira uma linha do relatório assim que termina
+    inicializador, initargs = preparar_orcamento()
+    colunas = colunas_relatorio(list(campos), colunas_extras, duplicados is not None)
+    with diario, Relatorio(caminho_relatorio, colunas, caminho_bruto,
+                           formatar=formatar_linha, titulo="Séries Encontradas", anexar_bruto=False) as relatorio:
+        for valores, origem, tempos in executar_em_ordem(extrair_campos, tarefas(), workers, MODO_PROCESSO,
+                                                       inicializador=inicializador, initargs=initargs):
+            while pulados:
+                relatorio.adicionar(pulados.popleft())
+            caminho, dup, acao = lidos.popleft()
+            if duplicados is not None:
+                duplicados.guardar_resultado(dup, valores, origem)
+            renomear(caminho, valores, origem, tempos, dup, acao)
+            copias()
+        copias()
+        while pulados:
+            relatorio.adicionar(pulados.popleft())
+
+    print(f"\n📄 Relatório criado: {caminho_relatorio}")
 
-    exportar_excel(resultados)
+    texto = resumo.texto()
+    if texto:
+        print("\n" + texto)
 
+    cache = obter_cache()
+    if cache is not None:
+        est = cache.estatisticas()
+        print(f"Cache OCR: {est['acertos']} acertos, {est['falhas']} falhas, {est['entradas']} páginas guardadas")
+    if duplicados is not None:
+        est = duplicados.estatisticas()
+        print(f"Duplicados: {est['copias']} cópia(s) em {est['grupos']} grupo(s), sem OCR")
 
-def exportar_excel(dados):
-    """Cria um Excel com o nome original do PDF e a série encontrada."""
-    caminho_excel = os.path.join(PASTA, "resultado.xlsx")
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Séries Encontradas"
+def desfazer_execucao(pasta=PASTA, caminho_diario=""):
+    """Volta os nomes da última execução (ou do diário indicado), do último para o primeiro."""
+    caminho_diario = caminho_diario or ultimo_diario(pasta)
+    if not caminho_diario:
+        print(f"Nenhuma execução registrada em {pasta}")
+        return
+    def mostrar(evento, erro):
+        if erro:
+            print(f"❌ {os.path.basename(evento.get('origem', ''))}: {erro}")
+    desfeitos, falhas = desfazer(caminho_diario, mostrar)
+    print(f"↩ Execução desfeita: {desfeitos} arquivo(s), {falhas} falha(s).")
 
-    ws.append(["Arquivo Original", "Série Encontrada"])
 
-    for arquivo, serie in dados:
-        ws.append([arquivo, serie if serie else "NÃO ENCONTRADO"])
+def colunas_relatorio(campos=("serie",), colunas_extras=(), duplicados=False):
+    """
+    Nome original do PDF, uma coluna por campo, a origem do valor e o nível da
+    escada de OCR (vazio se veio da camada de texto).
+    colunas_extras: chaves de COLUNAS_METRICAS (tempos por etapa, páginas, bytes).
+    duplicados: grupo, representante e tipo de cada cópia, mais a mensagem.
+    """
+    extras = [(chave, rotulo) for chave, rotulo in COLUNAS_METRICAS if chave in colunas_extras]
+    if duplicados:
+        extras += COLUNAS_DUPLICADOS + [("mensagem", "Mensagem")]
+    return ([("antigo", "Arquivo Original")] + [(f"campo_{c}", rotulo_campo(c)) for c in campos]
+            + [("origem", "Origem"), ("nivel_ocr", "Nível OCR"), ("confianca_ocr", "Confiança OCR (%)")] + extras)
 
-    wb.save(caminho_excel)
+
+def formatar_linha(rec):
+    linha = dict(rec)
+    for chave in rec:
+        if chave.startswith("campo_"):
+            linha[chave] = rec[chave] or "NÃO ENCONTRADO"
+    linha["origem"] = ROTULOS_ORIGEM.get(rec.get("origem"), "")
+    return linha
+
+
+def exportar_excel(dados, pasta=PASTA, colunas_extras=(), campos=("serie",)):
+    """Relatório de uma vez a partir de registros já prontos (lista ou gerador)."""
+    caminho_excel = os.path.join(pasta, NOME_RELATORIO + ".xlsx")
+    escrever_relatorio(dados, caminho_excel, colunas_relatorio(campos, colunas_extras),
+                       formatar=formatar_linha, titulo="Séries Encontradas")
     print(f"\n📄 Excel criado: {caminho_excel}")
 
 
 # EXECUÇÃO
 if __name__ == "__main__":
-    renomear_pdfs()
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Renomeia os PDFs da pasta pelo número de série.")
+    parser.add_argument("--pasta", default=PASTA,
+                        help="pasta com os PDFs (padrão: a pasta deste script)")
+    parser.add_argument("--recursivo", action="store_true",
+                        help="inclui os PDFs das subpastas")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processos de OCR em paralelo (padrão: 1)")
+    parser.add_argument("--modelo", choices=nomes_modelos(), default=MODELO_LAYOUT,
+                        help="modelo de layout: OCR só nas regiões, página inteira se não achar")
+    parser.add_argument("--campos", default=CAMPOS,
+                        help="campos lidos na mesma passada, separados por vírgula (ex.: serie,patrimonio,data)")
+    parser.add_argument("--modelo-nome", default=MODELO_NOME,
+                        help="modelo do novo nome com os campos entre chaves (ex.: {serie}_{patrimonio})")
+    parser.add_argument("--colunas", default="",
+                        help="colunas extras no Excel, separadas por vírgula, ou 'todas' "
+                             f"({', '.join(chave for chave, _ in COLUNAS_METRICAS)})")
+    parser.add_argument("--sem-cache", action="store_true",
+                        help="não usa o cache de OCR")
+    parser.add_argument("--limpar-cache", action="store_true",
+                        help="esvazia o cache de OCR antes de começar")
+    parser.add_argument("--memoria-mb", type=int, default=0,
+                        help="memória máxima para páginas rasterizadas, somando os workers (0 = sem limite)")
+    parser.add_argument("--max-paginas", type=int, default=0,
+                        help="páginas rasterizadas ao mesmo tempo, somando os workers (0 = sem limite)")
+    parser.add_argument("--raster-disco", action="store_true",
+                        help="rasteriza em arquivo temporário e o Tesseract lê do disco")
+    parser.add_argument("--motor-ocr", choices=[MOTOR_AUTO, MOTOR_TESSEROCR, MOTOR_PYTESSERACT], default=MOTOR_AUTO,
+                        help="tesserocr mantém o Tesseract carregado; pytesseract abre um processo por página")
+    parser.add_argument("--preprocessamento", default=RECEITA_PADRAO,
+                        help="etapas antes do OCR, na ordem: cinza, recortar, reduzir, endireitar, "
+                             "binarizar (\"nenhum\" desliga; os níveis 2 e 3 da escada usam receitas próprias)")
+    parser.add_argument("--duplicados", choices=ACOES, default=None,
+                        help="PDFs iguais a um já lido não passam pelo OCR: pular (não renomeia), copiar "
+                             "(campos do primeiro) ou revisar; semelhantes (reescaneados) são lidos e marcados")
+    parser.add_argument("--limiar-semelhanca", type=int, default=LIMIAR_SEMELHANCA,
+                        help="bits diferentes (de 256) para considerar um reescaneado semelhante (0 = só cópias exatas)")
+    parser.add_argument("--formato", choices=[f.lstrip(".") for f in FORMATOS if f != ".jsonl"],
+                        default=FORMATO_RELATORIO.lstrip("."),
+                        help="formato do relatório (parquet precisa do pyarrow)")
+    parser.add_argument("--retomar", action="store_true",
+                        help="continua a última execução interrompida, pulando os PDFs já feitos")
+    parser.add_argument("--desfazer", nargs="?", const="", metavar="DIARIO",
+                        help="não processa: volta os nomes da última execução (ou do diário indicado)")
+    parser.add_argument("--regerar", metavar="DIARIO_JSONL",
+                        help="não processa nada: regera o relatório a partir do diário bruto "
+                             "(resultado.jsonl) com --campos, --colunas e --formato")
+    args = parser.parse_args()
+
+    if args.colunas.strip().lower() == "todas":
+        colunas = [chave for chave, _ in COLUNAS_METRICAS]
+    else:
+        colunas = [c.strip() for c in args.colunas.split(",") if c.strip()]
+    formato = "." + args.formato
+    if args.desfazer is not None:
+        desfazer_execucao(args.pasta, args.desfazer)
+        sys.exit(0)
+    if args.regerar:
+        destino = os.path.splitext(args.regerar)[0] + formato
+        formato_do_caminho(destino)
+        regerar_relatorio(args.regerar, destino, colunas_relatorio(list(interpretar_campos(args.campos)), colunas),
+                          formatar=formatar_linha, titulo="Séries Encontradas")
+        print(f"📄 Relatório criado: {destino}")
+        sys.exit(0)
+
+    try:
+        interpretar_receita(args.preprocessamento)
+    except ValueError as e:
+        parser.error(str(e))
+    configurar_cache(ativo=not args.sem_cache)
+    configurar_motor(args.motor_ocr)
+    configurar_preprocessamento(args.preprocessamento)
+    configurar_rasterizacao(args.memoria_mb, args.max_paginas, MODO_DISCO if args.raster_disco else MODO_MEMORIA)
+    if args.limpar_cache and obter_cache() is not None:
+        obter_cache().limpar()
+    renomear_pdfs(workers=args.workers, modelo=args.modelo, pasta=args.pasta, recursivo=args.recursivo,
+                  colunas_extras=colunas, campos=args.campos, modelo_nome=args.modelo_nome, formato=formato,
+                  retomar=args.retomar,
+                  duplicados=DetectorDuplicados(args.duplicados, max(0, args.limiar_semelhanca))
+                  if args.duplicados else None)
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Serviço HTTP local de extração e conversão (Flask), para outros sistemas.
+- Entrada: upload (multipart, campo "arquivo") ou caminho no servidor
+  ("caminho", só dentro das pastas de --raiz)
+- Pool de processos aquecido antes de aceitar pedidos: todos os processos
+  sobem na partida, já com o motor de OCR carregado (comum/motor_ocr.py),
+  e nenhum fork acontece com as threads do servidor rodando (salvo se um
+  processo morrer e o pool for refeito)
+- Fila limitada: com --workers + --fila-max trabalhos em andamento, o
+  pedido novo volta 429 (Retry-After) em vez de acumular
+- POST /extrair espera o resultado (síncrono); POST /trabalhos devolve o id
+  na hora (202) e GET /trabalhos/<id> consulta; GET /trabalhos/<id>/pdf baixa
+- Prazo por pedido (timeout, até --timeout-max): o que ainda está na fila
+  quando o prazo vence é cancelado ("expirado"); o que já começou termina
+  (o pool já entrega aos processos um trabalho além dos que estão rodando,
+  e esse também não dá mais para cancelar)
+- GET /metricas: histogramas de latência (espera na fila, execução, total e
+  etapas de comum/tempos.py) e contadores; GET /saude
+
+Exemplo:
+    python servico_http/main.py --workers 4 --raiz \\\\servidor\\scans --porta 8080
+    curl -F arquivo=@rat.pdf -F palavra_chave=Série -F nome_base=RAT http://localhost:8080/extrair
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as PrazoEsgotado
+from concurrent.futures.process import BrokenProcessPool
+
+import pytesseract
+from flask import Flask, jsonify, request, send_file
+from werkzeug.utils import secure_filename
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import comum.extracao
+from comum.cache_ocr import configurar_cache, obter_cache, versao_tesseract
+from comum.campos import CAMPO_CHAVE, MODELO_NOME_PADRAO, campos_busca, campos_do_modelo
+from comum.extracao import LINGUA_OCR, ROTULOS_ORIGEM
+from comum.modelos_layout import nomes_modelos
+from comum.motor_ocr import configurar_motor, obter_motor, MOTOR_AUTO, MOTOR_PYTESSERACT, MOTOR_TESSEROCR
+from comum.preprocessamento import RECEITA_PADRAO, configurar_preprocessamento, interpretar_receita
+from comum.processamento import extrair_campos_arquivo, finalizar_registro, montar_nome, novo_registro
+from comum.rasterizacao import configurar_rasterizacao, instalar_orcamento, preparar_orcamento, MODO_MEMORIA
+from comum.tempos import ETAPAS
+from lote.main import CAMINHO_POPPLER, TESSERACT_CMD
+
+# ========== CONFIG ==========
+PORTA = 8080
+TIMEOUT_PADRAO = 120  # s por pedido, se o pedido não disser
+TIMEOUT_MAX = 900
+RETER = 600  # s que um trabalho terminado (e o PDF) fica disponível para consulta
+MAX_UPLOAD_MB = 100
+# ===========================
+
+NA_FILA = "na_fila"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+EXPIRADO = "expirado"
+
+LIMITES_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+
+# -------- processos do pool ----------
+def aquecer_processo(orcamento):
+    """Inicializador do pool: orçamento de páginas e o motor de OCR já carregado."""
+    instalar_orcamento(orcamento)
+    try:
+        from PIL import Image
+        with Image.new("L", (64, 32), 255) as branca:
+            obter_motor().texto(branca, LINGUA_OCR)  # tesserocr: carrega o traineddata agora
+        versao_tesseract()
+        obter_cache()
+    except Exception as e:
+        print(f"Aquecimento do OCR falhou ({e}); o primeiro pedido carrega o motor.", file=sys.stderr)
+
+
+def pronto():
+    time.sleep(0.05)  # segura o processo: os outros pegam os próximos
+    return os.getpid()
+
+
+def executar_trabalho(caminho, campos, obrigatorios, dica_paginas, modelo, nome_base, modelo_nome, pasta_saida):
+    """No processo do pool: extrai e, com `pasta_saida`, converte. Devolve o registro (comum/processamento.py)."""
+    inicio = time.time()
+    rec = novo_registro(caminho)
+    valores, origem, tempos, conteudo = extrair_campos_arquivo(caminho, rec["tipo"], campos, obrigatorios,
+                                                               dica_paginas, modelo, converter=bool(pasta_saida))
+    if pasta_saida:
+        finalizar_registro(rec, os.path.join(pasta_saida, montar_nome(nome_base, valores, modelo_nome)),
+                           valores, origem, tempos=tempos, conteudo=conteudo)
+    else:
+        rec.update(status="Concluído", keyword=valores.get(CAMPO_CHAVE) or "",
+                   origem=ROTULOS_ORIGEM.get(origem, ""))
+        for nome, valor in valores.items():
+            rec[f"campo_{nome}"] = valor
+        tempos.registrar(rec)
+    rec["_inicio"] = inicio
+    return rec
+
+
+# -------- métricas ----------
+class Histograma:
+    """Contagem por faixa de latência (ms), soma e percentis aproximados pelas faixas."""
+
+    def __init__(self, limites=LIMITES_MS):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.n = 0
+        self.soma = 0.0
+
+    def observar(self, segundos):
+        ms = segundos * 1000
+        i = next((i for i, limite in enumerate(self.limites) if ms <= limite), len(self.limites))
+        self.contagens[i] += 1
+        self.n += 1
+        self.soma += ms
+
+    def percentil(self, p):
+        """Limite superior da faixa onde cai o percentil p (None acima da última)."""
+        if not self.n:
+            return None
+        alvo, acumulado = p / 100 * self.n, 0
+        for i, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return self.limites[i] if i < len(self.limites) else None
+        return None
+
+    def resumo(self):
+        faixas = {f"<={limite}": c for limite, c in zip(self.limites, self.contagens)}
+        faixas[f">{self.limites[-1]}"] = self.contagens[-1]
+        return {"n": self.n, "media_ms": round(self.soma / self.n, 1) if self.n else None,
+                "p50_ms": self.percentil(50), "p95_ms": self.percentil(95), "p99_ms": self.percentil(99),
+                "faixas": faixas}
+
+
+class Metricas:
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.histogramas = {}
+        self.contadores = {"aceitos": 0, "recusados": 0, "concluidos": 0, "erros": 0, "expirados": 0}
+
+    def contar(self, nome):
+        with self.trava:
+            self.contadores[nome] += 1
+
+    def observar(self, nome, segundos):
+        with self.trava:
+            self.histogramas.setdefault(nome, Histograma()).observar(segundos)
+
+    def resumo(self):
+        with self.trava:
+            return {"contadores": dict(self.contadores),
+                    "latencia": {nome: h.resumo() for nome, h in sorted(self.histogramas.items())}}
+
+
+# -------- serviço ----------
+class Servico:
+    """Pool aquecido, fila limitada e os trabalhos em memória (id -> dict)."""
+
+    def __init__(self, workers=1, fila_max=8, pasta_trabalho=None, raizes=(), timeout_padrao=TIMEOUT_PADRAO,
+                 timeout_max=TIMEOUT_MAX, reter=RETER):
+        self.workers = max(1, workers)
+        self.capacidade = self.workers + max(0, fila_max)
+        self.temporaria = not pasta_trabalho
+        self.pasta = pasta_trabalho or tempfile.mkdtemp(prefix="servico_pdf_")
+        os.makedirs(self.pasta, exist_ok=True)
+        self.raizes = [os.path.realpath(r) for r in raizes]
+        self.timeout_padrao = timeout_padrao
+        self.timeout_max = timeout_max
+        self.reter = reter
+        self.metricas = Metricas()
+        self.trava = threading.Lock()
+        self.trava_pool = threading.Lock()  # um pool novo por vez, fora de self.trava
+        self.trabalhos = {}
+        self.ativos = 0
+        self.pool = None
+        self._parar = threading.Event()
+        self._vigia = threading.Thread(target=self._vigiar, name="servico-vigia", daemon=True)
+
+    def iniciar(self):
+        """Sobe e aquece todos os processos antes de aceitar pedidos."""
+        self.pool = self._criar_pool()
+        self._vigia.start()
+
+    def _criar_pool(self):
+        _, initargs = preparar_orcamento()
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=aquecer_processo, initargs=initargs)
+        # o inicializador roda antes da primeira tarefa: ver a resposta de cada
+        # processo = todos de pé e aquecidos
+        vistos = set()
+        for _ in range(20):
+            vistos.update(f.result() for f in [pool.submit(pronto) for _ in range(self.workers)])
+            if len(vistos) >= self.workers:
+                break
+        return pool
+
+    def fechar(self):
+        self._parar.set()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.temporaria:
+            shutil.rmtree(self.pasta, ignore_errors=True)
+
+    # ---------- entrada ----------
+    def caminho_permitido(self, caminho):
+        real = os.path.realpath(caminho)
+        return any(real == r or real.startswith(r + os.sep) for r in self.raizes)
+
+    def prazo(self, valor):
+        try:
+            segundos = float(valor) if valor not in (None, "") else self.timeout_padrao
+        except ValueError:
+            raise ValueError(f"timeout inválido: {valor!r}")
+        return min(max(segundos, 0.1), self.timeout_max)
+
+    def enviar(self, caminho, parametros, timeout, pasta_trabalho, converter=True):
+        """Cria o trabalho ou devolve None se a fila está cheia (429)."""
+        with self.trava:
+            if self.ativos >= self.capacidade:
+                self.metricas.contar("recusados")
+                return None
+            self.ativos += 1
+        try:
+            pasta_saida = os.path.join(pasta_trabalho, "saida") if converter else None
+            if pasta_saida:
+                os.makedirs(pasta_saida, exist_ok=True)
+            trabalho = {"id": os.path.basename(pasta_trabalho), "estado": NA_FILA, "criado": time.time(),
+                        "prazo": time.time() + timeout, "pasta": pasta_trabalho, "registro": None, "mensagem": "",
+                        "pronto": threading.Event()}
+            tarefa = (caminho, parametros["campos"], campos_do_modelo(parametros["modelo_nome"]),
+                      parametros["paginas"], parametros["modelo"], parametros["nome_base"],
+                      parametros["modelo_nome"], pasta_saida)
+            pool = self.pool
+            try:
+                trabalho["futuro"] = pool.submit(executar_trabalho, *tarefa)
+            except BrokenProcessPool:
+                self._refazer_pool(pool)
+                pool = self.pool
+                trabalho["futuro"] = pool.submit(executar_trabalho, *tarefa)
+        except BaseException:
+            with self.trava:
+                self.ativos -= 1  # a vaga não foi usada
+            raise
+        trabalho["pool"] = pool
+        with self.trava:
+            self.trabalhos[trabalho["id"]] = trabalho
+        self.metricas.contar("aceitos")
+        trabalho["futuro"].add_done_callback(lambda fut, t=trabalho: self._terminou(t, fut))
+        return trabalho
+
+    def novo_id(self):
+        id_ = uuid.uuid4().hex
+        pasta = os.path.join(self.pasta, id_)
+        os.makedirs(pasta)
+        return id_, pasta
+
+    def _refazer_pool(self, quebrado):
+        """
+        Um processo morreu (falta de memória, crash do Tesseract): pool novo, aquecido.
+        Todos os trabalhos do pool quebrado chamam aqui; só o primeiro refaz, os
+        outros veem que self.pool já não é `quebrado`. O aquecimento roda fora de
+        self.trava, então enviar/_terminou não esperam por ele.
+        """
+        with self.trava_pool:
+            if self.pool is not quebrado or self._parar.is_set():
+                return
+            novo = self._criar_pool()
+            with self.trava:
+                self.pool = novo
+        quebrado.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- saída ----------
+    def _terminou(self, trabalho, fut):
+        try:
+            self._registrar_fim(trabalho, fut)
+        finally:
+            trabalho["pronto"].set()  # só agora o estado final está no trabalho
+
+    def _registrar_fim(self, trabalho, fut):
+        agora = time.time()
+        with self.trava:
+            self.ativos -= 1
+        if fut.cancelled():
+            trabalho.update(estado=EXPIRADO, mensagem="Prazo esgotado na fila", terminado=agora)
+            self.metricas.contar("expirados")
+            return
+        try:
+            rec = fut.result()
+        except Exception as e:
+            trabalho.update(estado=ERRO, mensagem=f"{type(e).__name__}: {e}", terminado=agora)
+            self.metricas.contar("erros")
+            if isinstance(e, BrokenProcessPool) and trabalho["pool"] is self.pool:
+                threading.Thread(target=self._refazer_pool, args=(trabalho["pool"],), daemon=True).start()
+            return
+        inicio = rec.pop("_inicio", trabalho["criado"])
+        self.metricas.observar("espera", max(0.0, inicio - trabalho["criado"]))
+        self.metricas.observar("execucao", agora - inicio)
+        self.metricas.observar("total", agora - trabalho["criado"])
+        for chave, _ in ETAPAS:
+            if rec.get(chave):
+                self.metricas.observar(chave, rec[chave])
+        estado = CONCLUIDO if rec["status"] == "Concluído" else ERRO
+        self.metricas.contar("concluidos" if estado == CONCLUIDO else "erros")
+        trabalho.update(estado=estado, registro=rec, mensagem=rec.get("mensagem", ""), terminado=agora)
+
+    def obter(self, id_):
+        with self.trava:
+            trabalho = self.trabalhos.get(id_)
+        if trabalho and trabalho["estado"] == NA_FILA and trabalho["futuro"].running():
+            trabalho["estado"] = EXECUTANDO
+        return trabalho
+
+    def esperar(self, trabalho):
+        """
+        Espera até o prazo; o que ainda está na fila no fim do prazo é cancelado.
+        O result() do futuro acorda antes dos callbacks: com o futuro pronto,
+        espera também o _terminou gravar o estado final.
+        """
+        futuro = trabalho["futuro"]
+        try:
+            futuro.result(timeout=max(0.0, trabalho["prazo"] - time.time()))
+        except (PrazoEsgotado, CancelledError):
+            futuro.cancel()
+        except Exception:
+            pass
+        if futuro.done():
+            trabalho["pronto"].wait()
+        return self.obter(trabalho["id"])
+
+    def _vigiar(self):
+        while not self._parar.wait(1.0):
+            agora = time.time()
+            with self.trava:
+                trabalhos = list(self.trabalhos.values())
+            for t in trabalhos:
+                if t["estado"] == NA_FILA and agora > t["prazo"]:
+                    t["futuro"].cancel()  # só cancela se ainda não começou
+                elif t.get("terminado") and agora - t["terminado"] > self.reter:
+                    with self.trava:
+                        self.trabalhos.pop(t["id"], None)
+                    shutil.rmtree(t["pasta"], ignore_errors=True)
+
+    def estado_fila(self):
+        with self.trava:
+            return {"ativos": self.ativos, "capacidade": self.capacidade, "workers": self.workers}
+
+
+def ler_parametros(dados):
+    """Parâmetros do pedido (form ou JSON); ValueError se algum for inválido."""
+    palavra_chave = dados.get("palavra_chave", "")
+    campos = campos_busca(palavra_chave, dados.get("campos", ""))
+    modelo_nome = dados.get("modelo_nome") or MODELO_NOME_PADRAO
+    desconhecidos = [c for c in campos_do_modelo(modelo_nome) if c != "nome_base" and c not in campos]
+    if desconhecidos:
+        raise ValueError(f"Campos do modelo de nome sem definição: {', '.join(desconhecidos)}")
+    modelo = dados.get("modelo") or None
+    if modelo and modelo not in nomes_modelos():
+        raise ValueError(f"Modelo de layout desconhecido: {modelo}")
+    return {"campos": campos, "modelo_nome": modelo_nome, "modelo": modelo,
+            "nome_base": dados.get("nome_base") or "documento", "paginas": dados.get("paginas", "")}
+
+
+def resposta_trabalho(trabalho):
+    rec = trabalho["registro"] or {}
+    corpo = {"id": trabalho["id"], "estado": trabalho["estado"], "mensagem": trabalho["mensagem"]}
+    if rec:
+        corpo.update(valores={k[len("campo_"):]: v for k, v in rec.items() if k.startswith("campo_")},
+                     origem=rec.get("origem"), nome=rec.get("novo") or None,
+                     tempos={k: v for k, v in rec.items() if k.startswith("t_")})
+        if rec.get("dest_path"):
+            corpo["pdf"] = f"/trabalhos/{trabalho['id']}/pdf"
+    if trabalho.get("terminado"):
+        corpo["latencia_ms"] = round((trabalho["terminado"] - trabalho["criado"]) * 1000, 1)
+    return corpo
+
+
+# -------- HTTP ----------
+def criar_app(servico):
+    app = Flask(__name__)
+    app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
+
+    def receber():
+        """(trabalho, None) ou (None, resposta de erro)."""
+        dados = request.form if request.form or request.files else (request.get_json(silent=True) or {})
+        try:
+            parametros = ler_parametros(dados)
+            timeout = servico.prazo(dados.get("timeout"))
+        except ValueError as e:
+            return None, (jsonify(erro=str(e)), 400)
+        converter = str(dados.get("converter", "1")).lower() not in ("0", "nao", "não", "false")
+        id_, pasta = servico.novo_id()
+        enviado = request.files.get("arquivo")
+        if enviado is not None:
+            nome = secure_filename(enviado.filename or "") or "arquivo"
+            os.makedirs(os.path.join(pasta, "entrada"))
+            caminho = os.path.join(pasta, "entrada", nome)
+            enviado.save(caminho)
+        elif dados.get("caminho"):
+            caminho = dados["caminho"]
+            if not servico.caminho_permitido(caminho):
+                shutil.rmtree(pasta, ignore_errors=True)
+                return None, (jsonify(erro="caminho fora das pastas permitidas (--raiz)"), 403)
+            if not os.path.isfile(caminho):
+                shutil.rmtree(pasta, ignore_errors=True)
+                return None, (jsonify(erro=f"arquivo não encontrado: {caminho}"), 404)
+        else:
+            shutil.rmtree(pasta, ignore_errors=True)
+            return None, (jsonify(erro="envie 'arquivo' (upload) ou 'caminho'"), 400)
+        trabalho = servico.enviar(caminho, parametros, timeout, pasta, converter)
+        if trabalho is None:
+            shutil.rmtree(pasta, ignore_errors=True)
+            resposta = jsonify(erro="fila cheia, tente de novo", **servico.estado_fila())
+            return None, (resposta, 429, {"Retry-After": "5"})
+        return trabalho, None
+
+    @app.post("/extrair")
+    def extrair():
+        inicio = time.perf_counter()
+        trabalho, erro = receber()
+        if erro:
+            return erro
+        trabalho = servico.esperar(trabalho)
+        servico.metricas.observar("http_extrair", time.perf_counter() - inicio)
+        if trabalho["estado"] in (NA_FILA, EXECUTANDO):
+            # prazo vencido com o trabalho já rodando: segue e pode ser consultado pelo id
+            return jsonify(resposta_trabalho(trabalho)), 504
+        if trabalho["estado"] == EXPIRADO:
+            return jsonify(resposta_trabalho(trabalho)), 504
+        return jsonify(resposta_trabalho(trabalho)), 200 if trabalho["estado"] == CONCLUIDO else 422
+
+    @app.post("/trabalhos")
+    def criar_trabalho():
+        trabalho, erro = receber()
+        if erro:
+            return erro
+        return jsonify(resposta_trabalho(trabalho)), 202, {"Location": f"/trabalhos/{trabalho['id']}"}
+
+    @app.get("/trabalhos/<id_>")
+    def consultar(id_):
+        trabalho = servico.obter(id_)
+        if trabalho is None:
+            return jsonify(erro="trabalho não encontrado (ou já descartado)"), 404
+        return jsonify(resposta_trabalho(trabalho))
+
+    @app.get("/trabalhos/<id_>/pdf")
+    def baixar(id_):
+        trabalho = servico.obter(id_)
+        rec = (trabalho or {}).get("registro") or {}
+        if not rec.get("dest_path") or not os.path.isfile(rec["dest_path"]):
+            return jsonify(erro="PDF não disponível"), 404
+        return send_file(rec["dest_path"], mimetype="application/pdf", as_attachment=True,
+                         download_name=rec["novo"])
+
+    @app.get("/metricas")
+    def metricas():
+        return jsonify(fila=servico.estado_fila(), **servico.metricas.resumo())
+
+    @app.get("/saude")
+    def saude():
+        return jsonify(ok=True, **servico.estado_fila())
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP de extração e conversão para PDF.")
+    parser.add_argument("--host", default="127.0.0.1", help="endereço de escuta (padrão: só esta máquina)")
+    parser.add_argument("--porta", type=int, default=PORTA)
+    parser.add_argument("--workers", type=int, default=1, help="processos de extração/OCR (aquecidos na partida)")
+    parser.add_argument("--fila-max", type=int, default=8,
+                        help="pedidos aguardando além dos em execução; acima disso, 429")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_PADRAO, help="prazo padrão por pedido (s)")
+    parser.add_argument("--timeout-max", type=float, default=TIMEOUT_MAX, help="prazo máximo aceito num pedido (s)")
+    parser.add_argument("--reter", type=float, default=RETER,
+                        help="segundos que um resultado (e o PDF) fica disponível depois de pronto")
+    parser.add_argument("--raiz", action="append", default=[],
+                        help="pasta cujos arquivos podem ser pedidos por 'caminho' (repetível)")
+    parser.add_argument("--pasta-trabalho", default="", help="uploads e PDFs gerados (padrão: temporária)")
+    parser.add_argument("--tesseract", default=TESSERACT_CMD, help="caminho do executável do Tesseract")
+    parser.add_argument("--poppler", default=CAMINHO_POPPLER, help="pasta bin do Poppler")
+    parser.add_argument("--sem-cache", action="store_true", help="não usa o cache de OCR")
+    parser.add_argument("--memoria-mb", type=int, default=0, help="memória máxima para páginas rasterizadas")
+    parser.add_argument("--motor-ocr", choices=[MOTOR_AUTO, MOTOR_TESSEROCR, MOTOR_PYTESSERACT], default=MOTOR_AUTO)
+    parser.add_argument("--preprocessamento", default=RECEITA_PADRAO, help="etapas antes do OCR (ver lote/main.py)")
+    args = parser.parse_args(argv)
+    try:
+        interpretar_receita(args.preprocessamento)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # pelo ambiente, para valer também nos processos do pool
+    os.environ["TESSERACT_CMD"] = pytesseract.pytesseract.tesseract_cmd = args.tesseract
+    os.environ["CAMINHO_POPPLER"] = comum.extracao.CAMINHO_POPPLER = args.poppler
+    configurar_cache(ativo=not args.sem_cache)
+    configurar_motor(args.motor_ocr)
+    configurar_preprocessamento(args.preprocessamento)
+    configurar_rasterizacao(args.memoria_mb, 0, MODO_MEMORIA)
+
+    servico = Servico(args.workers, args.fila_max, args.pasta_trabalho or None, args.raiz, args.timeout,
+                      args.timeout_max, args.reter)
+    print(f"Aquecendo {servico.workers} processo(s) de OCR...", file=sys.stderr)
+    servico.iniciar()
+    try:
+        criar_app(servico).run(host=args.host, port=args.porta, threaded=True)
+    finally:
+        servico.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,6 @@
+# coding: utf-8
+# as ferramentas importam "comum" a partir da raiz do repositório (sys.path), como os main.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
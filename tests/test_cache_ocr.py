@@ -0,0 +1,83 @@
+# coding: utf-8
+import pytest
+
+import comum.cache_ocr as cache_ocr
+from comum.cache_ocr import CacheOCR
+
+
+class Relogio:
+    """time.time() que só anda quando o teste manda (os acessos do LRU ficam ordenados)."""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def time(self):
+        self.agora += 1
+        return self.agora
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_ocr, "time", Relogio())
+    monkeypatch.setattr(cache_ocr, "_versao_tesseract", "teste")
+    c = CacheOCR(str(tmp_path / "ocr.sqlite3"), tamanho_max=10)
+    yield c
+    c.fechar()
+
+
+def test_chave_muda_com_pagina_dpi_e_config():
+    a = CacheOCR.montar_chave("abc", 1, 300, "por")
+    assert a != CacheOCR.montar_chave("abc", 2, 300, "por")
+    assert a != CacheOCR.montar_chave("abc", 1, 200, "por")
+    assert a != CacheOCR.montar_chave("abc", 1, 300, "por", "--psm 6")
+
+
+def test_obter_gravar_e_contadores(cache):
+    assert cache.obter("x") is None
+    cache.gravar("x", "RAT 1")
+    assert cache.obter("x") == "RAT 1"
+    est = cache.estatisticas()
+    assert (est["acertos"], est["falhas"], est["entradas"], est["bytes"]) == (1, 1, 1, 5)
+
+
+def test_despejo_lru_remove_o_menos_usado(cache):
+    cache.gravar("a", "aaaa")
+    cache.gravar("b", "bbbb")
+    assert cache.obter("a") == "aaaa"  # "a" passa a ser o mais recente
+    cache.gravar("c", "cccc")  # 12 bytes > 10: sai "b"
+    assert cache.obter("b") is None
+    assert cache.obter("a") == "aaaa"
+    assert cache.obter("c") == "cccc"
+    assert cache.estatisticas()["bytes"] == 8
+
+
+def test_contadores_sobrevivem_a_reabertura(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_ocr, "_versao_tesseract", "teste")
+    caminho = str(tmp_path / "ocr.sqlite3")
+    c = CacheOCR(caminho)
+    c.gravar("x", "texto")
+    for _ in range(3):
+        c.obter("x")
+    c.fechar()  # contadores pendentes vão para o banco aqui
+    c = CacheOCR(caminho)
+    assert c.estatisticas()["acertos"] == 3
+    c.limpar()
+    assert c.estatisticas() == {"acertos": 0, "falhas": 0, "entradas": 0, "bytes": 0}
+    c.fechar()
+
+
+def test_ocr_com_cache_so_gera_uma_vez(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_ocr, "_versao_tesseract", "teste")
+    monkeypatch.setattr(cache_ocr, "_cache", None)
+    monkeypatch.setenv("CACHE_OCR_DESATIVADO", "")
+    monkeypatch.setenv("CACHE_OCR_ARQUIVO", str(tmp_path / "ocr.sqlite3"))
+    chamadas = []
+
+    def gerar():
+        chamadas.append(1)
+        return "texto"
+
+    assert cache_ocr.ocr_com_cache("h", 1, 300, "por", gerar) == "texto"
+    assert cache_ocr.ocr_com_cache("h", 1, 300, "por", gerar) == "texto"
+    assert len(chamadas) == 1
+    cache_ocr.obter_cache().fechar()
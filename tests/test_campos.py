@@ -0,0 +1,43 @@
+# coding: utf-8
+import pytest
+
+from comum.campos import (CAMPO_CHAVE, BuscaCampos, aplicar_modelo_nome, campos_busca, campos_do_modelo,
+                          interpretar_campos)
+
+
+def test_campos_busca_chave_e_extras():
+    campos = campos_busca("N° RAT", "serie, lote:Lote Nº")
+    assert list(campos) == [CAMPO_CHAVE, "serie", "lote"]
+    assert campos[CAMPO_CHAVE]["palavra"] == "N° RAT"
+    assert campos["lote"]["palavra"] == "Lote Nº"
+    assert campos_busca("  ", "") == {}
+
+
+def test_campo_desconhecido_ou_invalido():
+    with pytest.raises(ValueError):
+        interpretar_campos("cor")
+    with pytest.raises(ValueError):
+        interpretar_campos("1x:Rótulo")
+
+
+def test_busca_todos_os_campos_numa_passada():
+    busca = BuscaCampos(campos_busca("N° RAT", "serie, patrimonio"))
+    texto = "N° RAT: 12345\nSérie: ABC-9\nPatrimônio 77/1"
+    assert busca(texto) == {CAMPO_CHAVE: "12345", "serie": "ABC-9", "patrimonio": "77/1"}
+
+
+def test_busca_incompleta_guarda_parcial():
+    busca = BuscaCampos(campos_busca("N° RAT", "serie"), obrigatorios=["serie"])
+    assert busca("N° RAT: 1") is None
+    assert busca.parcial == {CAMPO_CHAVE: "1"}
+    assert busca("Serie: X1") == {"serie": "X1"}  # só o obrigatório basta
+
+
+def test_modelo_de_nome():
+    modelo = "{nome_base}_{serie}_{patrimonio}"
+    assert campos_do_modelo(modelo) == ["nome_base", "serie", "patrimonio"]
+    assert aplicar_modelo_nome(modelo, {"nome_base": "RAT", "serie": "ABC123"}) == "RAT_ABC123"
+    assert aplicar_modelo_nome(modelo, {"nome_base": "RAT", "patrimonio": "9"}) == "RAT_9"
+    assert aplicar_modelo_nome(modelo, {"nome_base": "RAT", "serie": "a/b:c"}) == "RAT_a-b-c"
+    # literal que não é só separador fica mesmo sem o valor
+    assert aplicar_modelo_nome("{nome_base} pat {patrimonio}", {"nome_base": "RAT"}) == "RAT pat"
@@ -0,0 +1,125 @@
+# coding: utf-8
+import os
+
+from comum.diario import OP_CRIAR, OP_LIXEIRA, OP_MOVER, Diario, desfazer, ler_diario, ultimo_diario
+
+
+def _arquivo(caminho, conteudo=b"x"):
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+    return str(caminho)
+
+
+def test_retomar_pula_o_que_ja_foi_feito(tmp_path):
+    pasta = str(tmp_path)
+    a = _arquivo(tmp_path / "a.txt")
+    b = _arquivo(tmp_path / "b.txt")
+    saida = _arquivo(tmp_path / "a.pdf", b"%PDF")
+    diario = Diario.abrir(pasta)
+    diario.concluido(a, [(OP_CRIAR, saida)], {"antigo": "a.txt", "status": "Concluído", "_interno": 1})
+    diario.fechar(completo=False)  # execução interrompida
+
+    retomado = Diario.abrir(pasta, retomar=True)
+    assert retomado.retomado
+    assert retomado.caminho == diario.caminho
+    assert retomado.ja_concluido(a) == {"antigo": "a.txt", "status": "Concluído"}
+    assert retomado.ja_concluido(saida) is not None
+    assert retomado.ja_concluido(b) is None
+    retomado.fechar()
+    # terminada: não há o que retomar, a próxima execução abre outro diário
+    assert ultimo_diario(pasta, incompleto=True) is None
+    novo = Diario.abrir(pasta, retomar=True)
+    assert novo.caminho != diario.caminho
+    novo.fechar()
+
+
+def test_arquivo_alterado_depois_nao_conta_como_feito(tmp_path):
+    a = _arquivo(tmp_path / "a.txt")
+    diario = Diario.abrir(str(tmp_path))
+    diario.concluido(a, [], {"antigo": "a.txt"})
+    _arquivo(a, b"conteudo novo")
+    assert diario.ja_concluido(a) is None
+    diario.fechar()
+
+
+def test_linha_cortada_pela_queda_e_ignorada(tmp_path):
+    a = _arquivo(tmp_path / "a.txt")
+    diario = Diario.abrir(str(tmp_path))
+    diario.concluido(a, [], {"antigo": "a.txt"})
+    diario.fechar(completo=False)
+    with open(diario.caminho, "a", encoding="utf-8") as f:
+        f.write('{"evento": "concluido", "seq": 9')
+    retomado = Diario.abrir(str(tmp_path), retomar=True)
+    assert retomado.ja_concluido(a) is not None
+    retomado.fechar()
+    assert [e["evento"] for e in ler_diario(diario.caminho)][-2:] == ["retomada", "fim"]
+
+
+def test_desfazer_de_tras_para_frente(tmp_path):
+    pasta = str(tmp_path)
+    original = _arquivo(tmp_path / "original.pdf", b"original")
+    apagar = _arquivo(tmp_path / "apagar.txt", b"apagar")
+    diario = Diario.abrir(pasta)
+    # 1º: renomeia original.pdf -> meio.pdf
+    meio = str(tmp_path / "meio.pdf")
+    os.replace(original, meio)
+    diario.concluido(original, [(OP_MOVER, original, meio)])
+    # 2º: o mesmo arquivo de novo, meio.pdf -> final.pdf, e apagar.txt vai para a lixeira
+    final = str(tmp_path / "final.pdf")
+    os.replace(meio, final)
+    lixo = diario.mandar_para_lixeira(apagar)
+    diario.concluido(meio, [(OP_MOVER, meio, final), (OP_LIXEIRA, apagar, lixo)])
+    # 3º: cria um PDF novo
+    criado = _arquivo(tmp_path / "novo.pdf", b"%PDF")
+    diario.concluido(criado, [(OP_CRIAR, criado)])
+    diario.fechar()
+
+    vistos = []
+    desfeitos, falhas = desfazer(diario.caminho, ao_desfazer=lambda e, erro: vistos.append(e["origem"]))
+    assert (desfeitos, falhas) == (3, 0)
+    assert vistos == [criado, meio, original]  # do último para o primeiro
+    assert sorted(os.listdir(pasta)) == [".diario", ".lixeira", "apagar.txt", "original.pdf"]
+    assert (tmp_path / "original.pdf").read_bytes() == b"original"
+    assert (tmp_path / "apagar.txt").read_bytes() == b"apagar"
+    # rodar de novo não desfaz duas vezes
+    assert desfazer(diario.caminho) == (0, 0)
+
+
+def test_desfazer_nao_sobrescreve_arquivo_no_lugar(tmp_path):
+    original = _arquivo(tmp_path / "a.pdf", b"original")
+    novo = str(tmp_path / "b.pdf")
+    diario = Diario.abrir(str(tmp_path))
+    os.replace(original, novo)
+    diario.concluido(original, [(OP_MOVER, original, novo)])
+    diario.fechar()
+    _arquivo(original, b"outro")  # alguém criou a.pdf depois
+    assert desfazer(diario.caminho) == (0, 1)
+    assert (tmp_path / "a.pdf").read_bytes() == b"outro"
+    assert (tmp_path / "b.pdf").read_bytes() == b"original"
+
+
+def test_reservas_vazias_apagadas_ao_retomar_e_desfazer(tmp_path):
+    from comum.nomes import AlocadorNomes
+
+    pasta = str(tmp_path)
+    a = _arquivo(tmp_path / "a.txt")
+    diario = Diario.abrir(pasta)
+    alocador = AlocadorNomes(pasta, diario)
+    feito = alocador.alocar("A.pdf")
+    _arquivo(feito, b"%PDF")
+    diario.concluido(a, [(OP_CRIAR, feito)])
+    vazio_feito = alocador.alocar("vazio.pdf")  # saída de um arquivo vazio: concluída, fica
+    diario.concluido(_arquivo(tmp_path / "v.txt", b""), [(OP_CRIAR, vazio_feito)])
+    orfa = alocador.alocar("B.pdf")  # a execução "cai" antes de gravar
+    diario.fechar(completo=False)
+    assert os.path.getsize(orfa) == 0
+
+    Diario.abrir(pasta, retomar=True).fechar(completo=False)
+    assert not os.path.exists(orfa)
+    assert os.path.exists(feito) and os.path.exists(vazio_feito)
+
+    with Diario.abrir(pasta, retomar=True) as outra:
+        orfa = AlocadorNomes(pasta, outra).alocar("C.pdf")
+    desfeitos, falhas = desfazer(diario.caminho)
+    assert (desfeitos, falhas) == (2, 0)
+    assert not any(os.path.exists(p) for p in (orfa, feito, vazio_feito))
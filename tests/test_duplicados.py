@@ -0,0 +1,74 @@
+# coding: utf-8
+import pytest
+from PIL import Image, ImageDraw
+
+from comum.duplicados import (ACAO_CONFERIR, ACAO_COPIAR, ACAO_PULAR, ACAO_REVISAR, TIPO_EXATO, TIPO_SEMELHANTE,
+                              DetectorDuplicados, assinatura_arquivo, copia_campos, distancia)
+
+
+def rec(nome):
+    return {"orig_path": nome, "tipo": ".png"}
+
+
+def test_acao_invalida():
+    with pytest.raises(ValueError):
+        DetectorDuplicados("apagar")
+
+
+@pytest.mark.parametrize("acao", [ACAO_PULAR, ACAO_COPIAR, ACAO_REVISAR])
+def test_exato_recebe_a_acao_e_os_campos(acao):
+    detector = DetectorDuplicados(acao)
+    primeiro, copia = rec("a.png"), rec("b.png")
+    assert detector.classificar(primeiro, ("f" * 64, 0)) is None
+    assert detector.classificar(copia, ("f" * 64, 0)) == acao
+    assert copia_campos(acao)
+    assert copia["dup_grupo"] == primeiro["dup_grupo"] == "f" * 12
+    assert (copia["dup_de"], copia["dup_tipo"]) == ("a.png", TIPO_EXATO)
+    detector.guardar_resultado(primeiro, {"serie": "X1"}, "texto")
+    assert detector.resultado(copia["dup_grupo"]) == ({"serie": "X1"}, "texto")
+    assert detector.estatisticas() == {"grupos": 1, "copias": 1}
+
+
+def test_semelhante_so_e_marcado_para_conferir():
+    detector = DetectorDuplicados(ACAO_PULAR)
+    primeiro, parecido = rec("a.png"), rec("b.png")
+    detector.classificar(primeiro, ("a" * 64, 0b1011))
+    acao = detector.classificar(parecido, ("b" * 64, 0b0011))  # 1 bit de diferença
+    assert acao == ACAO_CONFERIR
+    assert not copia_campos(acao)  # passa pelo OCR
+    assert parecido["dup_tipo"] == TIPO_SEMELHANTE
+    # o resultado lido do semelhante não substitui o do representante
+    detector.guardar_resultado(primeiro, {"serie": "A"}, "texto")
+    detector.guardar_resultado(parecido, {"serie": "B"}, "ocr")
+    assert detector.resultado(primeiro["dup_grupo"]) == ({"serie": "A"}, "texto")
+    assert detector.mensagem(parecido, acao).startswith("Revisar: parecido com a.png")
+
+
+def test_longe_do_limiar_e_limiar_zero():
+    detector = DetectorDuplicados(limiar=2)
+    detector.classificar(rec("a.png"), ("a" * 64, 0))
+    assert detector.classificar(rec("b.png"), ("b" * 64, 0b111)) is None  # 3 bits
+    so_exatos = DetectorDuplicados(limiar=0)
+    assert not so_exatos.visual
+    so_exatos.classificar(rec("a.png"), ("a" * 64, None))
+    assert so_exatos.classificar(rec("b.png"), ("b" * 64, None)) is None
+
+
+def test_assinatura_reescaneada_fica_perto(tmp_path):
+    pytest.importorskip("numpy")
+    img = Image.new("L", (600, 800), 255)
+    desenho = ImageDraw.Draw(img)
+    for y in range(80, 700, 40):
+        desenho.rectangle([60, y, 60 + (y * 7) % 400 + 80, y + 12], fill=0)
+    img.save(tmp_path / "a.png")
+    img.rotate(0.7, fillcolor=255).resize((580, 775)).save(tmp_path / "b.png")  # "reescaneado"
+    outro = Image.new("L", (600, 800), 255)
+    ImageDraw.Draw(outro).ellipse([100, 100, 500, 700], fill=0)
+    outro.save(tmp_path / "c.png")
+
+    sha_a, vis_a = assinatura_arquivo(str(tmp_path / "a.png"), ".png")
+    sha_b, vis_b = assinatura_arquivo(str(tmp_path / "b.png"), ".png")
+    _, vis_c = assinatura_arquivo(str(tmp_path / "c.png"), ".png")
+    assert sha_a != sha_b
+    assert distancia(vis_a, vis_b) <= 16 < distancia(vis_a, vis_c)
+    assert assinatura_arquivo(str(tmp_path / "nao_existe.png"), ".png") == (None, None)
@@ -0,0 +1,24 @@
+# coding: utf-8
+from comum.extracao import interpretar_faixa_paginas
+
+
+def test_sem_dica_le_em_ordem():
+    assert interpretar_faixa_paginas(None, 3) == [1, 2, 3]
+    assert interpretar_faixa_paginas("", 2) == [1, 2]
+
+
+def test_dica_vem_primeiro_e_nada_some():
+    assert interpretar_faixa_paginas("3", 4) == [3, 1, 2, 4]
+    assert interpretar_faixa_paginas("2-3,1", 5) == [2, 3, 1, 4, 5]
+
+
+def test_negativas_e_ultima():
+    assert interpretar_faixa_paginas("-1", 4) == [4, 1, 2, 3]
+    assert interpretar_faixa_paginas("ultima;1", 3) == [3, 1, 2]
+    assert interpretar_faixa_paginas("última", 2) == [2, 1]
+
+
+def test_fora_do_documento_repetidas_e_lixo_ignorados():
+    assert interpretar_faixa_paginas("9, 2, 2, abc, 0, -7", 3) == [2, 1, 3]
+    assert interpretar_faixa_paginas("2-9", 3) == [2, 3, 1]
+    assert interpretar_faixa_paginas("1", 0) == []
@@ -0,0 +1,104 @@
+# coding: utf-8
+import os
+import time
+
+from comum.fila import CONCLUIDO, ERRO, EXECUTANDO, PENDENTE, FilaTrabalhos
+
+
+def _fila(tmp_path, **kw):
+    return FilaTrabalhos(str(tmp_path / "fila.sqlite"), **kw)
+
+
+def test_enfileirar_e_idempotente(tmp_path):
+    fila = _fila(tmp_path)
+    assert fila.enfileirar(["a", "b"]) == 2
+    assert fila.enfileirar(["a", "b", "c"]) == 1
+    assert fila.contagem()[PENDENTE] == 3
+    fila.fechar()
+
+
+def test_concessao_vencida_volta_para_a_fila(tmp_path):
+    fila = _fila(tmp_path, concessao=0.2)
+    fila.enfileirar(["a"])
+    pego = fila.pegar("w1")
+    assert pego["origem"] == "a" and pego["tentativas"] == 1
+    assert fila.pegar("w2") is None  # concessão de w1 ainda vale
+    time.sleep(0.3)
+    repego = fila.pegar("w2")
+    assert repego["id"] == pego["id"] and repego["tentativas"] == 2
+    # w1 voltou depois de perder a concessão: a falha dele não mexe no trabalho de w2
+    fila.falhar(pego["id"], "w1", "atrasado")
+    assert fila.contagem()[EXECUTANDO] == 1
+    fila.fechar()
+
+
+def test_renovar_segura_a_concessao(tmp_path):
+    fila = _fila(tmp_path, concessao=0.3)
+    fila.enfileirar(["a"])
+    fila.pegar("w1")
+    for _ in range(3):
+        time.sleep(0.15)
+        assert fila.renovar("w1") == 1
+    assert fila.pegar("w2") is None
+    fila.fechar()
+
+
+def test_concessao_vencendo_sempre_desiste(tmp_path):
+    fila = _fila(tmp_path, concessao=0.05, max_tentativas=2)
+    fila.enfileirar(["a"])
+    assert fila.pegar("w1") is not None
+    time.sleep(0.1)
+    assert fila.pegar("w2") is not None
+    time.sleep(0.1)
+    assert fila.pegar("w3") is None
+    (seq, origem, estado, registro, mensagem), = fila.resultados()
+    assert (origem, estado) == ("a", ERRO)
+    assert "2 tentativa" in mensagem
+    fila.fechar()
+
+
+def test_reservar_nome_e_idempotente(tmp_path):
+    fila = _fila(tmp_path)
+    saida = tmp_path / "saida"
+    saida.mkdir()
+    (saida / "doc.pdf").write_bytes(b"de fora da fila")
+    fila.enfileirar(["a", "b"])
+    a, b = fila.pegar("w"), fila.pegar("w")
+    caminho_a = fila.reservar_nome(a["id"], "doc.pdf", str(saida))
+    assert os.path.basename(caminho_a) == "doc_1.pdf"
+    # a mesma reserva em cada nova chamada (ou tentativa) do mesmo trabalho
+    assert fila.reservar_nome(a["id"], "doc.pdf", str(saida)) == caminho_a
+    assert fila.reservar_nome(a["id"], "outro.pdf", str(saida)) == caminho_a
+    # maiúsculas não diferenciam nomes na fila
+    assert os.path.basename(fila.reservar_nome(b["id"], "DOC.pdf", str(saida))) == "DOC_2.pdf"
+    # na próxima pegada o destino já vem reservado
+    fila.falhar(a["id"], "w", "erro")
+    assert fila.pegar("w")["destino"] == caminho_a
+    fila.fechar()
+
+
+def test_falhar_ate_o_maximo_de_tentativas(tmp_path):
+    fila = _fila(tmp_path, max_tentativas=3)
+    fila.enfileirar(["a"])
+    for tentativa in (1, 2, 3):
+        pego = fila.pegar("w")
+        assert pego["tentativas"] == tentativa
+        fila.falhar(pego["id"], "w", f"falha {tentativa}", {"antigo": "a", "_interno": 1})
+    assert fila.pegar("w") is None
+    assert fila.contagem()[ERRO] == 1
+    (seq, origem, estado, registro, mensagem), = fila.resultados()
+    assert (estado, mensagem, registro) == (ERRO, "falha 3", {"antigo": "a"})
+    # reabrir_erros zera as tentativas
+    assert fila.reabrir_erros() == 1
+    assert fila.pegar("w")["tentativas"] == 1
+    fila.fechar()
+
+
+def test_concluir_uma_vez_so(tmp_path):
+    fila = _fila(tmp_path)
+    fila.enfileirar(["a"])
+    pego = fila.pegar("w")
+    assert fila.concluir(pego["id"], {"status": "Concluído"})
+    assert not fila.concluir(pego["id"], {"status": "Concluído"})
+    assert fila.contagem()[CONCLUIDO] == 1 and fila.terminada()
+    fila.fechar()
@@ -0,0 +1,78 @@
+# coding: utf-8
+import zlib
+
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+
+from comum.imagem_pdf import A4, imagem_para_pdf, imagens_para_pdf
+
+
+def gradiente(modo="RGB", tamanho=(40, 20)):
+    img = Image.new("RGB", tamanho)
+    img.putdata([(x * 6, y * 12, (x + y) % 256) for y in range(tamanho[1]) for x in range(tamanho[0])])
+    return img.convert(modo)
+
+
+def xobject(caminho_pdf, pagina=0):
+    pag = PdfReader(caminho_pdf).pages[pagina]
+    return pag, pag["/Resources"]["/XObject"]["/Im0"].get_object()
+
+
+def test_jpeg_vai_inteiro(tmp_path):
+    jpg = tmp_path / "a.jpg"
+    gradiente().save(jpg, dpi=(100, 100), quality=80)
+    destino = str(tmp_path / "a.pdf")
+    assert imagem_para_pdf(str(jpg), destino) == 1
+    pag, img = xobject(destino)
+    assert img["/Filter"] == "/DCTDecode"
+    assert img._data == jpg.read_bytes()  # sem recodificar
+    assert [float(v) for v in pag.mediabox] == [0, 0, 28.8, 14.4]  # 40 x 20 px a 100 dpi
+
+
+def test_png_blocos_idat_direto(tmp_path):
+    png = tmp_path / "a.png"
+    gradiente().save(png)
+    destino = str(tmp_path / "a.pdf")
+    imagem_para_pdf(str(png), destino)
+    _, img = xobject(destino)
+    assert img["/Filter"] == "/FlateDecode"
+    assert img["/DecodeParms"]["/Predictor"] == 15
+    assert img._data in png.read_bytes()  # os mesmos bytes comprimidos do arquivo
+
+
+@pytest.mark.parametrize("nome, modo", [("a.png", "RGBA"), ("a.bmp", "RGB"), ("a.bmp", "L")])
+def test_decodificada_sem_perda(tmp_path, nome, modo):
+    original = gradiente(modo)
+    caminho = tmp_path / nome
+    original.save(caminho)
+    destino = str(tmp_path / "a.pdf")
+    imagem_para_pdf(str(caminho), destino)
+    _, img = xobject(destino)
+    assert img["/Filter"] == "/FlateDecode"
+    # transparência (tRNS/alfa) e formatos sem atalho: decodificados uma vez, sem perda
+    assert zlib.decompress(img._data) == original.convert("RGB" if modo == "RGBA" else modo).tobytes()
+
+
+def test_tiff_g4_e_varias_paginas_a4(tmp_path):
+    tiff = tmp_path / "p.tif"
+    try:
+        gradiente("1").save(tiff, compression="group4")
+    except (OSError, KeyError):
+        pytest.skip("PIL sem libtiff")
+    jpg = tmp_path / "b.jpg"
+    gradiente().save(jpg)
+    destino = str(tmp_path / "junto.pdf")
+    assert imagens_para_pdf([str(tiff), str(jpg)], destino, tamanho_pagina=A4, margem=10) == 2
+    leitor = PdfReader(destino)
+    assert len(leitor.pages) == 2
+    assert [round(float(v)) for v in leitor.pages[1].mediabox] == [0, 0, 595, 842]
+    _, img = xobject(destino)
+    assert img["/Filter"] == "/CCITTFaxDecode"
+
+
+def test_sem_imagem_nao_deixa_pdf(tmp_path):
+    destino = tmp_path / "vazio.pdf"
+    with pytest.raises(ValueError):
+        imagens_para_pdf([], str(destino))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,48 @@
+# coding: utf-8
+import os
+
+from comum.nomes import AlocadorNomes
+
+
+def test_nomes_livres_e_sufixos(tmp_path):
+    (tmp_path / "doc.pdf").write_bytes(b"existente")
+    alocador = AlocadorNomes(str(tmp_path))
+    primeiro = alocador.alocar("doc.pdf")
+    segundo = alocador.alocar("doc.pdf")
+    assert os.path.basename(primeiro) == "doc_1.pdf"
+    assert os.path.basename(segundo) == "doc_2.pdf"
+    # reserva criada vazia; o original não foi tocado
+    assert os.path.getsize(primeiro) == 0
+    assert (tmp_path / "doc.pdf").read_bytes() == b"existente"
+
+
+def test_arquivo_que_aparece_depois_da_leitura(tmp_path):
+    alocador = AlocadorNomes(str(tmp_path))
+    alocador.alocar("a.pdf")  # pasta lida aqui
+    (tmp_path / "b.pdf").write_bytes(b"de fora")
+    caminho = alocador.alocar("b.pdf")
+    assert os.path.basename(caminho) == "b_1.pdf"
+    assert (tmp_path / "b.pdf").read_bytes() == b"de fora"
+
+
+def test_dois_alocadores_na_mesma_pasta(tmp_path):
+    a, b = AlocadorNomes(str(tmp_path)), AlocadorNomes(str(tmp_path))
+    a._ler_pasta()
+    b._ler_pasta()  # os dois leram a pasta vazia
+    nomes = {os.path.basename(a.alocar("x.pdf")), os.path.basename(b.alocar("x.pdf"))}
+    assert nomes == {"x.pdf", "x_1.pdf"}
+
+
+def test_liberar_apaga_so_reserva_vazia(tmp_path):
+    alocador = AlocadorNomes(str(tmp_path))
+    vazio = alocador.alocar("v.pdf")
+    gravado = alocador.alocar("g.pdf")
+    with open(gravado, "wb") as f:
+        f.write(b"%PDF")
+    alocador.liberar(vazio)
+    alocador.liberar(gravado)
+    alocador.liberar(str(tmp_path / "nao_existe.pdf"))  # sem erro
+    assert not os.path.exists(vazio)
+    assert os.path.exists(gravado)
+    # o nome liberado não volta a ser entregue neste lote
+    assert os.path.basename(alocador.alocar("v.pdf")) == "v_1.pdf"
@@ -0,0 +1,104 @@
+# coding: utf-8
+import threading
+import time
+
+import pytest
+
+from comum.paralelo import MODO_THREAD
+from comum.pipeline import Falha, etapa, executar_pipeline
+
+
+def _dobrar(x):
+    if x == 3:
+        raise ValueError("três")
+    return (x * 2,)
+
+
+def _mais_um(y):
+    if y == 10:
+        raise RuntimeError("dez")
+    return y + 1
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_saida_na_ordem_de_entrada(workers):
+    def lento(x):
+        time.sleep(0.001 * (10 - x))  # os primeiros terminam por último
+        return (x,)
+
+    etapas = [etapa("lento", lento, workers, MODO_THREAD), etapa("id", lambda x: x, workers, MODO_THREAD)]
+    assert list(executar_pipeline(((i,) for i in range(10)), etapas)) == list(range(10))
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_erro_num_item_nao_para_o_pipeline(workers):
+    etapas = [etapa("dobrar", _dobrar, workers, MODO_THREAD), etapa("somar", _mais_um, workers, MODO_THREAD)]
+    saida = list(executar_pipeline(((i,) for i in range(7)), etapas))
+    assert saida[:3] == [1, 3, 5] and saida[4] == 9 and saida[6] == 13
+    falha_dobrar, falha_somar = saida[3], saida[5]
+    # a Falha segue na posição do item, sem rodar nas etapas seguintes
+    assert isinstance(falha_dobrar, Falha) and falha_dobrar.etapa == "dobrar"
+    assert isinstance(falha_dobrar.erro, ValueError) and falha_dobrar.item == (3,)
+    assert isinstance(falha_somar, Falha) and falha_somar.etapa == "somar" and falha_somar.item == (10,)
+
+
+def test_ao_falhar_recebe_as_falhas_em_ordem():
+    vistas = []
+
+    def ao_falhar(falha):
+        vistas.append((falha.etapa, falha.item))
+        return "erro"
+
+    etapas = [etapa("dobrar", _dobrar, 2, MODO_THREAD),
+              etapa("somar", _mais_um, 2, MODO_THREAD, ao_falhar=ao_falhar)]
+    saida = list(executar_pipeline(((i,) for i in range(7)), etapas))
+    assert saida == [1, 3, 5, "erro", 9, "erro", 13]
+    assert vistas == [("dobrar", (3,)), ("somar", (10,))]
+
+
+def test_erro_na_entrada_encerra_e_propaga():
+    def itens():
+        yield (1,)
+        raise OSError("pasta sumiu")
+
+    with pytest.raises(OSError, match="pasta sumiu"):
+        list(executar_pipeline(itens(), [etapa("id", lambda x: x)]))
+
+
+def test_erro_em_ao_falhar_encerra_e_propaga():
+    def ao_falhar(falha):
+        raise KeyError("registro")
+
+    etapas = [etapa("dobrar", _dobrar, ao_falhar=ao_falhar)]
+    with pytest.raises(KeyError):
+        list(executar_pipeline(((i,) for i in range(10)), etapas))
+
+
+def test_cancelar_entrega_o_que_ja_foi_feito():
+    cancelado = threading.Event()
+    iniciados = []
+
+    def extrair(x):
+        iniciados.append(x)
+        time.sleep(0.05)
+        return (x,)
+
+    def nomear(x):
+        cancelado.set()  # cancela assim que o primeiro resultado chega
+        return x
+
+    etapas = [etapa("extrair", extrair, 2, MODO_THREAD),
+              etapa("nomear", nomear, cancelavel=False)]
+    saida = list(executar_pipeline(((i,) for i in range(100)), etapas, cancelado.is_set))
+    # nada novo começa; tudo o que foi extraído sai, em ordem
+    assert saida == list(range(len(saida)))
+    assert len(iniciados) < 100
+    assert sorted(iniciados) == saida
+
+
+def test_fechar_o_gerador_encerra_as_threads():
+    antes = threading.active_count()
+    gerador = executar_pipeline(((i,) for i in range(1000)), [etapa("id", lambda x: x, 2, MODO_THREAD)])
+    assert next(gerador) == 0
+    gerador.close()
+    assert threading.active_count() == antes
@@ -0,0 +1,87 @@
+# coding: utf-8
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import comum.preprocessamento as pre
+from comum.preprocessamento import (binarizar_sauvola, cinza, endireitar, estimar_inclinacao, interpretar_receita,
+                                    preprocessar)
+from comum.tempos import Tempos
+
+
+def pagina_de_texto(inclinacao=0.0):
+    """Linhas de "palavras" (retângulos) numa página branca, giradas `inclinacao` graus."""
+    img = Image.new("L", (600, 500), 255)
+    desenho = ImageDraw.Draw(img)
+    for y in range(60, 440, 30):
+        for x in range(60, 520, 45):
+            desenho.rectangle([x, y, x + 30, y + 10], fill=0)
+    return img.rotate(inclinacao, resample=Image.BILINEAR, fillcolor=255)
+
+
+def sauvola_lento(arr, janela):
+    """Referência pixel a pixel: janela cortada nas bordas, desvio populacional."""
+    raio = janela // 2
+    altura, largura = arr.shape
+    saida = np.zeros_like(arr)
+    for y in range(altura):
+        for x in range(largura):
+            bloco = arr[max(0, y - raio):y + raio + 1, max(0, x - raio):x + raio + 1].astype(np.float64)
+            media, desvio = bloco.mean(), bloco.std()
+            limiar = media * (1 + pre.K_SAUVOLA * (desvio / pre.R_SAUVOLA - 1))
+            saida[y, x] = 255 if arr[y, x] > limiar else 0
+    return saida
+
+
+def test_receita():
+    assert interpretar_receita("Cinza, reduzir") == ["cinza", "reduzir"]
+    assert interpretar_receita("nenhum") == []
+    with pytest.raises(ValueError):
+        interpretar_receita("cinza,girar")
+
+
+def test_cinza_bt601_inteiro():
+    arr = np.array([[[255, 255, 255], [255, 0, 0], [0, 0, 0]]], np.uint8)
+    assert cinza(arr).tolist() == [[255, 76, 0]]
+
+
+def test_sauvola_igual_a_referencia_atravessando_faixas(monkeypatch):
+    monkeypatch.setattr(pre, "LINHAS_POR_FAIXA", 16)  # várias faixas numa imagem pequena
+    rng = np.random.default_rng(7)
+    arr = rng.integers(0, 256, (45, 37), dtype=np.uint8)
+    arr[10:20, 5:30] //= 4  # um borrão escuro
+    esperado = sauvola_lento(arr, pre.JANELA_SAUVOLA)
+    assert np.array_equal(binarizar_sauvola(arr), esperado)
+
+
+def test_sauvola_janela_acompanha_altura_x(monkeypatch):
+    monkeypatch.setattr(pre, "LINHAS_POR_FAIXA", 20)
+    arr = np.asarray(pagina_de_texto())[40:100, 40:120]
+    esperado = sauvola_lento(arr, 2 * 20 + 1)
+    assert np.array_equal(binarizar_sauvola(arr, {"altura_x": 20}), esperado)
+
+
+@pytest.mark.parametrize("graus", [-3.0, 2.0])
+def test_endireitar(graus):
+    arr = np.asarray(pagina_de_texto(graus))
+    assert abs(abs(estimar_inclinacao(arr)) - abs(graus)) <= 0.1
+    contexto = {}
+    reto = endireitar(arr, contexto)
+    assert abs(abs(contexto["inclinacao"]) - abs(graus)) <= 0.1
+    assert abs(estimar_inclinacao(reto)) <= 0.2
+
+
+def test_pagina_reta_nao_gira(monkeypatch):
+    arr = np.asarray(pagina_de_texto())
+    assert abs(estimar_inclinacao(arr)) <= 0.15
+    monkeypatch.setattr(pre, "INCLINACAO_MINIMA", 0.2)
+    assert endireitar(arr) is arr  # abaixo do mínimo devolve o próprio array
+
+
+def test_preprocessar_mede_as_etapas():
+    tempos = Tempos()
+    img = preprocessar(pagina_de_texto(1.5).convert("RGB"), "cinza,endireitar,binarizar", tempos)
+    assert img.mode == "L"
+    assert {"pre_array", "pre_cinza", "pre_endireitar", "pre_binarizar"} <= set(tempos)
+    assert set(np.unique(np.asarray(img))) <= {0, 255}
+    assert preprocessar(img, "nenhum") is img
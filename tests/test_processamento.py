@@ -0,0 +1,33 @@
+# coding: utf-8
+import time
+
+import comum.processamento as processamento
+from comum.processamento import novo_registro, processar_lote
+from comum.tempos import Tempos
+
+
+def extrair_falso(path, tipo, campos, *resto):
+    time.sleep(0.02)
+    return {"chave": path[-6:-4]}, "texto", Tempos(), None
+
+
+def test_cancelar_nao_deixa_registro_processando(tmp_path, monkeypatch):
+    monkeypatch.setattr(processamento, "extrair_campos_arquivo", extrair_falso)
+    origem, destino = tmp_path / "origem", tmp_path / "destino"
+    origem.mkdir()
+    destino.mkdir()
+    registros = []
+    for i in range(12):
+        caminho = origem / f"rat_{i:02d}.pdf"
+        caminho.write_bytes(b"%PDF-1.4")
+        registros.append(novo_registro(str(caminho)))
+    cancelar = []
+    concluidos = []
+    for rec in processar_lote(registros, str(destino), "RAT", palavra_chave="N", cancelado=lambda: bool(cancelar),
+                              ao_iniciar=lambda rec: rec.update(status="Processando")):
+        concluidos.append(rec)
+        cancelar.append(True)
+    assert 1 <= len(concluidos) < len(registros)
+    assert all(rec["status"] == "Concluído" for rec in concluidos)
+    assert {rec["status"] for rec in registros if rec not in concluidos} == {"Aguardando"}
+    assert sorted(p.name for p in destino.iterdir()) == sorted(rec["novo"] for rec in concluidos)
@@ -0,0 +1,69 @@
+# coding: utf-8
+import csv
+import json
+
+import pytest
+
+from comum.relatorio import Relatorio, formato_do_caminho, ler_bruto, regerar_relatorio
+
+COLUNAS = [("antigo", "Arquivo"), ("campo_serie", "Série"), ("t_total", "Tempo (s)")]
+REGISTROS = [
+    {"antigo": "a.pdf", "campo_serie": "ABC", "t_total": 1.5, "_hash": "interno"},
+    {"antigo": "b.pdf", "campo_serie": None, "t_total": 2},
+]
+
+
+def ler_csv(caminho):
+    with open(caminho, encoding="utf-8-sig", newline="") as f:
+        return list(csv.reader(f, delimiter=";"))
+
+
+def test_formato_invalido():
+    with pytest.raises(ValueError):
+        formato_do_caminho("relatorio.txt")
+
+
+def test_csv_linha_a_linha_e_valido_antes_do_fechar(tmp_path):
+    caminho = str(tmp_path / "rel.csv")
+    with Relatorio(caminho, COLUNAS, a_cada=1) as relatorio:
+        relatorio.adicionar(REGISTROS[0])
+        assert ler_csv(caminho) == [["Arquivo", "Série", "Tempo (s)"], ["a.pdf", "ABC", "1.5"]]
+        relatorio.adicionar(REGISTROS[1])
+    assert ler_csv(caminho)[2] == ["b.pdf", "", "2"]
+
+
+def test_xlsx(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    caminho = str(tmp_path / "rel.xlsx")
+    with Relatorio(caminho, COLUNAS, titulo="Séries Encontradas") as relatorio:
+        for rec in REGISTROS:
+            relatorio.adicionar(rec)
+    wb = openpyxl.load_workbook(caminho)
+    ws = wb["Séries Encontradas"]
+    linhas = [list(linha) for linha in ws.iter_rows(values_only=True)]
+    assert linhas[0] == ["Arquivo", "Série", "Tempo (s)"]
+    assert linhas[1] == ["a.pdf", "ABC", 1.5]
+    assert linhas[2][0] == "b.pdf" and linhas[2][2] == 2
+
+
+def test_bruto_sem_campos_internos_e_regerar(tmp_path):
+    bruto = str(tmp_path / "rel.jsonl")
+    with Relatorio(caminho_bruto=bruto) as relatorio:
+        for rec in REGISTROS:
+            relatorio.adicionar(rec)
+    with open(bruto, "a", encoding="utf-8") as f:
+        f.write('{"antigo": "cortad')  # última linha cortada por uma queda
+    registros = list(ler_bruto(bruto))
+    assert [r["antigo"] for r in registros] == ["a.pdf", "b.pdf"]
+    assert "_hash" not in registros[0]
+
+    caminho = str(tmp_path / "novo.csv")
+    regerar_relatorio(bruto, caminho, COLUNAS[:1], formatar=lambda r: dict(r, antigo=r["antigo"].upper()))
+    assert ler_csv(caminho) == [["Arquivo"], ["A.PDF"], ["B.PDF"]]
+
+
+def test_valores_compostos_viram_json_no_csv(tmp_path):
+    caminho = str(tmp_path / "rel.csv")
+    with Relatorio(caminho, [("campos", "Campos")]) as relatorio:
+        relatorio.adicionar({"campos": {"serie": "X"}})
+    assert json.loads(ler_csv(caminho)[1][0]) == {"serie": "X"}
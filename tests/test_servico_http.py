@@ -0,0 +1,81 @@
+# coding: utf-8
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("pytesseract")
+
+import servico_http.main as servico_http  # noqa: E402
+from servico_http.main import CONCLUIDO, Histograma, Servico, criar_app  # noqa: E402
+
+
+def test_histograma_percentis_pelas_faixas():
+    h = Histograma(limites=(10, 100, 1000))
+    assert h.percentil(50) is None
+    for ms in (5, 5, 50, 50, 50, 500, 500, 500, 500, 5000):
+        h.observar(ms / 1000)
+    assert (h.percentil(20), h.percentil(50), h.percentil(90), h.percentil(99)) == (10, 100, 1000, None)
+    resumo = h.resumo()
+    assert resumo["n"] == 10
+    assert resumo["media_ms"] == 716.0
+    assert resumo["faixas"] == {"<=10": 2, "<=100": 3, "<=1000": 4, ">1000": 1}
+
+
+@pytest.fixture
+def servico(tmp_path, monkeypatch):
+    """Serviço com 1 worker e 1 vaga na fila; o trabalho só termina quando o teste solta."""
+    soltar = threading.Event()
+
+    def trabalho_falso(caminho, *args):
+        inicio = time.time()
+        soltar.wait(5)
+        return {"status": "Concluído", "campo_chave": "42", "_inicio": inicio, "t_ocr": 0.01}
+
+    monkeypatch.setattr(servico_http, "executar_trabalho", trabalho_falso)
+    entrada = tmp_path / "entrada"
+    entrada.mkdir()
+    (entrada / "rat.pdf").write_bytes(b"%PDF")
+    s = Servico(workers=1, fila_max=1, pasta_trabalho=str(tmp_path / "trabalhos"), raizes=[str(entrada)])
+    s.pool = ThreadPoolExecutor(1)  # sem iniciar(): nada de processos nem OCR
+    s.soltar = soltar
+    s.arquivo = str(entrada / "rat.pdf")
+    yield s
+    soltar.set()
+    s.fechar()
+
+
+def test_admissao_recusa_com_429_e_libera_a_vaga(servico):
+    cliente = criar_app(servico).test_client()
+    pedido = {"caminho": servico.arquivo, "palavra_chave": "RAT", "converter": "0"}
+    ids = []
+    for _ in range(2):  # 1 executando + 1 na fila
+        resposta = cliente.post("/trabalhos", json=pedido)
+        assert resposta.status_code == 202
+        ids.append(resposta.get_json()["id"])
+    cheia = cliente.post("/trabalhos", json=pedido)
+    assert cheia.status_code == 429
+    assert cheia.headers["Retry-After"] == "5"
+    assert servico.metricas.resumo()["contadores"]["recusados"] == 1
+
+    servico.soltar.set()
+    for id_ in ids:
+        servico.esperar(servico.obter(id_))
+    assert servico.estado_fila()["ativos"] == 0
+    resposta = cliente.post("/extrair", json=pedido)
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert corpo["estado"] == CONCLUIDO
+    assert corpo["valores"] == {"chave": "42"}
+    latencia = cliente.get("/metricas").get_json()["latencia"]
+    assert latencia["total"]["n"] == 3
+    assert latencia["t_ocr"]["n"] == 3
+
+
+def test_caminho_fora_da_raiz(servico, tmp_path):
+    fora = tmp_path / "fora.pdf"
+    fora.write_bytes(b"%PDF")
+    resposta = criar_app(servico).test_client().post("/extrair", json={"caminho": str(fora), "palavra_chave": "RAT"})
+    assert resposta.status_code == 403
@@ -0,0 +1,81 @@
+# coding: utf-8
+import errno
+import os
+
+import pytest
+
+import comum.transferencia as transferencia
+from comum.transferencia import MODO_COPIAR, MODO_HARDLINK, MODO_MOVER, MODO_REFLINK, transferir
+
+
+@pytest.fixture
+def origem(tmp_path, monkeypatch):
+    monkeypatch.setattr(transferencia, "_sem_suporte", set())
+    caminho = tmp_path / "origem.pdf"
+    caminho.write_bytes(b"%PDF-1.4 conteudo")
+    return str(caminho)
+
+
+def test_modo_invalido(origem, tmp_path):
+    with pytest.raises(ValueError):
+        transferir(origem, str(tmp_path / "x.pdf"), "teleportar")
+
+
+def test_copiar_substitui_a_reserva(origem, tmp_path):
+    destino = tmp_path / "destino.pdf"
+    destino.write_bytes(b"")  # reserva vazia do AlocadorNomes
+    assert transferir(origem, str(destino)) == MODO_COPIAR
+    assert destino.read_bytes() == b"%PDF-1.4 conteudo"
+    assert os.path.exists(origem)
+
+
+def test_hardlink_mesmo_arquivo(origem, tmp_path):
+    destino = tmp_path / "destino.pdf"
+    destino.write_bytes(b"")
+    assert transferir(origem, str(destino), MODO_HARDLINK) == MODO_HARDLINK
+    assert os.path.samefile(origem, destino)
+    assert not os.path.exists(str(destino) + ".parcial")
+
+
+def test_reflink_ou_copia(origem, tmp_path):
+    destino = tmp_path / "destino.pdf"
+    assert transferir(origem, str(destino), MODO_REFLINK) in (MODO_REFLINK, MODO_COPIAR)
+    assert destino.read_bytes() == b"%PDF-1.4 conteudo"
+    assert not os.path.samefile(origem, destino)
+
+
+def test_sem_suporte_lembrado_e_cai_para_copia(origem, tmp_path, monkeypatch):
+    tentativas = []
+
+    def reflink_falha(_origem, destino):
+        tentativas.append(destino)
+        raise OSError(errno.EOPNOTSUPP, "sem reflink", destino)
+
+    monkeypatch.setattr(transferencia, "reflink", reflink_falha)
+    for nome in ("a.pdf", "b.pdf"):
+        assert transferir(origem, str(tmp_path / nome), MODO_REFLINK) == MODO_COPIAR
+        assert (tmp_path / nome).read_bytes() == b"%PDF-1.4 conteudo"
+    assert len(tentativas) == 1  # o segundo já vai direto para a cópia
+
+
+def test_mover(origem, tmp_path):
+    destino = tmp_path / "destino.pdf"
+    destino.write_bytes(b"")
+    assert transferir(origem, str(destino), MODO_MOVER) == MODO_MOVER
+    assert not os.path.exists(origem)
+    assert destino.read_bytes() == b"%PDF-1.4 conteudo"
+
+
+def test_outro_dispositivo(origem, tmp_path, monkeypatch):
+    monkeypatch.setattr(transferencia, "mesmo_dispositivo", lambda a, b: False)
+    links = []
+    monkeypatch.setattr(transferencia.os, "link", lambda *a: links.append(a))
+    link = tmp_path / "link.pdf"
+    assert transferir(origem, str(link), MODO_HARDLINK) == MODO_COPIAR  # link não atravessa dispositivos
+    assert links == []
+    assert not os.path.samefile(origem, link)
+    movido = tmp_path / "sub" / "movido.pdf"
+    movido.parent.mkdir()
+    assert transferir(origem, str(movido), MODO_MOVER) == MODO_MOVER  # copia e apaga
+    assert not os.path.exists(origem)
+    assert movido.read_bytes() == b"%PDF-1.4 conteudo"
@@ -5,140 +5,56 @@ Renomeador e Conversor → PDF (com backup, progresso, relatório Excel)
 - Nome final = nome_base (+ _keyword se existir)
 - Se já existir, adiciona suffix _1, _2, ...
 - Pede pasta destino ANTES do processamento
-- Relatório Excel com colunas escolhidas (inclui palavra-chave)
+- Relatório (Excel, CSV ou Parquet) com colunas escolhidas (inclui palavra-chave);
+  diário relatorio.jsonl no destino para regerar sem reprocessar
+- OCR, PDF, DOCX e Excel só carregam no primeiro arquivo que precisa deles
+  (comum/formatos.py): a janela abre sem esperar o pytesseract/pdf2image;
+  MEDIR_PARTIDA=1 mostra no console quanto ela levou
 """
 
+import time
+
+INICIO = time.perf_counter()  # tempo de partida: da importação até a janela pronta (MEDIR_PARTIDA=1)
+
+import argparse
+import multiprocessing
 import os
-import re
-import shutil
+import sys
 import threading
-import time
 import traceback
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from pdf2image import convert_from_path
-from PIL import Image
-import pytesseract
-from fpdf import FPDF
-import openpyxl
-from docx import Document
-from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from comum.cache_ocr import CacheOCR, cache_ativo, configurar_cache
+from comum.lista_virtual import AtualizacaoPeriodica, ListaVirtual, listar_em_segundo_plano
+from comum.diario import Diario, desfazer, ultimo_diario
+from comum.duplicados import ACOES, COLUNAS_DUPLICADOS, DetectorDuplicados
+from comum.formatos import estatisticas
+from comum.campos import CAMPO_CHAVE, MODELO_NOME_PADRAO, campos_busca, campos_do_modelo, rotulo_campo
+from comum.modelos_layout import nomes_modelos
+from comum.processamento import ensure_dir, novo_registro, processar_lote
+from comum.rasterizacao import configurar_rasterizacao
+from comum.relatorio import Relatorio, escrever_relatorio, regerar_relatorio
+from comum.tempos import COLUNAS_METRICAS, COLUNAS_OCR, resumo_execucao
+from comum.transferencia import MODO_COPIAR, MODOS, MODOS_BACKUP
 
 # ========== CONFIG ==========
 # ajuste conforme seu sistema se necessário:
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 CAMINHO_POPPLER = r"C:\poppler-25.11.0\Library\bin"
+# por variável de ambiente: comum/motor_ocr.py e comum/extracao.py leem quando carregam
+os.environ.setdefault("TESSERACT_CMD", TESSERACT_CMD)
+os.environ.setdefault("CAMINHO_POPPLER", CAMINHO_POPPLER)
+SEM_MODELO = "(nenhum - página inteira)"
+SEM_DUPLICADOS = "não verificar"
+# cada arquivo concluído vai para este diário na pasta destino; o relatório pode ser regerado dele
+DIARIO_RELATORIO = "relatorio.jsonl"
 # ===========================
 
-# -------- utils ----------
-def safe_read_text(path):
-    for enc in ("utf-8", "latin-1", "cp1252"):
-        try:
-            with open(path, "r", encoding=enc) as f:
-                return f.read()
-        except Exception:
-            continue
-    return ""
-
-def generate_unique_path(path):
-    base, ext = os.path.splitext(path)
-    counter = 1
-    new = path
-    while os.path.exists(new):
-        new = f"{base}_{counter}{ext}"
-        counter += 1
-    return new
-
-def ensure_dir(p):
-    if not os.path.exists(p):
-        os.makedirs(p, exist_ok=True)
-
-# -------- extratores de "palavra-chave" ----------
-def buscar_chave_texto(texto, palavra_chave):
-    if not palavra_chave:
-        return None
-    padrao = rf"{re.escape(palavra_chave)}[: ]+([A-Za-z0-9\-\._]+)"
-    m = re.search(padrao, texto, re.IGNORECASE)
-    return m.group(1) if m else None
-
-def extrair_chave_pdf(path, palavra_chave=None):
-    try:
-        pages = convert_from_path(path, poppler_path=CAMINHO_POPPLER)
-        texto = ""
-        for p in pages:
-            texto += pytesseract.image_to_string(p, lang="por")
-        return buscar_chave_texto(texto, palavra_chave)
-    except Exception:
-        return None
-
-def extrair_chave_imagem(path, palavra_chave=None):
-    try:
-        img = Image.open(path)
-        texto = pytesseract.image_to_string(img, lang="por")
-        return buscar_chave_texto(texto, palavra_chave)
-    except Exception:
-        return None
-
-def extrair_chave_txt(path, palavra_chave=None):
-    texto = safe_read_text(path)
-    return buscar_chave_texto(texto, palavra_chave)
-
-def extrair_chave_docx(path, palavra_chave=None):
-    try:
-        doc = Document(path)
-        texto = "\n".join([p.text for p in doc.paragraphs])
-        return buscar_chave_texto(texto, palavra_chave)
-    except Exception:
-        return None
-
-# -------- conversor para PDF ----------
-def converter_para_pdf(caminho_arquivo, caminho_destino):
-    ext = os.path.splitext(caminho_arquivo)[1].lower()
-    try:
-        if ext == ".pdf":
-            shutil.copy2(caminho_arquivo, caminho_destino)
-            return True
-        if ext in (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".webp"):
-            img = Image.open(caminho_arquivo).convert("RGB")
-            img.save(caminho_destino)
-            return True
-        if ext == ".txt":
-            texto = safe_read_text(caminho_arquivo)
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=12)
-            pdf.set_font("Arial", size=11)
-            for line in texto.splitlines():
-                pdf.multi_cell(0, 6, line)
-            pdf.output(caminho_destino)
-            return True
-        if ext == ".docx":
-            doc = Document(caminho_arquivo)
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=12)
-            pdf.set_font("Arial", size=11)
-            for p in doc.paragraphs:
-                for ln in (p.text or "").splitlines():
-                    pdf.multi_cell(0, 6, ln)
-            pdf.output(caminho_destino)
-            return True
-        # outros arquivos: cria PDF placeholder com nome/caminho
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=11)
-        pdf.multi_cell(0, 6, f"Arquivo original: {os.path.basename(caminho_arquivo)}")
-        pdf.multi_cell(0, 6, f"Caminho original: {caminho_arquivo}")
-        pdf.output(caminho_destino)
-        return True
-    except Exception as e:
-        print(f"Erro converter {caminho_arquivo}: {e}")
-        traceback.print_exc()
-        return False
-
 # ========= APP ============
 class App:
-    def __init__(self, root):
+    def __init__(self, root, workers=1):
         self.root = root
         root.title("Renomeador Avançado → PDF")
         root.geometry("1100x700")
@@ -149,11 +65,30 @@ class App:
         self.palavra_chave = tk.StringVar()
         self.nome_base = tk.StringVar()
         self.ext_filtro = tk.StringVar()
+        self.paginas = tk.StringVar()
         self.backup_var = tk.BooleanVar(value=False)
+        self.workers = tk.IntVar(value=max(1, workers))
+        self.workers_conversao = tk.IntVar(value=max(1, workers))
+        self.modo_saida = tk.StringVar(value=MODO_COPIAR)
+        self.modo_backup = tk.StringVar(value=MODO_COPIAR)
+        self.retomar_var = tk.BooleanVar(value=False)
+        self.duplicados_var = tk.StringVar(value=SEM_DUPLICADOS)
+        self.cache_var = tk.BooleanVar(value=cache_ativo())
+        self.modelo_var = tk.StringVar(value=SEM_MODELO)
+        self.memoria_mb = tk.IntVar(value=0)
+        self.campos_extras = tk.StringVar()
+        self.modelo_nome = tk.StringVar(value=MODELO_NOME_PADRAO)
 
         self.registros = []  # lista de dicts
         self.thread = None
         self.cancel_flag = False
+        self.concluidos = 0
+        # listagem em segundo plano: lotes entram por self._novos (com trava)
+        self._trava_lista = threading.Lock()
+        self._novos = []
+        self._geracao = 0
+        self._listagem_fim = 0
+        self.listando = False
 
         # UI top
         top = tk.Frame(root)
@@ -171,22 +106,50 @@ class App:
         tk.Entry(top, textvariable=self.nome_base, width=30).grid(row=2, column=1, sticky="w")
         tk.Label(top, text="Palavra-chave (opcional):").grid(row=2, column=2, sticky="w")
         tk.Entry(top, textvariable=self.palavra_chave, width=30).grid(row=2, column=3, sticky="w")
+        tk.Label(top, text="Páginas (ex: 1-2,-1):").grid(row=2, column=4, sticky="w")
+        tk.Entry(top, textvariable=self.paginas, width=12).grid(row=2, column=5, sticky="w")
 
         tk.Label(top, text="Filtrar extensão (opcional):").grid(row=3, column=0, sticky="w")
         tk.Entry(top, textvariable=self.ext_filtro, width=20).grid(row=3, column=1, sticky="w")
         tk.Checkbutton(top, text="Salvar BACKUP na origem", variable=self.backup_var).grid(row=3, column=2, sticky="w")
         tk.Button(top, text="Atualizar Lista", command=self.atualizar_lista).grid(row=3, column=3, sticky="w")
-
-        # treeview
-        cols = ("orig", "novo", "status")
-        self.tree = ttk.Treeview(root, columns=cols, show="headings", height=22)
-        self.tree.heading("orig", text="Nome Original")
-        self.tree.heading("novo", text="Novo Nome")
-        self.tree.heading("status", text="Status")
-        self.tree.column("orig", width=420)
-        self.tree.column("novo", width=420)
-        self.tree.column("status", width=150)
-        self.tree.pack(fill="both", expand=True, padx=8, pady=8)
+        tk.Label(top, text="Workers:").grid(row=3, column=4, sticky="w")
+        tk.Spinbox(top, from_=1, to=64, textvariable=self.workers, width=5).grid(row=3, column=5, sticky="w")
+        tk.Checkbutton(top, text="Usar cache de OCR", variable=self.cache_var).grid(row=4, column=2, sticky="w")
+        tk.Button(top, text="Limpar cache OCR", command=self.limpar_cache).grid(row=4, column=3, sticky="w")
+        tk.Label(top, text="Modelo de layout:").grid(row=4, column=0, sticky="w")
+        ttk.Combobox(top, textvariable=self.modelo_var, values=[SEM_MODELO] + nomes_modelos(),
+                     state="readonly", width=27).grid(row=4, column=1, sticky="w")
+        tk.Label(top, text="Memória p/ páginas (MB, 0 = sem limite):").grid(row=4, column=4, sticky="w")
+        tk.Spinbox(top, from_=0, to=65536, increment=256, textvariable=self.memoria_mb,
+                   width=7).grid(row=4, column=5, sticky="w")
+        tk.Label(top, text="Campos extras (ex: serie,patrimonio,data):").grid(row=5, column=0, sticky="w")
+        tk.Entry(top, textvariable=self.campos_extras, width=30).grid(row=5, column=1, sticky="w")
+        tk.Label(top, text="Modelo do nome:").grid(row=5, column=2, sticky="w")
+        tk.Entry(top, textvariable=self.modelo_nome, width=30).grid(row=5, column=3, sticky="w")
+        tk.Label(top, text="Workers conversão:").grid(row=5, column=4, sticky="w")
+        tk.Spinbox(top, from_=1, to=64, textvariable=self.workers_conversao, width=5).grid(row=5, column=5, sticky="w")
+        # PDFs sem conversão: hardlink/reflink/mover não regravam os bytes no mesmo disco
+        tk.Label(top, text="PDFs para o destino:").grid(row=6, column=0, sticky="w")
+        ttk.Combobox(top, textvariable=self.modo_saida, values=MODOS,
+                     state="readonly", width=12).grid(row=6, column=1, sticky="w")
+        tk.Label(top, text="Backup:").grid(row=6, column=2, sticky="w")
+        ttk.Combobox(top, textvariable=self.modo_backup, values=MODOS_BACKUP,
+                     state="readonly", width=12).grid(row=6, column=3, sticky="w")
+        # diário da execução no destino (comum/diario.py): pula o que já foi feito
+        tk.Checkbutton(top, text="Retomar execução interrompida",
+                       variable=self.retomar_var).grid(row=6, column=4, columnspan=2, sticky="w")
+        # mesmo arquivo em várias pastas / reescaneado: OCR só no primeiro (comum/duplicados.py)
+        tk.Label(top, text="Duplicados:").grid(row=7, column=0, sticky="w")
+        ttk.Combobox(top, textvariable=self.duplicados_var, values=(SEM_DUPLICADOS,) + ACOES,
+                     state="readonly", width=12).grid(row=7, column=1, sticky="w")
+
+        # lista virtual: o Treeview só tem as linhas visíveis, os dados ficam em self.registros
+        cols = [("orig", "Nome Original", 420), ("novo", "Novo Nome", 420), ("status", "Status", 150)]
+        self.lista = ListaVirtual(root, cols, self._linha, lambda: len(self.registros), altura=22)
+        self.lista.pack(fill="both", expand=True, padx=8, pady=8)
+        # status e progresso redesenhados a cada quadro, não a cada arquivo
+        self.tela = AtualizacaoPeriodica(root, self._atualizar_tela)
 
         # progress + buttons
         bottom = tk.Frame(root)
@@ -201,6 +164,7 @@ class App:
         tk.Button(btns, text="Cancelar", bg="#f44336", fg="white", command=self.cancelar).grid(row=0, column=1, padx=4)
         tk.Button(btns, text="Exportar Relatório (Excel)", bg="#FF9800", command=self.abrir_relatorio).grid(row=0, column=2, padx=4)
         tk.Button(btns, text="Limpar Lista", command=self.limpar).grid(row=0, column=3, padx=4)
+        tk.Button(btns, text="Desfazer Última Execução", command=self.desfazer_execucao).grid(row=0, column=4, padx=4)
 
     def selecionar_origem(self):
         p = filedialog.askdirectory(title="Pasta de origem")
@@ -213,34 +177,57 @@ class App:
         if p:
             self.dest_folder.set(p)
 
+    def _linha(self, i):
+        rec = self.registros[i]
+        return rec["antigo"], rec["novo"], rec["status"]
+
+    def _atualizar_tela(self):
+        """Um quadro: recebe lotes da listagem, redesenha as linhas visíveis e o progresso."""
+        ativo = self.listando or bool(self.thread and self.thread.is_alive())
+        with self._trava_lista:
+            novos, self._novos = self._novos, []
+            terminou = self.listando and self._listagem_fim == self._geracao
+        self.registros.extend(novos)
+        if terminou:
+            self.registros.sort(key=lambda rec: rec["antigo"])
+            self.listando = False
+        self.lista.redesenhar()
+        self.progress['maximum'] = max(1, len(self.registros))
+        self.progress['value'] = self.concluidos
+        return ativo
+
     def atualizar_lista(self):
-        self.tree.delete(*self.tree.get_children())
+        if self.thread and self.thread.is_alive():
+            messagebox.showwarning("Atenção", "Não é possível atualizar a lista durante o processamento.")
+            return
+        with self._trava_lista:
+            self._geracao += 1
+            geracao = self._geracao
+            self._novos = []
         self.registros.clear()
+        self.concluidos = 0
         pasta = self.orig_folder.get().strip()
         filtro = self.ext_filtro.get().strip().lower()
         if not pasta or not os.path.isdir(pasta):
+            self.listando = False
+            self._atualizar_tela()
             return
-        arquivos = [f for f in os.listdir(pasta) if os.path.isfile(os.path.join(pasta, f))]
-        arquivos.sort()
-        for f in arquivos:
-            if filtro and not f.lower().endswith(filtro):
-                continue
-            item = self.tree.insert("", "end", values=(f, "", "Aguardando"))
-            rec = {
-                "item": item,
-                "antigo": f,
-                "novo": "",
-                "status": "Aguardando",
-                "tipo": os.path.splitext(f)[1].lower(),
-                "orig_path": os.path.join(pasta, f),
-                "dest_path": "",
-                "keyword": "",
-                "timestamp": "",
-                "mensagem": ""
-            }
-            self.registros.append(rec)
-        self.progress['value'] = 0
-        self.progress['maximum'] = max(1, len(self.registros))
+
+        def entregar(nomes):
+            recs = [novo_registro(os.path.join(pasta, f)) for f in nomes]
+            with self._trava_lista:
+                if geracao == self._geracao:
+                    self._novos.extend(recs)
+
+        def terminar():
+            with self._trava_lista:
+                self._listagem_fim = geracao
+
+        # a pasta é lida numa thread; a lista aparece aos poucos (ordenada no fim)
+        self.listando = True
+        self._thread_lista = listar_em_segundo_plano(pasta, filtro, entregar, terminar,
+                                                     lambda: geracao != self._geracao)
+        self.tela.iniciar()
 
     def iniciar(self):
         if not self.nome_base.get().strip():
@@ -260,16 +247,38 @@ class App:
         if self.thread and self.thread.is_alive():
             messagebox.showinfo("Atenção", "Processamento já em execução.")
             return
+        if self.listando:
+            messagebox.showinfo("Atenção", "Aguarde a lista de arquivos terminar de carregar.")
+            return
+
+        try:
+            campos = campos_busca(self.palavra_chave.get(), self.campos_extras.get())
+        except ValueError as e:
+            messagebox.showwarning("Aviso", str(e))
+            return
+        desconhecidos = [c for c in campos_do_modelo(self.modelo_nome.get()) if c != "nome_base" and c not in campos]
+        if desconhecidos:
+            messagebox.showwarning("Aviso", "Campos do modelo de nome sem definição: " + ", ".join(desconhecidos))
+            return
 
         # prepara backup folder se necessário (inside origem)
         if self.backup_var.get():
             ensure_dir(os.path.join(self.orig_folder.get(), "BACKUP"))
 
+        # vale também para os processos de OCR (variável de ambiente)
+        configurar_cache(ativo=self.cache_var.get())
+        try:
+            configurar_rasterizacao(orcamento_mb=max(0, int(self.memoria_mb.get())))
+        except (tk.TclError, ValueError):
+            configurar_rasterizacao()
+
         self.cancel_flag = False
+        self.concluidos = 0
         self.progress['value'] = 0
         self.progress['maximum'] = max(1, len(self.registros))
         self.thread = threading.Thread(target=self._processar_thread, daemon=True)
         self.thread.start()
+        self.tela.iniciar()
 
     def cancelar(self):
         if self.thread and self.thread.is_alive():
@@ -282,104 +291,137 @@ class App:
         if self.thread and self.thread.is_alive():
             messagebox.showwarning("Atenção", "Não é possível limpar durante o processamento.")
             return
-        self.tree.delete(*self.tree.get_children())
+        with self._trava_lista:
+            self._geracao += 1
+            self._novos = []
+        self.listando = False
         self.registros.clear()
+        self.concluidos = 0
+        self._atualizar_tela()
         self.progress['value'] = 0
 
+    def limpar_cache(self):
+        if self.thread and self.thread.is_alive():
+            messagebox.showwarning("Atenção", "Não é possível limpar o cache durante o processamento.")
+            return
+        try:
+            cache = CacheOCR()
+            est = cache.estatisticas()
+            cache.limpar()
+            cache.fechar()
+            messagebox.showinfo("Cache OCR", f"Cache limpo ({est['entradas']} páginas, "
+                                             f"{est['acertos']} acertos / {est['falhas']} falhas).")
+        except Exception as e:
+            messagebox.showerror("Erro", f"Falha ao limpar cache: {e}")
+
     def _processar_thread(self):
         origem = self.orig_folder.get().strip()
         destino = self.dest_folder.get().strip()
         nome_base = self.nome_base.get().strip()
         palavra_chave_param = self.palavra_chave.get().strip()
+        campos_extras = self.campos_extras.get().strip()
+        modelo_nome = self.modelo_nome.get().strip() or MODELO_NOME_PADRAO
+        dica_paginas = self.paginas.get().strip()
+        modelo = self.modelo_var.get()
+        modelo = None if modelo == SEM_MODELO else modelo
         backup = self.backup_var.get()
+        try:
+            workers = max(1, int(self.workers.get()))
+        except (tk.TclError, ValueError):
+            workers = 1
+        try:
+            workers_conversao = max(1, int(self.workers_conversao.get()))
+        except (tk.TclError, ValueError):
+            workers_conversao = workers
 
-        total = len(self.registros)
-        idx = 0
-        for rec in self.registros:
-            if self.cancel_flag:
-                break
-            idx += 1
-            item = rec["item"]
-            antigo = rec["antigo"]
-            path_origem = rec["orig_path"]
-            tipo = rec["tipo"]
-
-            # update UI status
-            self._update_tree(item, novo=rec.get("novo", ""), status="Processando")
-
-            # extrair chave (se aplicável)
-            try:
-                if tipo == ".pdf":
-                    chave = extrair_chave_pdf(path_origem, palavra_chave_param)
-                elif tipo in (".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif", ".webp"):
-                    chave = extrair_chave_imagem(path_origem, palavra_chave_param)
-                elif tipo == ".txt":
-                    chave = extrair_chave_txt(path_origem, palavra_chave_param)
-                elif tipo == ".docx":
-                    chave = extrair_chave_docx(path_origem, palavra_chave_param)
-                else:
-                    chave = None
-            except Exception as e:
-                chave = None
-
-            # monta nome final: somente nome_base, se houver chave adiciona _chave
-            if chave:
-                novo_base = f"{nome_base}_{chave}"
-            else:
-                novo_base = nome_base
-
-            novo_nome = novo_base + ".pdf"
-            caminho_destino = os.path.join(destino, novo_nome)
-            caminho_destino = generate_unique_path(caminho_destino)
-
-            # backup original
-            if backup:
-                try:
-                    shutil.copy2(path_origem, os.path.join(origem, "BACKUP", antigo))
-                except Exception as e:
-                    print("Backup falhou:", e)
-
-            # converter
-            sucesso = converter_para_pdf(path_origem, caminho_destino)
-            estado = "Concluído" if sucesso else "Erro"
-            msg = "" if sucesso else "Falha conversão"
-
-            # grava dados no registro
-            rec["novo"] = os.path.basename(caminho_destino) if sucesso else ""
-            rec["status"] = estado
-            rec["dest_path"] = caminho_destino if sucesso else ""
-            rec["keyword"] = chave or ""
-            rec["timestamp"] = datetime.now().isoformat(sep=' ', timespec='seconds')
-            rec["mensagem"] = msg
-
-            # atualiza UI
-            self._update_tree(item, novo=rec["novo"], status=rec["status"])
-            # update progress
-            self.progress['value'] = idx
-            time.sleep(0.05)
-
-        # fim
-        if self.cancel_flag:
-            messagebox.showinfo("Processamento", "Processamento cancelado.")
+        # _fim_processamento roda sempre (libera a tela), mesmo se o lote der erro
+        resumo = ""
+        erro = None
+        try:
+            resumo = self._rodar_lote(origem, destino, nome_base, palavra_chave_param, campos_extras, modelo_nome,
+                                      dica_paginas, modelo, backup, workers, workers_conversao)
+        except Exception as e:
+            erro = e
+            traceback.print_exc()
+        finally:
+            self.root.after(0, self._fim_processamento, resumo, erro)
+
+    def _rodar_lote(self, origem, destino, nome_base, palavra_chave_param, campos_extras, modelo_nome,
+                    dica_paginas, modelo, backup, workers, workers_conversao):
+        diario = Diario.abrir(destino, retomar=self.retomar_var.get(),
+                              parametros={"origem": origem, "nome_base": nome_base, "modelo_nome": modelo_nome})
+        try:
+            acao_duplicados = self.duplicados_var.get()
+            duplicados = DetectorDuplicados(acao_duplicados) if acao_duplicados in ACOES else None
+
+            # pipeline: extração em processos, nomes numa só thread, backup/conversão
+            # em threads, todas as etapas ao mesmo tempo (ver comum/processamento.py)
+            concluidos = processar_lote(
+                list(self.registros), destino, nome_base, palavra_chave_param, dica_paginas, modelo,
+                backup_dir=os.path.join(origem, "BACKUP") if backup else None,
+                workers=workers,
+                workers_conversao=workers_conversao,
+                modo_saida=self.modo_saida.get(),
+                modo_backup=self.modo_backup.get(),
+                diario=diario,
+                duplicados=duplicados,
+                campos_extras=campos_extras,
+                modelo_nome=modelo_nome,
+                cancelado=lambda: self.cancel_flag,
+                ao_iniciar=lambda rec: rec.update(status="Processando"))
+            # os registros são atualizados aqui; a tela os lê no próximo quadro (_atualizar_tela)
+            # e cada um vai para o diário do relatório assim que termina
+            with Relatorio(caminho_bruto=os.path.join(destino, DIARIO_RELATORIO)) as relatorio:
+                for rec in concluidos:
+                    self.concluidos += 1
+                    relatorio.adicionar(rec)
+        finally:
+            # cancelado ou com erro: o diário fica sem "fim" e pode ser retomado
+            diario.fechar(completo=not self.cancel_flag and self.concluidos == len(self.registros))
+
+        # fim: resumo das etapas/arquivos mais lentos (console + aviso)
+        resumo = resumo_execucao(self.registros)
+        if resumo:
+            print(resumo)
+        carga = estatisticas()
+        if carga:
+            print("Carga dos formatos: " + ", ".join(f"{nome} {seg:.2f}s" for nome, seg in carga.items()))
+        return resumo
+
+    def _fim_processamento(self, resumo, erro=None):
+        self._atualizar_tela()
+        if erro is not None:
+            messagebox.showerror("Processamento", f"Processamento interrompido por erro: {erro}\n\nMarque "
+                                                  "\"Retomar execução interrompida\" para continuar de onde parou.")
+        elif self.cancel_flag:
+            messagebox.showinfo("Processamento", "Processamento cancelado.\n\n" + resumo)
         else:
-            messagebox.showinfo("Processamento", "Processamento finalizado.")
+            messagebox.showinfo("Processamento", "Processamento finalizado.\n\n" + resumo)
         self.cancel_flag = False
 
-    def _update_tree(self, item, novo=None, status=None):
-        # thread-safe UI update
-        def ui():
-            vals = self.tree.item(item, "values")
-            antigo = vals[0] if vals else ""
-            novo_val = novo if novo is not None else (vals[1] if vals else "")
-            status_val = status if status is not None else (vals[2] if vals else "")
-            self.tree.item(item, values=(antigo, novo_val, status_val))
-        self.root.after(0, ui)
+    def desfazer_execucao(self):
+        destino = self.dest_folder.get().strip()
+        caminho = ultimo_diario(destino) if destino else None
+        if not caminho:
+            messagebox.showinfo("Desfazer", "Nenhuma execução registrada na pasta de destino.")
+            return
+        if not messagebox.askyesno("Desfazer", f"Desfazer a execução registrada em\n{caminho}?\n\n"
+                                               "Os PDFs gerados são apagados e os arquivos movidos voltam."):
+            return
+
+        def rodar():
+            desfeitos, falhas = desfazer(caminho)
+            self.root.after(0, messagebox.showinfo, "Desfazer",
+                            f"{desfeitos} arquivo(s) desfeito(s), {falhas} falha(s).")
+            self.root.after(0, self.atualizar_lista)
+
+        threading.Thread(target=rodar, daemon=True).start()
 
     # ---------- relatório ----------
     def abrir_relatorio(self):
         win = tk.Toplevel(self.root)
-        win.title("Opções do Relatório (Excel)")
-        win.geometry("420x380")
+        win.title("Opções do Relatório")
+        win.geometry("440x750")
         tk.Label(win, text="Selecione colunas a incluir:").pack(anchor="w", padx=10, pady=6)
 
         options = [
@@ -391,8 +433,15 @@ class App:
             ("Caminho Destino", "dest_path"),
             ("Timestamp", "timestamp"),
             ("Palavra-chave", "keyword"),
+            ("Origem da chave", "origem"),
             ("Mensagem", "mensagem")
-        ]
+        ] + [(label, key) for key, label in COLUNAS_OCR + COLUNAS_DUPLICADOS]
+        # uma coluna por campo extra configurado na tela
+        try:
+            campos = campos_busca("", self.campos_extras.get())
+        except ValueError:
+            campos = {}
+        options += [(f"Campo: {rotulo_campo(nome)}", f"campo_{nome}") for nome in campos if nome != CAMPO_CHAVE]
         vars_map = {}
         for label, key in options:
             v = tk.BooleanVar(value=(key in ("antigo", "novo", "status")))
@@ -400,43 +449,65 @@ class App:
             chk.pack(anchor="w", padx=14)
             vars_map[key] = v
 
-        def gerar():
+        # tempos por etapa, páginas e bytes
+        metricas = tk.LabelFrame(win, text="Desempenho")
+        metricas.pack(fill="x", padx=10, pady=6)
+        for key, label in COLUNAS_METRICAS:
+            v = tk.BooleanVar(value=False)
+            tk.Checkbutton(metricas, text=label, variable=v).pack(anchor="w", padx=4)
+            vars_map[key] = v
+        options = options + [(label, key) for key, label in COLUNAS_METRICAS]
+
+        def gerar(diario=None):
             cols = [k for k, v in vars_map.items() if v.get()]
             if not cols:
                 messagebox.showwarning("Atenção", "Escolha ao menos uma coluna.")
                 return
             caminho = filedialog.asksaveasfilename(defaultextension=".xlsx",
-                                                   filetypes=[("Excel", "*.xlsx")],
+                                                   filetypes=[("Excel", "*.xlsx"), ("CSV", "*.csv"),
+                                                              ("Parquet", "*.parquet")],
                                                    title="Salvar relatório como")
             if not caminho:
                 return
+            # cabeçalho legível; linhas gravadas uma a uma (xlsx em modo write_only)
+            colunas = [(k, next(label for (label, key) in options if key == k)) for k in cols]
             try:
-                wb = openpyxl.Workbook()
-                ws = wb.active
-                # cabeçalho legível
-                header = []
-                for k in cols:
-                    header.append(next(label for (label, key) in options if key == k))
-                ws.append(header)
-                for rec in self.registros:
-                    row = [rec.get(k, "") for k in cols]
-                    ws.append(row)
-                wb.save(caminho)
+                if diario:
+                    regerar_relatorio(diario, caminho, colunas)
+                else:
+                    escrever_relatorio(self.registros, caminho, colunas)
                 messagebox.showinfo("Relatório", f"Relatório salvo em: {caminho}")
                 win.destroy()
             except Exception as e:
                 messagebox.showerror("Erro", f"Falha ao gerar relatório: {e}")
 
-        tk.Button(win, text="Gerar Relatório", bg="#4CAF50", fg="white", command=gerar).pack(pady=12)
+        def gerar_do_diario():
+            # relatório de uma execução anterior, sem reprocessar
+            diario = filedialog.askopenfilename(title="Diário do relatório",
+                                                initialdir=self.dest_folder.get() or None,
+                                                filetypes=[("Diário", "*.jsonl")])
+            if diario:
+                gerar(diario)
+
+        tk.Button(win, text="Gerar Relatório", bg="#4CAF50", fg="white", command=gerar).pack(pady=(12, 4))
+        tk.Button(win, text="Gerar de um diário (.jsonl)...", command=gerar_do_diario).pack(pady=(0, 8))
         tk.Button(win, text="Fechar", command=win.destroy).pack()
 
 # run
 def main():
+    parser = argparse.ArgumentParser(description="Renomeador e Conversor → PDF")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="workers em paralelo (OCR em processos, conversão em threads)")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = App(root)
+    app = App(root, workers=args.workers)
+    if os.environ.get("MEDIR_PARTIDA"):
+        root.after_idle(lambda: print(f"Janela pronta em {time.perf_counter() - INICIO:.2f}s"))
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # executável congelado (PyInstaller) no Windows
     main()
 
 # ===== PyInstaller example =====